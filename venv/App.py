@@ -0,0 +1,1870 @@
+import argparse
+import tkinter as tk
+from tkinter import ttk, messagebox, scrolledtext
+import sqlite3
+from datetime import date, datetime
+import re
+from functools import partial
+from tkcalendar import DateEntry
+from catalogue import Catalogue
+from database import (build_search_query, count_patient_records, count_record_items, delete_catalogue_row,
+                      delete_patient_data, delete_prescriptions, delete_record_data, delete_test_results,
+                      display_date, fetch_catalogue, fetch_medical_records, fetch_patient, fetch_patient_page,
+                      fetch_patient_records, fetch_record_detail, fetch_record_details, fetch_stats,
+                      find_patients, insert_catalogue_row, insert_patient, insert_record, iso_date, month_key,
+                      rebuild_stats, update_catalogue_row, update_patient_data, update_record_data,
+                      validate_record_entry)
+from db_worker import DatabaseWorker
+from patient_list import VirtualPatientList
+from record_cache import RecordCache
+from schema import configure_connection, migrate
+from startup_timer import StartupTimer
+
+DB_PATH = 'patients.db'
+
+# Thời gian chờ sau lần gõ phím cuối trước khi tìm kiếm (ms)
+SEARCH_DELAY_MS = 250
+
+# Số bệnh nhân tối đa hiển thị trong combobox chọn bệnh nhân
+PATIENT_COMBO_LIMIT = 100
+
+# Phím không làm thay đổi chữ đang gõ trong combobox (không cần lọc lại)
+NAVIGATION_KEYS = {'Up', 'Down', 'Left', 'Right', 'Return', 'Escape', 'Tab', 'Home', 'End'}
+
+# Số bệnh án liền kề (mỗi phía) được nạp trước khi chọn một bệnh án trong tab Chi tiết
+PREFETCH_RECORDS = 3
+
+class MedicalRecordsApp:
+    def __init__(self, root, timer=None):
+        self.root = root
+        self.root.title("Hệ thống Quản lý Bệnh án")
+        self.root.geometry("1200x800")
+        self.root.configure(bg='#f0f0f0')
+        
+        # Thời gian từng bước khởi động (in ra với --profile-startup)
+        self.timer = timer or StartupTimer()
+        
+        # Khởi tạo database
+        self.init_database()
+        
+        # Luồng nền chạy các truy vấn nặng để giao diện không bị treo
+        with self.timer.phase("Khởi động luồng nền"):
+            self.db = DatabaseWorker(self.root, DB_PATH, on_connect=configure_connection)
+        # Đóng cửa sổ: chờ các thao tác ghi còn trong hàng đợi rồi mới hủy giao diện
+        self.root.protocol('WM_DELETE_WINDOW', self.on_close)
+        
+        # Danh mục loại xét nghiệm/loại thuốc nạp một lần và giữ trong bộ nhớ
+        self.test_types = Catalogue('test_types')
+        self.medicines = Catalogue('medicine_types')
+        self.patient_combo_after_id = None
+        
+        # Chi tiết các bệnh án xem gần đây (bệnh án, xét nghiệm, đơn thuốc)
+        self.record_cache = RecordCache()
+        self.detail_record_id = None
+        
+        # Biến lưu trữ thông tin bệnh nhân được chọn
+        self.selected_patient_id = None
+        self.selected_patient_name = None
+        
+        # Tạo giao diện (chỉ tab đầu tiên, các tab khác tạo khi mở lần đầu)
+        with self.timer.phase("Tạo giao diện"):
+            self.create_widgets()
+        
+        # Load dữ liệu ban đầu: trang đầu danh sách bệnh nhân; thống kê tính khi mở tab Thống kê
+        with self.timer.phase("Tải dữ liệu đầu tiên"):
+            self.load_patients()
+    
+    def init_database(self):
+        """Khởi tạo database và nâng cấp cấu trúc bảng lên phiên bản mới nhất"""
+        with self.timer.phase("Mở database"):
+            self.conn = configure_connection(sqlite3.connect(DB_PATH))
+        with self.timer.phase("Kiểm tra cấu trúc database"):
+            # Ghi chú khi nâng cấp database cũ (dòng mồ côi, ngày không đọc được, file sao lưu)
+            migrate(self.conn, warn=lambda message: messagebox.showwarning("Cảnh báo", message))
+        self.cursor = self.conn.cursor()
+    
+    def create_widgets(self):
+        """Tạo giao diện chính
+
+        Mỗi tab chỉ được tạo (và tải dữ liệu) khi được chọn lần đầu, nên thời gian
+        khởi động không phụ thuộc số tab và dữ liệu của các tab chưa mở.
+        """
+        # Tạo notebook (tab container)
+        self.notebook = ttk.Notebook(self.root)
+        self.notebook.pack(fill='both', expand=True, padx=10, pady=10)
+        self.tab_builders = {}  # tên widget của tab -> hàm tạo nội dung tab (bỏ đi khi đã tạo)
+        
+        # Tab 1: Quản lý bệnh nhân
+        self.patient_frame = self.add_tab("Quản lý Bệnh nhân", self.create_patient_tab)
+        
+        # Tab 2: Quản lý bệnh án
+        self.record_frame = self.add_tab("Quản lý Bệnh án", self.create_record_tab)
+        
+        # Tab 3: Xem chi tiết bệnh án
+        self.detail_frame = self.add_tab("Chi tiết Bệnh án", self.create_detail_tab)
+        
+        # Tab 5: Quản lý loại xét nghiệm
+        self.test_type_frame = self.add_tab("Quản lý Loại Xét nghiệm", self.create_test_type_tab)
+        
+        # Tab 6: Quản lý loại thuốc
+        self.medicine_type_frame = self.add_tab("Quản lý Loại Thuốc", self.create_medicine_type_tab)
+        
+        # Tab 4: Thống kê
+        self.stats_frame = self.add_tab("Thống kê", self.create_stats_tab)
+        
+        self.build_tab(self.patient_frame)
+        self.notebook.bind('<<NotebookTabChanged>>', self.on_tab_changed)
+    
+    def add_tab(self, text, builder):
+        """Thêm một tab rỗng; builder() tạo nội dung khi tab được mở lần đầu"""
+        frame = ttk.Frame(self.notebook)
+        self.notebook.add(frame, text=text)
+        self.tab_builders[str(frame)] = builder
+        return frame
+    
+    def build_tab(self, frame):
+        """Tạo nội dung tab nếu chưa tạo"""
+        builder = self.tab_builders.pop(str(frame), None)
+        if builder is not None:
+            builder()
+    
+    def is_tab_built(self, frame):
+        return str(frame) not in self.tab_builders
+    
+    def on_tab_changed(self, event):
+        self.build_tab(self.notebook.select())
+    
+    def show_tab(self, frame):
+        """Chuyển sang tab; tạo tab ngay (không chờ sự kiện) để dùng được các widget của tab"""
+        self.build_tab(frame)
+        self.notebook.select(frame)
+    
+    def create_patient_tab(self):
+        """Tạo tab quản lý bệnh nhân"""
+        # Frame chứa form nhập liệu
+        form_frame = ttk.LabelFrame(self.patient_frame, text="Thông tin bệnh nhân", padding=10)
+        form_frame.pack(fill='x', padx=10, pady=5)
+        
+        # Tạo form nhập liệu
+        ttk.Label(form_frame, text="Họ tên:").grid(row=0, column=0, sticky='w', padx=5, pady=5)
+        self.patient_name = ttk.Entry(form_frame, width=30)
+        self.patient_name.grid(row=0, column=1, padx=5, pady=5)
+        
+        ttk.Label(form_frame, text="Ngày sinh:").grid(row=0, column=2, sticky='w', padx=5, pady=5)
+        self.patient_birth = DateEntry(form_frame, 
+                                    width=12,
+                                    background='darkblue',
+                                    foreground='white', 
+                                    borderwidth=2,
+                                    date_pattern='dd/mm/yyyy')
+        self.patient_birth.grid(row=0, column=3, padx=5, pady=5)
+        
+        ttk.Label(form_frame, text="Giới tính:").grid(row=1, column=0, sticky='w', padx=5, pady=5)
+        self.patient_gender = ttk.Combobox(form_frame, values=['Nam', 'Nữ'], width=27)
+        self.patient_gender.grid(row=1, column=1, padx=5, pady=5)
+        
+        ttk.Label(form_frame, text="Số điện thoại:").grid(row=1, column=2, sticky='w', padx=5, pady=5)
+        self.patient_phone = ttk.Entry(form_frame, width=15)
+        self.patient_phone.grid(row=1, column=3, padx=5, pady=5)
+        
+        ttk.Label(form_frame, text="Địa chỉ:").grid(row=2, column=0, sticky='w', padx=5, pady=5)
+        self.patient_address = ttk.Entry(form_frame, width=70)
+        self.patient_address.grid(row=2, column=1, columnspan=4, padx=5, pady=5, sticky='ew')
+        
+        # Buttons
+        button_frame = ttk.Frame(form_frame)
+        button_frame.grid(row=3, column=0, columnspan=5, pady=10)
+        
+        ttk.Button(button_frame, text="Thêm BN", command=self.add_patient).pack(side='left', padx=5)
+        ttk.Button(button_frame, text="Cập nhật", command=self.update_patient).pack(side='left', padx=5)
+        ttk.Button(button_frame, text="Xóa", command=self.delete_patient).pack(side='left', padx=5)
+        ttk.Button(button_frame, text="Làm mới", command=self.clear_patient_form).pack(side='left', padx=5)
+        
+        # Tìm kiếm
+        search_frame = ttk.LabelFrame(self.patient_frame, text="Tìm kiếm", padding=10)
+        search_frame.pack(fill='x', padx=10, pady=5)
+        
+        ttk.Label(search_frame, text="Họ tên / SĐT / Địa chỉ:").pack(side='left')
+        self.search_patient = ttk.Entry(search_frame, width=30)
+        self.search_patient.pack(side='left', padx=5)
+        self.search_patient.bind('<KeyRelease>', self.search_patients)
+        self.search_after_id = None
+        
+        # Danh sách bệnh nhân
+        list_frame = ttk.LabelFrame(self.patient_frame, text="Danh sách bệnh nhân", padding=10)
+        list_frame.pack(fill='both', expand=True, padx=10, pady=5)
+        
+        # Treeview
+        columns = ('ID', 'Họ tên', 'Ngày sinh', 'Giới tính', 'Số ĐT', 'Địa chỉ')
+        self.patient_tree = ttk.Treeview(list_frame, columns=columns, show='headings', height=15)
+        
+        # Định nghĩa cột
+        for col in columns:
+            self.patient_tree.heading(col, text=col)
+            self.patient_tree.column(col, width=100)
+        
+        # Scrollbar
+        scrollbar = ttk.Scrollbar(list_frame, orient='vertical', command=self.patient_tree.yview)
+        
+        self.patient_tree.pack(side='left', fill='both', expand=True)
+        scrollbar.pack(side='right', fill='y')
+        
+        # Danh sách ảo: chỉ tải các trang quanh vị trí đang cuộn. Trang được đọc
+        # đồng bộ trên luồng Tk có chủ ý: mỗi trang 100 dòng theo khóa dùng chỉ mục
+        # (khoảng 0,5 ms, tối đa vài ms với 1 triệu bệnh nhân) và phần xử lý cuộn cần
+        # có dòng ngay để giữ vị trí thanh cuộn
+        self.patient_list = VirtualPatientList(self.patient_tree, scrollbar,
+                                               partial(fetch_patient_page, self.cursor))
+        
+        # Bind events
+        self.patient_tree.bind('<Double-1>', self.on_patient_select_and_navigate)
+        self.patient_tree.bind('<ButtonRelease-1>', self.on_patient_select)
+
+
+    def on_patient_select_and_navigate(self, event):
+        """Xử lý khi double click vào bệnh nhân - chuyển sang tab bệnh án"""
+        selection = self.patient_tree.selection()
+        if selection:
+            item = self.patient_tree.item(selection[0])
+            patient_data = item['values']
+            
+            if patient_data:
+                patient_id = patient_data[0]
+                patient_name = patient_data[1]
+                
+                # Lưu thông tin bệnh nhân được chọn
+                self.selected_patient_id = patient_id
+                self.selected_patient_name = patient_name
+                
+                # Chuyển sang tab bệnh án
+                self.show_tab(self.record_frame)
+                
+                # Cập nhật thông tin bệnh nhân trong tab bệnh án
+                self.update_medical_record_patient_info(patient_id, patient_name)
+                
+                # Set combobox
+                self.record_patient_combo.set(f"{patient_id} - {patient_name}")
+                
+                # Load bệnh án của bệnh nhân này
+                self.load_patient_medical_records(patient_id)
+    def update_medical_record_patient_info(self, patient_id, patient_name):
+        """Cập nhật thông tin bệnh nhân trong tab bệnh án"""
+        if hasattr(self, 'current_patient_label'):
+            self.current_patient_label.config(text=f"Bệnh nhân: {patient_name} (ID: {patient_id})")
+        
+        if hasattr(self, 'detail_patient_info'):
+            # Lấy thông tin chi tiết bệnh nhân ở luồng nền
+            self.db.read(
+                lambda cursor: fetch_patient(cursor, patient_id),
+                self.show_detail_patient_info,
+                lambda e: print(f"Lỗi khi cập nhật thông tin bệnh nhân: {e}"),
+                key='patient_info')
+
+    def show_detail_patient_info(self, patient_info):
+        """Hiển thị thông tin chi tiết bệnh nhân đã tải trong tab bệnh án"""
+        if patient_info:
+            info_text = f"Bệnh nhân: {patient_info[1]} | Ngày sinh: {patient_info[2]} | Giới tính: {patient_info[3]} | SĐT: {patient_info[4]} | Địa chỉ: {patient_info[5]}"
+            self.detail_patient_info.config(text=info_text)
+
+    # Hàm load bệnh án của bệnh nhân
+    def load_patient_medical_records(self, patient_id):
+        """Load danh sách bệnh án của bệnh nhân"""
+        if hasattr(self, 'medical_record_tree'):
+            self.load_medical_records(patient_id)
+
+    # def on_patient_select(self, event):
+    #     """Xử lý khi chọn bệnh nhân để fill form"""
+    #     selection = self.patient_tree.selection()
+    #     if selection:
+    #         item = self.patient_tree.item(selection[0])
+    #         patient_data = item['values']
+            
+    #         if patient_data:
+    #             patient_id = patient_data[0]
+    #             patient_name = patient_data[1]
+                
+    #             # Lưu thông tin bệnh nhân được chọn
+    #             self.selected_patient_id = patient_id
+    #             self.selected_patient_name = patient_name
+    #             # Clear form trước
+    #             self.clear_patient_form()
+                
+    #             # Fill dữ liệu vào form
+    #             self.patient_name.insert(0, patient_data[1])
+                
+    #             # Chuyển đổi ngày sinh từ string sang datetime cho DateEntry
+    #             try:
+    #                 birth_date = datetime.strptime(patient_data[2], '%d/%m/%Y')
+    #                 self.patient_birth.set_date(birth_date)
+    #             except:
+    #                 pass
+                
+    #             self.patient_gender.set(patient_data[3])
+    #             self.patient_phone.insert(0, patient_data[4])
+    #             self.patient_address.insert(0, patient_data[5])
+
+    # Hàm clear form với DateEntry
+    def clear_patient_form(self):
+        """Xóa dữ liệu trong form"""
+        self.patient_name.delete(0, 'end')
+        self.patient_birth.set_date(datetime.now())  # Set về ngày hiện tại
+        self.patient_gender.set('')
+        self.patient_phone.delete(0, 'end')
+        self.patient_address.delete(0, 'end')
+    def create_record_tab(self):
+        """Tạo tab quản lý bệnh án với bố cục hợp lý hơn"""
+        # Frame chọn bệnh nhân
+        patient_select_frame = ttk.LabelFrame(self.record_frame, text="Chọn bệnh nhân", padding=10)
+        patient_select_frame.pack(fill='x', padx=10, pady=5)
+        
+        ttk.Label(patient_select_frame, text="Bệnh nhân:").pack(side='left')
+        self.record_patient_combo = ttk.Combobox(patient_select_frame, width=50)
+        self.record_patient_combo.pack(side='left', padx=5)
+        self.record_patient_combo.bind('<<ComboboxSelected>>', self.on_patient_combo_select)
+        self.record_patient_combo.bind('<KeyRelease>', self.search_patient_combo)
+        
+        ttk.Button(patient_select_frame, text="Tải lại DS", command=self.load_patient_combo).pack(side='left', padx=5)
+        
+        self.current_patient_label = ttk.Label(patient_select_frame, text="Chưa chọn bệnh nhân", 
+                                             font=('Arial', 10, 'bold'), foreground='blue')
+        self.current_patient_label.pack(side='left', padx=20)
+        
+        # Frame form bệnh án với Notebook
+        record_form_frame = ttk.LabelFrame(self.record_frame, text="Thông tin bệnh án", padding=10)
+        record_form_frame.pack(fill='x', padx=10, pady=5)
+        
+        # Tạo Notebook cho các tab con
+        record_notebook = ttk.Notebook(record_form_frame)
+        record_notebook.pack(fill='both', pady=5, expand=False)
+        
+        # Tab 1: Thông tin chính
+        main_info_frame = ttk.Frame(record_notebook)
+        record_notebook.add(main_info_frame, text="Thông tin chính")
+        
+        # Ngày khám và Bác sĩ
+        ttk.Label(main_info_frame, text="Ngày khám:").grid(row=0, column=0, sticky='w', padx=5, pady=5)
+        self.visit_date = DateEntry(main_info_frame, 
+                                  width=12, background='darkblue', foreground='white', 
+                                  borderwidth=2, date_pattern='dd/mm/yyyy')
+        self.visit_date.grid(row=0, column=1, padx=5, pady=5)
+        
+        ttk.Label(main_info_frame, text="Bác sĩ:").grid(row=0, column=2, sticky='w', padx=5, pady=5)
+        self.doctor_name = ttk.Entry(main_info_frame, width=30)
+        self.doctor_name.grid(row=0, column=3, padx=5, pady=5)
+        
+        # Chẩn đoán
+        ttk.Label(main_info_frame, text="Chẩn đoán:").grid(row=1, column=0, sticky='w', padx=5, pady=5)
+        self.diagnosis = ttk.Entry(main_info_frame, width=60)
+        self.diagnosis.grid(row=1, column=1, columnspan=3, padx=5, pady=5, sticky='ew')
+        
+        # Triệu chứng
+        ttk.Label(main_info_frame, text="Triệu chứng:").grid(row=2, column=0, sticky='nw', padx=5, pady=5)
+        self.symptoms = scrolledtext.ScrolledText(main_info_frame, width=60, height=2)
+        self.symptoms.grid(row=2, column=1, columnspan=3, padx=5, pady=5, sticky='ew')
+        
+        # Điều trị
+        ttk.Label(main_info_frame, text="Điều trị:").grid(row=3, column=0, sticky='nw', padx=5, pady=5)
+        self.treatment = scrolledtext.ScrolledText(main_info_frame, width=60, height=2)
+        self.treatment.grid(row=3, column=1, columnspan=3, padx=5, pady=5, sticky='ew')
+        
+        # Ghi chú
+        ttk.Label(main_info_frame, text="Ghi chú:").grid(row=4, column=0, sticky='nw', padx=5, pady=5)
+        self.notes = scrolledtext.ScrolledText(main_info_frame, width=60, height=2)
+        self.notes.grid(row=4, column=1, columnspan=3, padx=5, pady=5, sticky='ew')
+        
+        # Tab 2: Kết quả xét nghiệm
+        test_frame = ttk.Frame(record_notebook)
+        record_notebook.add(test_frame, text="Kết quả xét nghiệm")
+        
+        # Form nhập xét nghiệm
+        ttk.Label(test_frame, text="Loại xét nghiệm:").grid(row=0, column=0, sticky='w', padx=5, pady=5)
+        self.test_type_combo = ttk.Combobox(test_frame, width=30)
+        self.test_type_combo.grid(row=0, column=1, padx=5, pady=5)
+        self.test_type_combo.bind('<KeyRelease>',
+                                  lambda event: self.filter_catalogue_combo(event, self.test_type_combo, self.test_types))
+        
+        ttk.Label(test_frame, text="Kết quả:").grid(row=0, column=2, sticky='w', padx=5, pady=5)
+        self.test_result = ttk.Entry(test_frame, width=30)
+        self.test_result.grid(row=0, column=3, padx=5, pady=5)
+        
+        ttk.Label(test_frame, text="Ghi chú:").grid(row=1, column=0, sticky='w', padx=5, pady=5)
+        self.test_notes = ttk.Entry(test_frame, width=60)
+        self.test_notes.grid(row=1, column=1, columnspan=3, padx=5, pady=5, sticky='ew')
+        
+        test_button_frame = ttk.Frame(test_frame)
+        test_button_frame.grid(row=2, column=0, columnspan=4, pady=5)
+        ttk.Button(test_button_frame, text="Thêm xét nghiệm", command=self.add_test_result).pack(side='left', padx=5)
+        ttk.Button(test_button_frame, text="Xóa xét nghiệm", command=self.delete_test_result).pack(side='left', padx=5)
+        
+        # Treeview kết quả xét nghiệm
+        test_columns = ('ID', 'Loại xét nghiệm', 'Kết quả', 'Ghi chú')
+        self.test_tree = ttk.Treeview(test_frame, columns=test_columns, show='headings', height=4)
+        for col in test_columns:
+            self.test_tree.heading(col, text=col)
+            self.test_tree.column(col, width=150)
+        self.test_tree.grid(row=3, column=0, columnspan=4, padx=5, pady=5, sticky='ew')
+        self.test_tree.bind('<ButtonRelease-1>', self.on_test_select)
+        
+        # Tab 3: Đơn thuốc
+        prescription_frame = ttk.Frame(record_notebook)
+        record_notebook.add(prescription_frame, text="Đơn thuốc")
+        
+        # Form nhập đơn thuốc
+        ttk.Label(prescription_frame, text="Loại thuốc:").grid(row=0, column=0, sticky='w', padx=5, pady=5)
+        self.medicine_type_combo = ttk.Combobox(prescription_frame, width=30)
+        self.medicine_type_combo.grid(row=0, column=1, padx=5, pady=5)
+        self.medicine_type_combo.bind('<KeyRelease>',
+                                      lambda event: self.filter_catalogue_combo(event, self.medicine_type_combo, self.medicines))
+        
+        ttk.Label(prescription_frame, text="Liều lượng:").grid(row=0, column=2, sticky='w', padx=5, pady=5)
+        self.dosage = ttk.Entry(prescription_frame, width=20)
+        self.dosage.grid(row=0, column=3, padx=5, pady=5)
+        
+        ttk.Label(prescription_frame, text="Số lượng:").grid(row=1, column=0, sticky='w', padx=5, pady=5)
+        self.quantity = ttk.Entry(prescription_frame, width=10)
+        self.quantity.grid(row=1, column=1, padx=5, pady=5)
+        
+        ttk.Label(prescription_frame, text="Hướng dẫn:").grid(row=1, column=2, sticky='w', padx=5, pady=5)
+        self.instructions = ttk.Entry(prescription_frame, width=30)
+        self.instructions.grid(row=1, column=3, padx=5, pady=5)
+        
+        prescription_button_frame = ttk.Frame(prescription_frame)
+        prescription_button_frame.grid(row=2, column=0, columnspan=4, pady=5)
+        ttk.Button(prescription_button_frame, text="Thêm thuốc", command=self.add_prescription).pack(side='left', padx=5)
+        ttk.Button(prescription_button_frame, text="Xóa thuốc", command=self.delete_prescription).pack(side='left', padx=5)
+        
+        # Treeview đơn thuốc
+        prescription_columns = ('ID', 'Loại thuốc', 'Liều lượng', 'Số lượng', 'Hướng dẫn')
+        self.prescription_tree = ttk.Treeview(prescription_frame, columns=prescription_columns, show='headings', height=4)
+        for col in prescription_columns:
+            self.prescription_tree.heading(col, text=col)
+            self.prescription_tree.column(col, width=120)
+        self.prescription_tree.grid(row=3, column=0, columnspan=4, padx=5, pady=5, sticky='ew')
+        self.prescription_tree.bind('<ButtonRelease-1>', self.on_prescription_select)
+        
+        # Buttons bệnh án
+        record_button_frame = ttk.Frame(record_form_frame)
+        record_button_frame.pack(fill='x', pady=10)
+        
+        ttk.Button(record_button_frame, text="Lưu bệnh án", command=self.save_record).pack(side='left', padx=5)
+        ttk.Button(record_button_frame, text="Cập nhật", command=self.update_record).pack(side='left', padx=5)
+        ttk.Button(record_button_frame, text="Xóa", command=self.delete_record).pack(side='left', padx=5)
+        ttk.Button(record_button_frame, text="Làm mới", command=self.clear_record_form).pack(side='left', padx=5)
+        ttk.Button(record_button_frame, text="Xem chi tiết", command=self.view_record_detail).pack(side='left', padx=5)
+        
+        # Danh sách bệnh án
+        record_list_frame = ttk.LabelFrame(self.record_frame, text="Lịch sử khám bệnh", padding=10)
+        record_list_frame.pack(fill='both', expand=True, padx=10, pady=5)
+        
+        record_columns = ('ID', 'Ngày khám', 'Chẩn đoán', 'Bác sĩ', 'Ghi chú')
+        self.record_tree = ttk.Treeview(record_list_frame, columns=record_columns, show='headings', height=10)
+        for col in record_columns:
+            self.record_tree.heading(col, text=col)
+            self.record_tree.column(col, width=120)
+        
+        record_scrollbar = ttk.Scrollbar(record_list_frame, orient='vertical', command=self.record_tree.yview)
+        self.record_tree.configure(yscrollcommand=record_scrollbar.set)
+        self.record_tree.pack(side='left', fill='both', expand=True)
+        record_scrollbar.pack(side='right', fill='y')
+        
+        self.record_tree.bind('<Double-1>', self.on_record_select)
+        # Gán sự kiện nhấp chuột trái
+        self.record_tree.bind('<ButtonRelease-1>', self.on_record_select_left_click)
+        
+        # Load danh sách loại xét nghiệm và thuốc
+        self.load_test_types()
+        self.load_medicine_types()
+        self.load_patient_combo()
+    def on_record_select_left_click(self, event):
+        """Xử lý khi nhấp chuột trái vào bệnh án: điền dữ liệu vào form và tải xét nghiệm/đơn thuốc"""
+        selected = self.record_tree.selection()
+        if selected:
+            record_id = self.record_tree.item(selected[0])['values'][0]
+            self.current_record_id = record_id  # Lưu record_id để sử dụng cho cập nhật
+            self.get_record_detail(record_id, self.show_record_form, key='record_form')
+
+    def show_record_form(self, detail):
+        """Điền bệnh án vào form và hiển thị kết quả xét nghiệm/đơn thuốc trong tab Bệnh án"""
+        record = detail[0]
+        if record[0] != self.current_record_id:
+            return  # Người dùng đã chọn bệnh án khác
+
+        # Điền dữ liệu vào form
+        self.visit_date.delete(0, tk.END)
+        self.visit_date.insert(0, display_date(record[2]))
+        self.diagnosis.delete(0, tk.END)
+        self.diagnosis.insert(0, record[3])
+        self.symptoms.delete('1.0', tk.END)
+        self.symptoms.insert('1.0', record[4] or '')
+        self.treatment.delete('1.0', tk.END)
+        self.treatment.insert('1.0', record[5] or '')
+        self.notes.delete('1.0', tk.END)
+        self.notes.insert('1.0', record[6] or '')
+        self.doctor_name.delete(0, tk.END)
+        self.doctor_name.insert(0, record[7] or '')
+
+        self.show_test_results(detail)
+        self.show_prescriptions(detail)
+
+
+    def create_detail_tab(self):
+        """Tạo tab xem chi tiết bệnh án"""
+        patient_info_frame = ttk.LabelFrame(self.detail_frame, text="Thông tin bệnh nhân", padding=10)
+        patient_info_frame.pack(fill='x', padx=10, pady=5)
+        
+        self.detail_patient_info = ttk.Label(patient_info_frame, text="Chưa chọn bệnh nhân", 
+                                           font=('Arial', 12, 'bold'))
+        self.detail_patient_info.pack(anchor='w')
+        
+        detail_list_frame = ttk.LabelFrame(self.detail_frame, text="Danh sách bệnh án chi tiết", padding=10)
+        detail_list_frame.pack(fill='both', expand=True, padx=10, pady=5)
+        
+        detail_columns = ('ID', 'Ngày khám', 'Chẩn đoán', 'Triệu chứng', 'Điều trị', 'Bác sĩ', 'Ghi chú')
+        self.medical_record_tree = ttk.Treeview(detail_list_frame, columns=detail_columns, show='headings', height=10)
+        column_widths = {'ID': 50, 'Ngày khám': 100, 'Chẩn đoán': 150, 'Triệu chứng': 200, 
+                        'Điều trị': 200, 'Bác sĩ': 120, 'Ghi chú': 150}
+        for col in detail_columns:
+            self.medical_record_tree.heading(col, text=col)
+            self.medical_record_tree.column(col, width=column_widths.get(col, 100))
+        
+        detail_scrollbar_v = ttk.Scrollbar(detail_list_frame, orient='vertical', command=self.medical_record_tree.yview)
+        detail_scrollbar_h = ttk.Scrollbar(detail_list_frame, orient='horizontal', command=self.medical_record_tree.xview)
+        self.medical_record_tree.configure(yscrollcommand=detail_scrollbar_v.set, xscrollcommand=detail_scrollbar_h.set)
+        self.medical_record_tree.pack(side='top', fill='both', expand=True)
+        detail_scrollbar_v.pack(side='right', fill='y')
+        detail_scrollbar_h.pack(side='bottom', fill='x')
+        
+        # <<TreeviewSelect>> nhận cả chọn bằng chuột và bằng phím mũi tên
+        self.medical_record_tree.bind('<<TreeviewSelect>>', self.on_medical_record_select)
+        
+        # Frame hiển thị chi tiết bệnh án được chọn
+        selected_record_frame = ttk.LabelFrame(self.detail_frame, text="Chi tiết bệnh án được chọn", padding=10)
+        selected_record_frame.pack(fill='x', padx=10, pady=5)
+        
+        self.selected_record_detail = scrolledtext.ScrolledText(selected_record_frame, height=8, width=100)
+        self.selected_record_detail.pack(fill='x', padx=5, pady=5)
+        
+        # Frame kết quả xét nghiệm
+        test_result_frame = ttk.LabelFrame(selected_record_frame, text="Kết quả xét nghiệm", padding=5)
+        test_result_frame.pack(fill='x', padx=5, pady=5)
+        
+        test_result_columns = ('ID', 'Loại xét nghiệm', 'Kết quả', 'Ghi chú')
+        self.detail_test_tree = ttk.Treeview(test_result_frame, columns=test_result_columns, show='headings', height=3)
+        for col in test_result_columns:
+            self.detail_test_tree.heading(col, text=col)
+            self.detail_test_tree.column(col, width=150)
+        self.detail_test_tree.pack(fill='x', padx=5, pady=5)
+        
+        # Frame đơn thuốc
+        prescription_frame = ttk.LabelFrame(selected_record_frame, text="Đơn thuốc", padding=5)
+        prescription_frame.pack(fill='x', padx=5, pady=5)
+        
+        prescription_columns = ('ID', 'Loại thuốc', 'Liều lượng', 'Số lượng', 'Hướng dẫn')
+        self.detail_prescription_tree = ttk.Treeview(prescription_frame, columns=prescription_columns, show='headings', height=3)
+        for col in prescription_columns:
+            self.detail_prescription_tree.heading(col, text=col)
+            self.detail_prescription_tree.column(col, width=120)
+        self.detail_prescription_tree.pack(fill='x', padx=5, pady=5)
+        
+        # Hiển thị bệnh nhân đang chọn (tab được tạo khi mở lần đầu)
+        if self.selected_patient_id:
+            self.update_medical_record_patient_info(self.selected_patient_id, self.selected_patient_name)
+            self.load_patient_medical_records(self.selected_patient_id)
+    
+    
+    def create_stats_tab(self):
+        """Tạo tab thống kê"""
+        stats_frame = ttk.Frame(self.stats_frame)
+        stats_frame.pack(fill='both', expand=True, padx=10, pady=10)
+        
+        # Frame thống kê tổng quan
+        overview_frame = ttk.LabelFrame(stats_frame, text="Thống kê tổng quan", padding=10)
+        overview_frame.pack(fill='x', pady=5)
+        
+        # Tạo các label hiển thị thống kê
+        self.total_patients_label = ttk.Label(overview_frame, text="Tổng số bệnh nhân: 0", font=('Arial', 12))
+        self.total_patients_label.pack(pady=5, anchor='w')
+        
+        self.total_records_label = ttk.Label(overview_frame, text="Tổng số bệnh án: 0", font=('Arial', 12))
+        self.total_records_label.pack(pady=5, anchor='w')
+        
+        self.today_records_label = ttk.Label(overview_frame, text="Bệnh án hôm nay: 0", font=('Arial', 12))
+        self.today_records_label.pack(pady=5, anchor='w')
+        
+        self.this_month_records_label = ttk.Label(overview_frame, text="Bệnh án tháng này: 0", font=('Arial', 12))
+        self.this_month_records_label.pack(pady=5, anchor='w')
+        
+        # Button cập nhật thống kê
+        stats_button_frame = ttk.Frame(overview_frame)
+        stats_button_frame.pack(pady=10, anchor='w')
+        ttk.Button(stats_button_frame, text="Cập nhật thống kê", command=self.update_stats).pack(side='left', padx=5)
+        ttk.Button(stats_button_frame, text="Tính lại thống kê", command=self.rebuild_stats).pack(side='left', padx=5)
+        
+        # Lọc theo khoảng tháng (áp dụng cho các bảng bên dưới)
+        filter_frame = ttk.Frame(stats_frame)
+        filter_frame.pack(fill='x', pady=5)
+        
+        ttk.Label(filter_frame, text="Từ tháng:").pack(side='left', padx=5)
+        self.stats_from_month = ttk.Combobox(filter_frame, width=10, state='readonly')
+        self.stats_from_month.pack(side='left', padx=5)
+        
+        ttk.Label(filter_frame, text="Đến tháng:").pack(side='left', padx=5)
+        self.stats_to_month = ttk.Combobox(filter_frame, width=10, state='readonly')
+        self.stats_to_month.pack(side='left', padx=5)
+        
+        ttk.Button(filter_frame, text="Lọc", command=self.update_stats).pack(side='left', padx=5)
+        ttk.Button(filter_frame, text="Tất cả", command=self.clear_stats_filter).pack(side='left', padx=5)
+        
+        # Frame thống kê theo thời gian
+        time_stats_frame = ttk.LabelFrame(stats_frame, text="Thống kê theo thời gian", padding=10)
+        time_stats_frame.pack(fill='both', expand=True, pady=5)
+        
+        # Treeview thống kê
+        stats_columns = ('Tháng/Năm', 'Số bệnh nhân mới', 'Số lượt khám', 'Tổng cộng')
+        self.stats_tree = ttk.Treeview(time_stats_frame, columns=stats_columns, show='headings', height=10)
+        
+        for col in stats_columns:
+            self.stats_tree.heading(col, text=col)
+            self.stats_tree.column(col, width=120)
+        
+        stats_scrollbar = ttk.Scrollbar(time_stats_frame, orient='vertical', command=self.stats_tree.yview)
+        self.stats_tree.configure(yscrollcommand=stats_scrollbar.set)
+        
+        self.stats_tree.pack(side='left', fill='both', expand=True)
+        stats_scrollbar.pack(side='right', fill='y')
+        
+        # Thống kê theo bác sĩ và chẩn đoán
+        breakdown_frame = ttk.Frame(stats_frame)
+        breakdown_frame.pack(fill='both', expand=True, pady=5)
+        
+        doctor_frame = ttk.LabelFrame(breakdown_frame, text="Theo bác sĩ", padding=10)
+        doctor_frame.pack(side='left', fill='both', expand=True, padx=(0, 5))
+        self.doctor_stats_tree = ttk.Treeview(doctor_frame, columns=('Bác sĩ', 'Số lượt khám'), show='headings', height=8)
+        for col in ('Bác sĩ', 'Số lượt khám'):
+            self.doctor_stats_tree.heading(col, text=col)
+        self.doctor_stats_tree.pack(fill='both', expand=True)
+        
+        diagnosis_frame = ttk.LabelFrame(breakdown_frame, text="Theo chẩn đoán", padding=10)
+        diagnosis_frame.pack(side='left', fill='both', expand=True, padx=(5, 0))
+        self.diagnosis_stats_tree = ttk.Treeview(diagnosis_frame, columns=('Chẩn đoán', 'Số lượt khám'), show='headings', height=8)
+        for col in ('Chẩn đoán', 'Số lượt khám'):
+            self.diagnosis_stats_tree.heading(col, text=col)
+        self.diagnosis_stats_tree.pack(fill='both', expand=True)
+        
+        # Cập nhật thống kê ban đầu
+        self.update_stats()
+    
+    def create_test_type_tab(self):
+        """Tạo tab quản lý loại xét nghiệm"""
+        frame = self.test_type_frame
+
+        # Frame nhập liệu
+        form_frame = ttk.LabelFrame(frame, text="Thông tin loại xét nghiệm", padding=10)
+        form_frame.pack(fill='x', padx=10, pady=5)
+
+        ttk.Label(form_frame, text="Tên xét nghiệm:").grid(row=0, column=0, sticky='w', padx=5, pady=5)
+        self.test_type_name = ttk.Entry(form_frame, width=40)
+        self.test_type_name.grid(row=0, column=1, padx=5, pady=5)
+
+        ttk.Label(form_frame, text="Mô tả:").grid(row=1, column=0, sticky='w', padx=5, pady=5)
+        self.test_type_description = ttk.Entry(form_frame, width=40)
+        self.test_type_description.grid(row=1, column=1, padx=5, pady=5)
+
+        # Buttons
+        button_frame = ttk.Frame(form_frame)
+        button_frame.grid(row=2, column=0, columnspan=2, pady=10)
+        ttk.Button(button_frame, text="Thêm", command=self.add_test_type).pack(side='left', padx=5)
+        ttk.Button(button_frame, text="Cập nhật", command=self.update_test_type).pack(side='left', padx=5)
+        ttk.Button(button_frame, text="Xóa", command=self.delete_test_type).pack(side='left', padx=5)
+        ttk.Button(button_frame, text="Làm mới", command=self.clear_test_type_form).pack(side='left', padx=5)
+
+        # Treeview danh sách loại xét nghiệm
+        list_frame = ttk.LabelFrame(frame, text="Danh sách loại xét nghiệm", padding=10)
+        list_frame.pack(fill='both', expand=True, padx=10, pady=5)
+
+        columns = ('ID', 'Tên xét nghiệm', 'Mô tả')
+        self.test_type_tree = ttk.Treeview(list_frame, columns=columns, show='headings', height=15)
+        for col in columns:
+            self.test_type_tree.heading(col, text=col)
+            self.test_type_tree.column(col, width=200)
+        
+        scrollbar = ttk.Scrollbar(list_frame, orient='vertical', command=self.test_type_tree.yview)
+        self.test_type_tree.configure(yscrollcommand=scrollbar.set)
+        self.test_type_tree.pack(side='left', fill='both', expand=True)
+        scrollbar.pack(side='right', fill='y')
+        
+        self.test_type_tree.bind('<ButtonRelease-1>', self.on_test_type_select)
+        
+        # Load danh sách
+        self.load_test_types_list()
+
+    def create_medicine_type_tab(self):
+        """Tạo tab quản lý loại thuốc"""
+        frame = self.medicine_type_frame
+
+        # Frame nhập liệu
+        form_frame = ttk.LabelFrame(frame, text="Thông tin loại thuốc", padding=10)
+        form_frame.pack(fill='x', padx=10, pady=5)
+
+        ttk.Label(form_frame, text="Tên thuốc:").grid(row=0, column=0, sticky='w', padx=5, pady=5)
+        self.medicine_type_name = ttk.Entry(form_frame, width=40)
+        self.medicine_type_name.grid(row=0, column=1, padx=5, pady=5)
+
+        ttk.Label(form_frame, text="Mô tả:").grid(row=1, column=0, sticky='w', padx=5, pady=5)
+        self.medicine_type_description = ttk.Entry(form_frame, width=40)
+        self.medicine_type_description.grid(row=1, column=1, padx=5, pady=5)
+
+        # Buttons
+        button_frame = ttk.Frame(form_frame)
+        button_frame.grid(row=2, column=0, columnspan=2, pady=10)
+        ttk.Button(button_frame, text="Thêm", command=self.add_medicine_type).pack(side='left', padx=5)
+        ttk.Button(button_frame, text="Cập nhật", command=self.update_medicine_type).pack(side='left', padx=5)
+        ttk.Button(button_frame, text="Xóa", command=self.delete_medicine_type).pack(side='left', padx=5)
+        ttk.Button(button_frame, text="Làm mới", command=self.clear_medicine_type_form).pack(side='left', padx=5)
+
+        # Treeview danh sách loại thuốc
+        list_frame = ttk.LabelFrame(frame, text="Danh sách loại thuốc", padding=10)
+        list_frame.pack(fill='both', expand=True, padx=10, pady=5)
+
+        columns = ('ID', 'Tên thuốc', 'Mô tả')
+        self.medicine_type_tree = ttk.Treeview(list_frame, columns=columns, show='headings', height=15)
+        for col in columns:
+            self.medicine_type_tree.heading(col, text=col)
+            self.medicine_type_tree.column(col, width=200)
+        
+        scrollbar = ttk.Scrollbar(list_frame, orient='vertical', command=self.medicine_type_tree.yview)
+        self.medicine_type_tree.configure(yscrollcommand=scrollbar.set)
+        self.medicine_type_tree.pack(side='left', fill='both', expand=True)
+        scrollbar.pack(side='right', fill='y')
+        
+        self.medicine_type_tree.bind('<ButtonRelease-1>', self.on_medicine_type_select)
+        
+        # Load danh sách
+        self.load_medicine_types_list()
+    def add_patient(self):
+        """Thêm bệnh nhân mới"""
+        name = self.patient_name.get().strip()
+        birth_date = self.patient_birth.get()
+        gender = self.patient_gender.get()
+        phone = self.patient_phone.get().strip()
+        address = self.patient_address.get().strip()
+
+        # Kiểm tra dữ liệu đầu vào
+        if not name:
+            messagebox.showerror("Lỗi", "Vui lòng nhập họ tên bệnh nhân!")
+            return
+        if not re.match(r'^\d{10}$', phone) and phone:
+            messagebox.showerror("Lỗi", "Số điện thoại không hợp lệ! (10 số)")
+            return
+
+        patient = (name, birth_date, gender, phone, address)
+        self.db.write(
+            lambda cursor: insert_patient(cursor, patient),
+            self.on_patient_added,
+            lambda e: messagebox.showerror("Lỗi", f"Không thể thêm bệnh nhân: {e}"))
+
+    def on_patient_added(self, row):
+        """Cập nhật giao diện sau khi đã thêm bệnh nhân"""
+        messagebox.showinfo("Thành công", "Đã thêm bệnh nhân thành công!")
+        self.clear_patient_form()
+        self.patient_list.insert_row(row)
+        self.update_stats()
+    def on_medical_record_select(self, event):
+        """Xử lý khi chọn bệnh án trong tab chi tiết"""
+        selection = self.medical_record_tree.selection()
+        if selection:
+            item = self.medical_record_tree.item(selection[0])
+            record_data = item['values']
+            
+            if record_data:
+                detail_text = f"""
+    ID: {record_data[0]}
+    Ngày khám: {record_data[1]}
+    Chẩn đoán: {record_data[2]}
+    Triệu chứng: {record_data[3]}
+    Điều trị: {record_data[4]}
+    Đơn thuốc: {record_data[5]}
+    Bác sĩ: {record_data[6]}
+    Ghi chú: {record_data[7]}
+    """
+                self.selected_record_detail.delete("1.0", tk.END)
+                self.selected_record_detail.insert("1.0", detail_text.strip())
+    
+    def update_patient(self):
+        """Cập nhật thông tin bệnh nhân"""
+        if not self.selected_patient_id:
+            messagebox.showerror("Lỗi", "Vui lòng chọn một bệnh nhân để cập nhật!")
+            return
+
+        name = self.patient_name.get().strip()
+        birth_date = self.patient_birth.get()
+        gender = self.patient_gender.get()
+        phone = self.patient_phone.get().strip()
+        address = self.patient_address.get().strip()
+
+        if not name:
+            messagebox.showerror("Lỗi", "Vui lòng nhập họ tên bệnh nhân!")
+            return
+        if not re.match(r'^\d{10}$', phone) and phone:
+            messagebox.showerror("Lỗi", "Số điện thoại không hợp lệ! (10 số)")
+            return
+
+        patient_id = self.selected_patient_id
+        patient = (name, birth_date, gender, phone, address)
+        self.db.write(
+            lambda cursor: update_patient_data(cursor, patient_id, patient),
+            self.on_patient_updated,
+            lambda e: messagebox.showerror("Lỗi", f"Không thể cập nhật bệnh nhân: {e}"))
+
+    def on_patient_updated(self, row):
+        """Cập nhật giao diện sau khi đã sửa thông tin bệnh nhân"""
+        self.record_cache.clear()  # Tên bệnh nhân nằm trong chi tiết bệnh án đã lưu
+        messagebox.showinfo("Thành công", "Đã cập nhật thông tin bệnh nhân!")
+        self.clear_patient_form()
+        self.patient_list.update_row(row)
+
+    # def clear_patient_form(self):
+    #     """Xóa nội dung các trường nhập bệnh nhân"""
+    #     self.patient_name.set("")
+    #     self.patient_birth.set("")
+    #     self.patient_gender.set("")
+    #     self.patient_phone.set("")
+    #     self.patient_address.set("")
+    
+    def delete_patient(self):
+        """Xóa bệnh nhân và tất cả dữ liệu liên quan nếu người dùng đồng ý"""
+        if not self.selected_patient_id:
+            messagebox.showerror("Lỗi", "Vui lòng chọn một bệnh nhân để xóa!")
+            return
+
+        # Kiểm tra xem bệnh nhân có bệnh án không (ở luồng nền) rồi mới hỏi người dùng
+        patient_id = self.selected_patient_id
+        self.db.read(
+            lambda cursor: count_patient_records(cursor, patient_id),
+            lambda record_count: self.confirm_delete_patient(patient_id, record_count),
+            lambda e: messagebox.showerror("Lỗi", f"Không thể kiểm tra bệnh án: {e}"))
+
+    def confirm_delete_patient(self, patient_id, record_count):
+        """Hỏi xác nhận rồi xóa bệnh nhân ở luồng nền"""
+        if record_count > 0:
+            # Hiển thị cảnh báo và hỏi người dùng
+            if not messagebox.askyesno(
+                "Cảnh báo",
+                f"Bệnh nhân này có {record_count} bệnh án liên quan. "
+                "Xóa bệnh nhân sẽ xóa tất cả bệnh án, kết quả xét nghiệm và đơn thuốc liên quan. "
+                "Bạn có chắc muốn tiếp tục?"
+            ):
+                return  # Người dùng chọn "No", hủy thao tác
+
+        if messagebox.askyesno("Xác nhận", "Bạn có chắc muốn xóa bệnh nhân này?"):
+            # Toàn bộ thao tác xóa nằm trong một giao dịch, lỗi sẽ được rollback
+            self.db.write(
+                lambda cursor: delete_patient_data(cursor, patient_id),
+                lambda _: self.on_patient_deleted(patient_id),
+                lambda e: messagebox.showerror("Lỗi", f"Không thể xóa bệnh nhân: {e}"))
+
+    def on_patient_deleted(self, patient_id):
+        """Cập nhật giao diện sau khi đã xóa bệnh nhân"""
+        self.record_cache.clear()
+        messagebox.showinfo("Thành công", "Đã xóa bệnh nhân và tất cả dữ liệu liên quan!")
+        self.clear_patient_form()
+        self.patient_list.remove_row(patient_id)
+        self.update_stats()
+    
+    def save_record(self):
+        """Lưu bệnh án mới cùng với kết quả xét nghiệm và đơn thuốc"""
+        if not self.validate_record_form():
+            return
+        
+        try:
+            patient_id = self.get_selected_patient_id()
+            if not patient_id:
+                messagebox.showwarning("Cảnh báo", "Vui lòng chọn bệnh nhân!")
+                return
+            
+            # Đọc dữ liệu từ form trên luồng giao diện trước khi chuyển sang luồng ghi
+            record = (
+                iso_date(self.visit_date.get()),
+                self.diagnosis.get(),
+                self.symptoms.get('1.0', tk.END).strip(),
+                self.treatment.get('1.0', tk.END).strip(),
+                self.notes.get('1.0', tk.END).strip(),
+                self.doctor_name.get()
+            )
+
+            # Kết quả xét nghiệm từ test_tree
+            tests = []
+            for item in self.test_tree.get_children():
+                test_data = self.test_tree.item(item)['values']
+                test_type_id = self.test_types.id_for_label(test_data[1])
+                if test_type_id is None:
+                    raise ValueError(f"Loại xét nghiệm '{test_data[1]}' không còn trong danh mục!")
+                tests.append((test_type_id, test_data[2], test_data[3]))
+
+            # Đơn thuốc từ prescription_tree
+            prescriptions = []
+            for item in self.prescription_tree.get_children():
+                prescription_data = self.prescription_tree.item(item)['values']
+                medicine_id = self.medicines.id_for_label(prescription_data[1])
+                if medicine_id is None:
+                    raise ValueError(f"Loại thuốc '{prescription_data[1]}' không còn trong danh mục!")
+                prescriptions.append((medicine_id, *prescription_data[2:5]))
+
+            # Kiểm tra toàn bộ trước khi ghi để không bao giờ lưu dở một bệnh án
+            record, tests, prescriptions = validate_record_entry(record, tests, prescriptions)
+        except ValueError as e:
+            messagebox.showwarning("Cảnh báo", str(e))
+            return
+        except Exception as e:
+            messagebox.showerror("Lỗi", f"Không thể lưu bệnh án: {str(e)}")
+            return
+
+        # Bệnh án, xét nghiệm và đơn thuốc được lưu trong cùng một giao dịch
+        self.db.write(
+            lambda cursor: insert_record(cursor, patient_id, record, tests, prescriptions),
+            lambda record_id: self.on_record_saved(patient_id, record_id),
+            lambda e: messagebox.showerror("Lỗi", f"Không thể lưu bệnh án: {str(e)}"))
+
+    def on_record_saved(self, patient_id, record_id):
+        """Cập nhật giao diện sau khi đã lưu bệnh án"""
+        messagebox.showinfo("Thành công", "Đã lưu bệnh án, kết quả xét nghiệm và đơn thuốc!")
+        self.clear_record_form()
+        self.current_record_id = record_id
+        
+        # Cập nhật danh sách bệnh án
+        self.load_records()
+        self.load_medical_records(patient_id)  # Cập nhật medical_record_tree trong tab Chi tiết
+        self.update_stats()
+    
+    def update_record(self):
+        """Cập nhật bệnh án"""
+        selected = self.record_tree.selection()
+        if not selected:
+            messagebox.showwarning("Cảnh báo", "Vui lòng chọn bệnh án để cập nhật!")
+            return
+        
+        if not self.validate_record_form():
+            return
+        
+        record_id = self.record_tree.item(selected[0])['values'][0]
+        patient_id = self.get_selected_patient_id()
+        if not patient_id:
+            messagebox.showwarning("Cảnh báo", "Vui lòng chọn bệnh nhân!")
+            return
+        
+        record = (
+            iso_date(self.visit_date.get()),
+            self.diagnosis.get(),
+            self.symptoms.get('1.0', tk.END).strip(),
+            self.treatment.get('1.0', tk.END).strip(),
+            self.notes.get('1.0', tk.END).strip(),
+            self.doctor_name.get()
+        )
+        self.db.write(
+            lambda cursor: update_record_data(cursor, record_id, record),
+            lambda result: self.on_record_changed(patient_id, record_id, "Đã cập nhật bệnh án!"),
+            lambda e: messagebox.showerror("Lỗi", f"Không thể cập nhật: {str(e)}"))
+
+    def on_record_changed(self, patient_id, record_id, message):
+        """Cập nhật giao diện sau khi đã sửa hoặc xóa bệnh án"""
+        self.record_cache.invalidate(record_id)
+        messagebox.showinfo("Thành công", message)
+        self.clear_record_form()
+        
+        # Cập nhật danh sách bệnh án
+        self.load_records()
+        self.load_medical_records(patient_id)  # Cập nhật medical_record_tree trong tab Chi tiết
+        self.update_stats()
+
+    def delete_record(self):
+        """Xóa bệnh án và tất cả dữ liệu liên quan nếu người dùng đồng ý"""
+        selected = self.record_tree.selection()
+        if not selected:
+            messagebox.showwarning("Cảnh báo", "Vui lòng chọn bệnh án để xóa!")
+            return
+        
+        record_id = self.record_tree.item(selected[0])['values'][0]
+        patient_id = self.get_selected_patient_id()
+        if not patient_id:
+            messagebox.showwarning("Cảnh báo", "Vui lòng chọn bệnh nhân!")
+            return
+        
+        # Kiểm tra xem bệnh án có kết quả xét nghiệm hoặc đơn thuốc không
+        self.db.read(
+            lambda cursor: count_record_items(cursor, record_id),
+            lambda counts: self.confirm_delete_record(patient_id, record_id, *counts),
+            lambda e: messagebox.showerror("Lỗi", f"Không thể xóa: {e}"))
+
+    def confirm_delete_record(self, patient_id, record_id, test_count, prescription_count):
+        """Hỏi xác nhận rồi xóa bệnh án trong một giao dịch"""
+        if test_count > 0 or prescription_count > 0:
+            # Hiển thị cảnh báo và hỏi người dùng
+            if not messagebox.askyesno(
+                "Cảnh báo",
+                f"Bệnh án này có {test_count} kết quả xét nghiệm và {prescription_count} đơn thuốc liên quan. "
+                "Xóa bệnh án sẽ xóa tất cả dữ liệu liên quan. Bạn có chắc muốn tiếp tục?"
+            ):
+                return  # Người dùng chọn "No", hủy thao tác
+        
+        if messagebox.askyesno("Xác nhận", "Bạn có chắc chắn muốn xóa bệnh án này?"):
+            self.db.write(
+                lambda cursor: delete_record_data(cursor, [record_id]),
+                lambda result: self.on_record_changed(patient_id, record_id,
+                                                      "Đã xóa bệnh án và tất cả dữ liệu liên quan!"),
+                lambda e: messagebox.showerror("Lỗi", f"Không thể xóa: {str(e)}"))
+    
+    def load_patients(self):
+        """Tải trang đầu danh sách bệnh nhân vào treeview (các trang sau tải khi cuộn)"""
+        try:
+            self.patient_list.reset('created_date')
+        except Exception as e:
+            messagebox.showerror("Lỗi", f"Không thể tải danh sách bệnh nhân: {e}")
+    
+    def load_patient_combo(self):
+        """Tải danh sách bệnh nhân (theo tên) vào combobox; gõ tên/SĐT để tìm bệnh nhân khác"""
+        self.db.read(
+            lambda cursor: fetch_patient_page(cursor, 'name', limit=PATIENT_COMBO_LIMIT),
+            self.show_patient_combo,
+            lambda e: messagebox.showerror("Lỗi", f"Không thể tải danh sách bệnh nhân: {e}"),
+            key='patient_combo')
+
+    def search_patient_combo(self, event):
+        """Tìm bệnh nhân theo chữ đang gõ trong combobox (chờ người dùng ngừng gõ)"""
+        if event.keysym in NAVIGATION_KEYS:
+            return
+        if self.patient_combo_after_id is not None:
+            self.root.after_cancel(self.patient_combo_after_id)
+        self.patient_combo_after_id = self.root.after(SEARCH_DELAY_MS, self.run_patient_combo_search)
+
+    def run_patient_combo_search(self):
+        self.patient_combo_after_id = None
+        term = self.record_patient_combo.get().strip()
+        if build_search_query(term) is None:
+            self.load_patient_combo()
+            return
+        self.db.read(
+            lambda cursor: find_patients(cursor, term, PATIENT_COMBO_LIMIT),
+            self.show_patient_combo,
+            lambda e: messagebox.showerror("Lỗi", f"Lỗi tìm kiếm: {e}"),
+            key='patient_combo')
+
+    def show_patient_combo(self, patients):
+        """Hiển thị danh sách bệnh nhân trong combobox"""
+        self.record_patient_combo['values'] = [f"{p[0]} - {p[1]}" for p in patients]
+
+    def load_records(self):
+        """Tải danh sách bệnh án của bệnh nhân được chọn (truy vấn ở luồng nền)"""
+        # Xóa dữ liệu cũ trong bảng record_tree
+        for item in self.record_tree.get_children():
+            self.record_tree.delete(item)
+
+        # Lấy ID bệnh nhân đang được chọn
+        patient_id = self.get_selected_patient_id()
+        if not patient_id:
+            return
+
+        # Gán ID vào biến toàn cục
+        self.selected_patient_id = patient_id
+
+        # Chọn nhanh nhiều bệnh nhân liên tiếp chỉ chạy truy vấn cuối cùng
+        self.db.read(
+            lambda cursor: fetch_patient_records(cursor, patient_id),
+            lambda result: self.show_records(patient_id, *result),
+            lambda e: messagebox.showerror("Lỗi", f"Không thể tải danh sách bệnh án: {e}"),
+            key='records')
+
+    def show_records(self, patient_id, patient_name, records):
+        """Hiển thị danh sách bệnh án đã tải vào record_tree"""
+        self.selected_patient_name = patient_name or "Không rõ"
+
+        # ✅ Cập nhật label hiển thị thông tin bệnh nhân
+        self.update_medical_record_patient_info(patient_id, self.selected_patient_name)
+
+        # Hiển thị các bệnh án trong treeview
+        self.record_tree.delete(*self.record_tree.get_children())
+        for record in records:
+            self.record_tree.insert('', 'end', values=(record[0], display_date(record[1]), *record[2:]))
+    
+    def search_patients(self, event=None):
+        """Hẹn tìm kiếm bệnh nhân; mỗi lần gõ phím sẽ hủy lần tìm đang chờ trước đó"""
+        if self.search_after_id is not None:
+            self.root.after_cancel(self.search_after_id)
+        self.search_after_id = self.root.after(SEARCH_DELAY_MS, self.run_patient_search)
+
+    def run_patient_search(self):
+        """Tìm kiếm bệnh nhân qua chỉ mục FTS5 (không phân biệt dấu, khớp tiền tố)"""
+        self.search_after_id = None
+        search_term = self.search_patient.get().strip()
+        if build_search_query(search_term) is None:
+            # Ô tìm kiếm trống hoặc quá ngắn: quay lại danh sách mặc định (mới nhất trước) như lúc khởi động
+            self.db.cancel('patient_search')
+            self.load_patients()
+            return
+        # Truy vấn cũ chưa xong sẽ bị hủy, chỉ kết quả của lần gõ cuối được hiển thị
+        self.db.read(
+            lambda cursor: find_patients(cursor, search_term),
+            self.patient_list.show_results,
+            lambda e: messagebox.showerror("Lỗi", f"Không thể tìm kiếm bệnh nhân: {e}"),
+            key='patient_search')
+    
+    def on_patient_select(self, event):
+        """Xử lý khi chọn bệnh nhân"""
+        selected = self.patient_tree.selection()
+        if selected:
+            patient_data = self.patient_tree.item(selected[0])['values']
+            self.selected_patient_id = patient_data[0]
+            self.patient_name.delete(0, tk.END)
+            self.patient_name.insert(0, patient_data[1])
+            self.patient_birth.delete(0, tk.END)
+            self.patient_birth.insert(0, patient_data[2])
+            self.patient_gender.set(patient_data[3])
+            self.patient_phone.delete(0, tk.END)
+            self.patient_phone.insert(0, patient_data[4])
+            self.patient_address.delete(0, tk.END)
+            self.patient_address.insert(0, patient_data[5])
+    
+    def on_patient_combo_select(self, event):
+        """Xử lý khi chọn bệnh nhân từ combobox"""
+        self.load_records()
+    
+    def on_record_select(self, event):
+        """Xử lý khi chọn bệnh án: chuyển sang tab Chi tiết Bệnh án và hiển thị thông tin"""
+        selected = self.record_tree.selection()
+        if selected:
+            record_id = self.record_tree.item(selected[0])['values'][0]
+            self.current_record_id = record_id  # Lưu record_id để sử dụng trong tab Chi tiết
+
+            # Chuyển sang tab Chi tiết Bệnh án
+            self.show_tab(self.detail_frame)
+
+            # Tải bệnh án, sau đó tải danh sách bệnh án của bệnh nhân và chọn bệnh án này
+            self.load_record_detail(record_id, reload_list=True)
+    def load_medical_records(self, patient_id, select_record_id=None):
+        """Tải danh sách bệnh án của bệnh nhân vào medical_record_tree (truy vấn ở luồng nền)"""
+        if not self.is_tab_built(self.detail_frame):
+            return
+        self.db.read(
+            lambda cursor: fetch_medical_records(cursor, patient_id),
+            lambda records: self.show_medical_records(records, select_record_id),
+            lambda e: messagebox.showerror("Lỗi", f"Không thể tải danh sách bệnh án: {e}"),
+            key='medical_records')
+
+    def show_medical_records(self, records, select_record_id=None):
+        """Hiển thị danh sách bệnh án vào medical_record_tree"""
+        self.medical_record_tree.delete(*self.medical_record_tree.get_children())
+        for record in records:
+            item = self.medical_record_tree.insert('', 'end',
+                                                   values=(record[0], display_date(record[1]), *record[2:]))
+            # Chọn bệnh án trong medical_record_tree
+            if record[0] == select_record_id:
+                self.medical_record_tree.selection_set(item)
+                self.medical_record_tree.focus(item)
+    def get_selected_patient_id(self):
+        """Lấy ID bệnh nhân được chọn (None nếu combobox đang chứa chữ gõ tìm kiếm)"""
+        match = re.match(r'^(\d+) - ', self.record_patient_combo.get())
+        if match:
+            return int(match.group(1))
+        return None
+    
+    def validate_patient_form(self):
+        """Validate form bệnh nhân"""
+        if not self.patient_name.get().strip():
+            messagebox.showwarning("Cảnh báo", "Vui lòng nhập tên bệnh nhân!")
+            return False
+        
+        # Validate ngày sinh (optional)
+        birth_date = self.patient_birth.get().strip()
+        if birth_date and not re.match(r'^\d{2}/\d{2}/\d{4}$', birth_date):
+            messagebox.showwarning("Cảnh báo", "Ngày sinh không đúng định dạng (dd/mm/yyyy)!")
+            return False
+        
+        # Validate số điện thoại (optional)
+        phone = self.patient_phone.get().strip()
+        if phone and not re.match(r'^\d{10,11}$', phone):
+            messagebox.showwarning("Cảnh báo", "Số điện thoại không hợp lệ!")
+            return False
+        
+        return True
+    
+    def validate_record_form(self):
+        """Validate form bệnh án"""
+
+        if not self.diagnosis.get().strip():
+            messagebox.showwarning("Cảnh báo", "Vui lòng nhập chẩn đoán!")
+            return False
+
+        visit_date = self.visit_date.get().strip()
+        if not visit_date:
+            messagebox.showwarning("Cảnh báo", "Vui lòng nhập ngày khám!")
+            return False
+
+        if not re.match(r'^\d{2}/\d{2}/\d{4}$', visit_date):
+            messagebox.showwarning("Cảnh báo", "Ngày khám không đúng định dạng (dd/mm/yyyy)!")
+            return False
+
+        try:
+            datetime.strptime(visit_date, "%d/%m/%Y")  # ✅ dùng đúng hàm
+        except ValueError:
+            messagebox.showwarning("Cảnh báo", "Ngày khám không hợp lệ!")
+            return False
+
+        return True
+    def clear_patient_form(self):
+        """Xóa nội dung form bệnh nhân"""
+        self.patient_name.delete(0, tk.END)
+        self.patient_birth.delete(0, tk.END)
+        self.patient_gender.set('')
+        self.patient_phone.delete(0, tk.END)
+        self.patient_address.delete(0, tk.END)
+        self.search_patient.delete(0, tk.END)
+        
+        # Clear selection trong treeview
+        for item in self.patient_tree.selection():
+            self.patient_tree.selection_remove(item)
+    
+    def clear_record_form(self):
+        """Xóa dữ liệu trong form bệnh án"""
+        self.visit_date.delete(0, tk.END)
+        self.diagnosis.delete(0, tk.END)
+        self.symptoms.delete('1.0', tk.END)
+        self.treatment.delete('1.0', tk.END)
+        self.notes.delete('1.0', tk.END)
+        self.doctor_name.delete(0, tk.END)
+        self.test_result.delete(0, tk.END)
+        self.test_notes.delete(0, tk.END)
+        self.dosage.delete(0, tk.END)
+        self.quantity.delete(0, tk.END)
+        self.instructions.delete(0, tk.END)
+        self.test_type_combo.set('')
+        self.medicine_type_combo.set('')
+        self.load_test_types()
+        self.load_medicine_types()
+        self.test_tree.delete(*self.test_tree.get_children())
+        self.prescription_tree.delete(*self.prescription_tree.get_children())
+        self.current_record_id = None
+    
+    def view_record_detail(self):
+        """Chuyển sang tab chi tiết bệnh án"""
+        if not self.selected_patient_id:
+            messagebox.showerror("Lỗi", "Vui lòng chọn một bệnh nhân!")
+            return
+        self.show_tab(self.detail_frame)
+        self.update_medical_record_patient_info(self.selected_patient_id, self.selected_patient_name)
+        self.load_patient_medical_records(self.selected_patient_id)
+    
+    def update_stats(self):
+        """Cập nhật thống kê tổng quan và theo thời gian (đọc từ bảng tổng hợp)"""
+        if not self.is_tab_built(self.stats_frame):
+            return  # Thống kê được tính khi mở tab Thống kê lần đầu
+        today = date.today()
+        start_month = month_key(self.stats_from_month.get())
+        end_month = month_key(self.stats_to_month.get())
+        if start_month and end_month and start_month > end_month:
+            start_month, end_month = end_month, start_month
+        self.db.read(
+            lambda cursor: fetch_stats(cursor, today, start_month, end_month),
+            partial(self.show_stats, filtered=bool(start_month or end_month)),
+            lambda e: messagebox.showerror("Lỗi", f"Không thể cập nhật thống kê: {e}"),
+            key='stats')
+
+    def show_stats(self, stats, filtered=False):
+        """Hiển thị kết quả thống kê"""
+        total_patients, total_records, today_records, month_records, monthly, by_doctor, by_diagnosis = stats
+        self.total_patients_label.config(text=f"Tổng số bệnh nhân: {total_patients}")
+        self.total_records_label.config(text=f"Tổng số bệnh án: {total_records}")
+        self.today_records_label.config(text=f"Bệnh án hôm nay: {today_records}")
+        self.this_month_records_label.config(text=f"Bệnh án tháng này: {month_records}")
+
+        # Danh sách tháng để lọc lấy từ kết quả không lọc
+        if not filtered:
+            months = [stat[0] for stat in monthly]
+            self.stats_from_month['values'] = months
+            self.stats_to_month['values'] = months
+
+        # Thống kê theo tháng/năm
+        self.stats_tree.delete(*self.stats_tree.get_children())
+        for stat in monthly:
+            total = stat[1] + stat[2]
+            self.stats_tree.insert('', 'end', values=(stat[0], stat[1], stat[2], total))
+
+        self.doctor_stats_tree.delete(*self.doctor_stats_tree.get_children())
+        for doctor_name, visits in by_doctor:
+            self.doctor_stats_tree.insert('', 'end', values=(doctor_name or '(Không rõ)', visits))
+
+        self.diagnosis_stats_tree.delete(*self.diagnosis_stats_tree.get_children())
+        for diagnosis, visits in by_diagnosis:
+            self.diagnosis_stats_tree.insert('', 'end', values=(diagnosis or '(Không rõ)', visits))
+
+    def clear_stats_filter(self):
+        """Bỏ lọc theo tháng"""
+        self.stats_from_month.set('')
+        self.stats_to_month.set('')
+        self.update_stats()
+
+    def rebuild_stats(self):
+        """Tính lại bảng thống kê từ dữ liệu gốc"""
+        self.db.write(
+            rebuild_stats,
+            lambda result: self.update_stats(),
+            lambda e: messagebox.showerror("Lỗi", f"Không thể tính lại thống kê: {e}"))
+
+    def load_catalogue(self, catalogue, callback):
+        """Gọi callback() khi danh mục đã có trong bộ nhớ (chỉ truy vấn database ở lần đầu)"""
+        if catalogue.loaded():
+            callback()
+            return
+        catalogue.waiting.append(callback)
+        if len(catalogue.waiting) == 1:
+            self.db.read(
+                lambda cursor: fetch_catalogue(cursor, catalogue.table),
+                lambda rows: self.on_catalogue_loaded(catalogue, rows),
+                lambda e: self.on_catalogue_error(catalogue, e))
+
+    def on_catalogue_loaded(self, catalogue, rows):
+        catalogue.set_rows(rows)
+        callbacks, catalogue.waiting = catalogue.waiting, []
+        for callback in callbacks:
+            callback()
+
+    def on_catalogue_error(self, catalogue, e):
+        catalogue.waiting.clear()
+        messagebox.showerror("Lỗi", f"Không thể tải danh mục: {e}")
+
+    def refresh_catalogue_combo(self, combo, catalogue):
+        """Đặt lại danh sách combobox từ danh mục, giữ lựa chọn hiện tại nếu vẫn còn"""
+        combo['values'] = catalogue.filter('')
+        current = catalogue.id_for_label(combo.get())
+        if current is not None:
+            combo.set(catalogue.label(current))
+        elif combo['values']:
+            combo.set(combo['values'][0])
+        else:
+            combo.set('')
+
+    def filter_catalogue_combo(self, event, combo, catalogue):
+        """Lọc danh sách combobox theo chữ đang gõ (trong bộ nhớ, không truy vấn database)"""
+        if event.keysym in NAVIGATION_KEYS or not catalogue.loaded():
+            return
+        combo['values'] = catalogue.filter(combo.get())
+
+    def load_test_types(self):
+        """Tải danh sách loại xét nghiệm vào combobox"""
+        if not self.is_tab_built(self.record_frame):
+            return  # Combobox được tải khi mở tab Bệnh án lần đầu
+        self.load_catalogue(self.test_types,
+                            lambda: self.refresh_catalogue_combo(self.test_type_combo, self.test_types))
+
+    def load_medicine_types(self):
+        """Tải danh sách loại thuốc vào combobox"""
+        if not self.is_tab_built(self.record_frame):
+            return  # Combobox được tải khi mở tab Bệnh án lần đầu
+        self.load_catalogue(self.medicines,
+                            lambda: self.refresh_catalogue_combo(self.medicine_type_combo, self.medicines))
+
+    def add_test_result(self):
+        """Thêm kết quả xét nghiệm vào test_tree"""
+        test_type = self.test_type_combo.get()
+        result = self.test_result.get().strip()
+        notes = self.test_notes.get().strip()
+        
+        if not test_type or not result:
+            messagebox.showerror("Lỗi", "Vui lòng nhập loại xét nghiệm và kết quả!")
+            return
+        test_type_id = self.test_types.id_for_label(test_type)
+        if test_type_id is None:
+            messagebox.showerror("Lỗi", "Vui lòng chọn loại xét nghiệm trong danh sách!")
+            return
+        
+        try:
+            # Thêm vào test_tree với ID tạm thời (sẽ được cập nhật khi lưu vào DB)
+            self.test_tree.insert('', 'end', values=(
+                'TEMP',  # ID tạm thời
+                self.test_types.label(test_type_id),  # Nhãn "ID - Tên", save_record tra lại id từ danh mục
+                result,
+                notes
+            ))
+            messagebox.showinfo("Thành công", "Đã thêm kết quả xét nghiệm vào danh sách tạm thời!")
+            self.clear_test_form()
+        except Exception as e:
+            messagebox.showerror("Lỗi", f"Không thể thêm xét nghiệm: {e}")
+
+    def delete_test_result(self):
+        """Xóa kết quả xét nghiệm"""
+        selection = self.test_tree.selection()
+        if not selection:
+            messagebox.showerror("Lỗi", "Vui lòng chọn một xét nghiệm để xóa!")
+            return
+        
+        test_id = self.test_tree.item(selection[0])['values'][0]
+        if messagebox.askyesno("Xác nhận", "Bạn có chắc muốn xóa xét nghiệm này?"):
+            if test_id == 'TEMP':
+                # Chưa lưu vào database, chỉ cần bỏ khỏi danh sách tạm thời
+                self.test_tree.delete(selection[0])
+                return
+            record_id = self.current_record_id
+            self.db.write(
+                lambda cursor: delete_test_results(cursor, [test_id]),
+                lambda result: self.on_record_item_deleted("Đã xóa xét nghiệm!", self.show_test_results, record_id),
+                lambda e: messagebox.showerror("Lỗi", f"Không thể xóa xét nghiệm: {e}"))
+
+    def on_record_item_deleted(self, message, show, record_id):
+        """Thông báo và tải lại danh sách sau khi xóa xét nghiệm hoặc đơn thuốc"""
+        self.record_cache.invalidate(record_id)
+        messagebox.showinfo("Thành công", message)
+        self.get_record_detail(record_id, show, key='record_form')
+
+    def add_prescription(self):
+        """Thêm đơn thuốc vào prescription_tree"""
+        medicine_type = self.medicine_type_combo.get()
+        dosage = self.dosage.get().strip()
+        quantity = self.quantity.get().strip()
+        instructions = self.instructions.get().strip()
+        
+        if not medicine_type or not dosage or not quantity:
+            messagebox.showerror("Lỗi", "Vui lòng nhập đầy đủ thông tin đơn thuốc!")
+            return
+        medicine_id = self.medicines.id_for_label(medicine_type)
+        if medicine_id is None:
+            messagebox.showerror("Lỗi", "Vui lòng chọn loại thuốc trong danh sách!")
+            return
+        
+        try:
+            quantity = int(quantity)  # Kiểm tra số lượng là số nguyên
+            # Thêm vào prescription_tree với ID tạm thời (sẽ được cập nhật khi lưu vào DB)
+            self.prescription_tree.insert('', 'end', values=(
+                'TEMP',  # ID tạm thời
+                self.medicines.label(medicine_id),  # Nhãn "ID - Tên", save_record tra lại id từ danh mục
+                dosage,
+                quantity,
+                instructions
+            ))
+            messagebox.showinfo("Thành công", "Đã thêm đơn thuốc vào danh sách tạm thời!")
+            self.clear_prescription_form()
+        except ValueError:
+            messagebox.showerror("Lỗi", "Số lượng phải là số nguyên!")
+        except Exception as e:
+            messagebox.showerror("Lỗi", f"Không thể thêm đơn thuốc: {e}")
+
+    def delete_prescription(self):
+        """Xóa đơn thuốc"""
+        selection = self.prescription_tree.selection()
+        if not selection:
+            messagebox.showerror("Lỗi", "Vui lòng chọn một đơn thuốc để xóa!")
+            return
+        
+        prescription_id = self.prescription_tree.item(selection[0])['values'][0]
+        if messagebox.askyesno("Xác nhận", "Bạn có chắc muốn xóa đơn thuốc này?"):
+            if prescription_id == 'TEMP':
+                self.prescription_tree.delete(selection[0])
+                return
+            record_id = self.current_record_id
+            self.db.write(
+                lambda cursor: delete_prescriptions(cursor, [prescription_id]),
+                lambda result: self.on_record_item_deleted("Đã xóa đơn thuốc!", self.show_prescriptions, record_id),
+                lambda e: messagebox.showerror("Lỗi", f"Không thể xóa đơn thuốc: {e}"))
+
+    def show_test_results(self, detail):
+        """Hiển thị kết quả xét nghiệm của bệnh án đang chọn trong tab Bệnh án"""
+        if detail[0][0] != self.current_record_id:
+            return
+        self.test_tree.delete(*self.test_tree.get_children())
+        for test in detail[2]:
+            self.test_tree.insert('', 'end', values=test)
+
+    def show_prescriptions(self, detail):
+        """Hiển thị đơn thuốc của bệnh án đang chọn trong tab Bệnh án"""
+        if detail[0][0] != self.current_record_id:
+            return
+        self.prescription_tree.delete(*self.prescription_tree.get_children())
+        for prescription in detail[3]:
+            self.prescription_tree.insert('', 'end', values=prescription)
+
+    def clear_test_form(self):
+        """Làm mới form xét nghiệm"""
+        self.test_result.delete(0, tk.END)
+        self.test_notes.delete(0, tk.END)
+        self.test_type_combo.set('')
+        self.load_test_types()
+
+    def clear_prescription_form(self):
+        """Làm mới form đơn thuốc"""
+        self.dosage.delete(0, tk.END)
+        self.quantity.delete(0, tk.END)
+        self.instructions.delete(0, tk.END)
+        self.medicine_type_combo.set('')
+        self.load_medicine_types()
+
+    def on_test_select(self, event):
+        """Xử lý khi chọn kết quả xét nghiệm"""
+        selection = self.test_tree.selection()
+        if selection:
+            item = self.test_tree.item(selection[0])
+            test_data = item['values']
+            self.clear_test_form()
+            test_type_id = self.test_types.id_for_label(test_data[1])
+            if test_type_id is not None:
+                self.test_type_combo.set(self.test_types.label(test_type_id))
+            self.test_result.insert(0, test_data[2])
+            self.test_notes.insert(0, test_data[3])
+
+    def on_prescription_select(self, event):
+        """Xử lý khi chọn đơn thuốc"""
+        selection = self.prescription_tree.selection()
+        if selection:
+            item = self.prescription_tree.item(selection[0])
+            prescription_data = item['values']
+            self.clear_prescription_form()
+            medicine_id = self.medicines.id_for_label(prescription_data[1])
+            if medicine_id is not None:
+                self.medicine_type_combo.set(self.medicines.label(medicine_id))
+            self.dosage.insert(0, prescription_data[2])
+            self.quantity.insert(0, prescription_data[3])
+            self.instructions.insert(0, prescription_data[4])
+
+    def on_medical_record_select(self, event):
+        """Xử lý khi chọn bệnh án từ medical_record_tree trong tab Chi tiết Bệnh án"""
+        selected = self.medical_record_tree.selection()
+        if selected:
+            record_id = self.medical_record_tree.item(selected[0])['values'][0]
+            self.current_record_id = record_id
+            self.load_record_detail(record_id)
+            self.prefetch_records(selected[0])
+
+    def prefetch_records(self, item):
+        """Nạp trước các bệnh án liền kề trong medical_record_tree để chuyển bằng phím mũi tên không phải chờ"""
+        items = self.medical_record_tree.get_children()
+        index = items.index(item)
+        neighbours = items[max(0, index - PREFETCH_RECORDS):index + PREFETCH_RECORDS + 1]
+        record_ids = [self.medical_record_tree.item(neighbour)['values'][0] for neighbour in neighbours]
+        record_ids = [record_id for record_id in record_ids if record_id not in self.record_cache]
+        if not record_ids:
+            return
+        generation = self.record_cache.generation
+        self.db.read(
+            lambda cursor: fetch_record_details(cursor, record_ids),
+            lambda details: self.record_cache.put_many(details, generation),
+            key='record_prefetch')
+
+    def get_record_detail(self, record_id, callback, key):
+        """Gọi callback(detail) với chi tiết bệnh án: lấy ngay từ bộ nhớ đệm hoặc đọc ở luồng nền
+
+        detail = (record, patient_name, tests, prescriptions); bệnh án không còn
+        tồn tại thì không gọi callback.
+        """
+        detail = self.record_cache.get(record_id)
+        if detail is not None:
+            callback(detail)
+            return
+        generation = self.record_cache.generation
+        self.db.read(
+            lambda cursor: fetch_record_detail(cursor, record_id),
+            lambda detail: self.on_record_detail_loaded(record_id, detail, generation, callback),
+            lambda e: messagebox.showerror("Lỗi", f"Không thể tải chi tiết bệnh án: {e}"),
+            key=key)
+
+    def on_record_detail_loaded(self, record_id, detail, generation, callback):
+        if detail[0] is None:
+            return
+        self.record_cache.put(record_id, detail, generation)
+        callback(detail)
+
+    def load_record_detail(self, record_id, reload_list=False):
+        """Hiển thị bệnh án, kết quả xét nghiệm và đơn thuốc trong tab Chi tiết
+
+        Lấy từ bộ nhớ đệm nếu có, nếu không thì đọc ở luồng nền; chọn liên tiếp
+        nhiều bệnh án chỉ chạy truy vấn của bệnh án cuối cùng.
+        reload_list=True: tải lại medical_record_tree theo bệnh nhân của bệnh án.
+        """
+        self.detail_record_id = record_id
+        self.get_record_detail(record_id, partial(self.show_record_detail, reload_list=reload_list),
+                               key='record_detail')
+
+    def show_record_detail(self, detail, reload_list=False):
+        """Hiển thị chi tiết bệnh án, kết quả xét nghiệm và đơn thuốc trong tab Chi tiết"""
+        record, patient_name, tests, prescriptions = detail
+        if record[0] != self.detail_record_id:
+            return  # Người dùng đã chọn bệnh án khác
+
+        if reload_list:
+            # Cập nhật thông tin bệnh nhân và danh sách bệnh án của bệnh nhân
+            self.detail_patient_info.config(text=f"Bệnh nhân: {patient_name}")
+            self.load_medical_records(record[1], select_record_id=record[0])
+
+        # Cập nhật chi tiết bệnh án trong selected_record_detail
+        self.selected_record_detail.delete('1.0', tk.END)
+        self.selected_record_detail.insert('1.0', 
+            f"ID: {record[0]}\n"
+            f"Ngày khám: {display_date(record[2])}\n"
+            f"Chẩn đoán: {record[3]}\n"
+            f"Triệu chứng: {record[4]}\n"
+            f"Điều trị: {record[5]}\n"
+            f"Bác sĩ: {record[7]}\n"
+            f"Ghi chú: {record[6]}"
+        )
+
+        # Kết quả xét nghiệm và đơn thuốc
+        self.detail_test_tree.delete(*self.detail_test_tree.get_children())
+        for test in tests:
+            self.detail_test_tree.insert('', 'end', values=test)
+        self.detail_prescription_tree.delete(*self.detail_prescription_tree.get_children())
+        for prescription in prescriptions:
+            self.detail_prescription_tree.insert('', 'end', values=prescription)
+
+    # def save_record(self):
+    #     """Lưu bệnh án mới"""
+    #     if not self.selected_patient_id:
+    #         messagebox.showerror("Lỗi", "Vui lòng chọn một bệnh nhân!")
+    #         return
+
+    #     visit_date = self.visit_date.get()
+    #     diagnosis = self.diagnosis.get().strip()
+    #     symptoms = self.symptoms.get("1.0", tk.END).strip()
+    #     treatment = self.treatment.get("1.0", tk.END).strip()
+    #     notes = self.notes.get("1.0", tk.END).strip()
+    #     doctor_name = self.doctor_name.get().strip()
+
+    #     if not diagnosis:
+    #         messagebox.showerror("Lỗi", "Vui lòng nhập chẩn đoán!")
+    #         return
+
+    #     try:
+    #         self.cursor.execute('''
+    #             INSERT INTO medical_records (patient_id, visit_date, diagnosis, symptoms, treatment, 
+    #                                       notes, doctor_name)
+    #             VALUES (?, ?, ?, ?, ?, ?, ?)
+    #         ''', (self.selected_patient_id, visit_date, diagnosis, symptoms, treatment, 
+    #               notes, doctor_name))
+    #         self.conn.commit()
+    #         self.current_record_id = self.cursor.lastrowid
+    #         messagebox.showinfo("Thành công", "Đã lưu bệnh án!")
+    #         self.clear_record_form()
+    #         self.load_patient_medical_records(self.selected_patient_id)
+    #         self.update_stats()
+    #     except Exception as e:
+    #         messagebox.showerror("Lỗi", f"Không thể lưu bệnh án: {e}")
+
+    def add_test_type(self):
+        """Thêm loại xét nghiệm"""
+        name = self.test_type_name.get().strip()
+        description = self.test_type_description.get().strip()
+
+        if not name:
+            messagebox.showerror("Lỗi", "Vui lòng nhập tên xét nghiệm!")
+            return
+
+        self.db.write(
+            lambda cursor: insert_catalogue_row(cursor, 'test_types', name, description),
+            lambda row_id: self.on_test_type_saved(row_id, name, description, "Đã thêm loại xét nghiệm!"),
+            lambda e: messagebox.showerror("Lỗi", f"Không thể thêm loại xét nghiệm: {e}"))
+
+    def update_test_type(self):
+        """Cập nhật loại xét nghiệm"""
+        selection = self.test_type_tree.selection()
+        if not selection:
+            messagebox.showerror("Lỗi", "Vui lòng chọn một loại xét nghiệm để cập nhật!")
+            return
+
+        test_type_id = self.test_type_tree.item(selection[0])['values'][0]
+        name = self.test_type_name.get().strip()
+        description = self.test_type_description.get().strip()
+
+        if not name:
+            messagebox.showerror("Lỗi", "Vui lòng nhập tên xét nghiệm!")
+            return
+
+        self.db.write(
+            lambda cursor: update_catalogue_row(cursor, 'test_types', test_type_id, name, description),
+            lambda _: self.on_test_type_saved(test_type_id, name, description, "Đã cập nhật loại xét nghiệm!"),
+            lambda e: messagebox.showerror("Lỗi", f"Không thể cập nhật loại xét nghiệm: {e}"))
+
+    def on_test_type_saved(self, row_id, name, description, message):
+        """Cập nhật danh mục trong bộ nhớ, danh sách và combobox sau khi thêm/sửa loại xét nghiệm"""
+        self.test_types.put(row_id, name, description)
+        self.record_cache.clear()  # Tên loại xét nghiệm nằm trong chi tiết bệnh án đã lưu
+        messagebox.showinfo("Thành công", message)
+        self.clear_test_type_form()
+        self.show_catalogue_row(self.test_type_tree, self.test_types, row_id)
+        self.load_test_types()  # Cập nhật combobox trong tab bệnh án
+
+    def delete_test_type(self):
+        """Xóa loại xét nghiệm"""
+        selection = self.test_type_tree.selection()
+        if not selection:
+            messagebox.showerror("Lỗi", "Vui lòng chọn một loại xét nghiệm để xóa!")
+            return
+
+        test_type_id = self.test_type_tree.item(selection[0])['values'][0]
+        if messagebox.askyesno("Xác nhận", "Bạn có chắc muốn xóa loại xét nghiệm này?"):
+            # Chỉ xóa khi loại xét nghiệm không được sử dụng trong test_results
+            self.db.write(
+                lambda cursor: delete_catalogue_row(cursor, 'test_types', test_type_id),
+                lambda deleted: self.on_test_type_deleted(test_type_id, deleted),
+                lambda e: messagebox.showerror("Lỗi", f"Không thể xóa loại xét nghiệm: {e}"))
+
+    def on_test_type_deleted(self, row_id, deleted):
+        """Cập nhật giao diện sau khi xóa loại xét nghiệm"""
+        if not deleted:
+            messagebox.showerror("Lỗi", "Không thể xóa vì loại xét nghiệm này đang được sử dụng!")
+            return
+        self.test_types.remove(row_id)
+        messagebox.showinfo("Thành công", "Đã xóa loại xét nghiệm!")
+        self.clear_test_type_form()
+        if self.test_type_tree.exists(str(row_id)):
+            self.test_type_tree.delete(str(row_id))
+        self.load_test_types()  # Cập nhật combobox trong tab bệnh án
+
+    def clear_test_type_form(self):
+        """Làm mới form loại xét nghiệm"""
+        self.test_type_name.delete(0, tk.END)
+        self.test_type_description.delete(0, tk.END)
+
+    def on_test_type_select(self, event):
+        """Xử lý khi chọn loại xét nghiệm từ treeview"""
+        selection = self.test_type_tree.selection()
+        if selection:
+            item = self.test_type_tree.item(selection[0])
+            test_type_data = item['values']
+            self.clear_test_type_form()
+            self.test_type_name.insert(0, test_type_data[1])
+            self.test_type_description.insert(0, test_type_data[2])
+
+    def load_test_types_list(self):
+        """Tải danh sách loại xét nghiệm (từ danh mục trong bộ nhớ)"""
+        self.load_catalogue(self.test_types, lambda: self.show_catalogue_list(self.test_type_tree, self.test_types))
+
+    def show_catalogue_list(self, tree, catalogue):
+        """Hiển thị toàn bộ danh mục vào treeview quản lý (iid là id để sửa từng dòng)"""
+        tree.delete(*tree.get_children())
+        for row in catalogue.list_rows():
+            tree.insert('', 'end', iid=str(row[0]), values=row)
+
+    def show_catalogue_row(self, tree, catalogue, row_id):
+        """Thêm hoặc cập nhật đúng một dòng của treeview quản lý"""
+        if not catalogue.loaded():
+            return
+        values = (row_id, *catalogue.rows[row_id])
+        if tree.exists(str(row_id)):
+            tree.item(str(row_id), values=values)
+        else:
+            tree.insert('', 'end', iid=str(row_id), values=values)
+
+    def add_medicine_type(self):
+        """Thêm loại thuốc"""
+        name = self.medicine_type_name.get().strip()
+        description = self.medicine_type_description.get().strip()
+
+        if not name:
+            messagebox.showerror("Lỗi", "Vui lòng nhập tên thuốc!")
+            return
+
+        self.db.write(
+            lambda cursor: insert_catalogue_row(cursor, 'medicine_types', name, description),
+            lambda row_id: self.on_medicine_type_saved(row_id, name, description, "Đã thêm loại thuốc!"),
+            lambda e: messagebox.showerror("Lỗi", f"Không thể thêm loại thuốc: {e}"))
+
+    def update_medicine_type(self):
+        """Cập nhật loại thuốc"""
+        selection = self.medicine_type_tree.selection()
+        if not selection:
+            messagebox.showerror("Lỗi", "Vui lòng chọn một loại thuốc để cập nhật!")
+            return
+
+        medicine_type_id = self.medicine_type_tree.item(selection[0])['values'][0]
+        name = self.medicine_type_name.get().strip()
+        description = self.medicine_type_description.get().strip()
+
+        if not name:
+            messagebox.showerror("Lỗi", "Vui lòng nhập tên thuốc!")
+            return
+
+        self.db.write(
+            lambda cursor: update_catalogue_row(cursor, 'medicine_types', medicine_type_id, name, description),
+            lambda _: self.on_medicine_type_saved(medicine_type_id, name, description, "Đã cập nhật loại thuốc!"),
+            lambda e: messagebox.showerror("Lỗi", f"Không thể cập nhật loại thuốc: {e}"))
+
+    def on_medicine_type_saved(self, row_id, name, description, message):
+        """Cập nhật danh mục trong bộ nhớ, danh sách và combobox sau khi thêm/sửa loại thuốc"""
+        self.medicines.put(row_id, name, description)
+        self.record_cache.clear()  # Tên thuốc nằm trong chi tiết bệnh án đã lưu
+        messagebox.showinfo("Thành công", message)
+        self.clear_medicine_type_form()
+        self.show_catalogue_row(self.medicine_type_tree, self.medicines, row_id)
+        self.load_medicine_types()  # Cập nhật combobox trong tab bệnh án
+
+    def delete_medicine_type(self):
+        """Xóa loại thuốc"""
+        selection = self.medicine_type_tree.selection()
+        if not selection:
+            messagebox.showerror("Lỗi", "Vui lòng chọn một loại thuốc để xóa!")
+            return
+
+        medicine_type_id = self.medicine_type_tree.item(selection[0])['values'][0]
+        if messagebox.askyesno("Xác nhận", "Bạn có chắc muốn xóa loại thuốc này?"):
+            # Chỉ xóa khi loại thuốc không được sử dụng trong prescriptions
+            self.db.write(
+                lambda cursor: delete_catalogue_row(cursor, 'medicine_types', medicine_type_id),
+                lambda deleted: self.on_medicine_type_deleted(medicine_type_id, deleted),
+                lambda e: messagebox.showerror("Lỗi", f"Không thể xóa loại thuốc: {e}"))
+
+    def on_medicine_type_deleted(self, row_id, deleted):
+        """Cập nhật giao diện sau khi xóa loại thuốc"""
+        if not deleted:
+            messagebox.showerror("Lỗi", "Không thể xóa vì loại thuốc này đang được sử dụng!")
+            return
+        self.medicines.remove(row_id)
+        messagebox.showinfo("Thành công", "Đã xóa loại thuốc!")
+        self.clear_medicine_type_form()
+        if self.medicine_type_tree.exists(str(row_id)):
+            self.medicine_type_tree.delete(str(row_id))
+        self.load_medicine_types()  # Cập nhật combobox trong tab bệnh án
+
+    def clear_medicine_type_form(self):
+        """Làm mới form loại thuốc"""
+        self.medicine_type_name.delete(0, tk.END)
+        self.medicine_type_description.delete(0, tk.END)
+
+    def on_medicine_type_select(self, event):
+        """Xử lý khi chọn loại thuốc từ treeview"""
+        selection = self.medicine_type_tree.selection()
+        if selection:
+            item = self.medicine_type_tree.item(selection[0])
+            medicine_type_data = item['values']
+            self.clear_medicine_type_form()
+            self.medicine_type_name.insert(0, medicine_type_data[1])
+            self.medicine_type_description.insert(0, medicine_type_data[2])
+
+    def load_medicine_types_list(self):
+        """Tải danh sách loại thuốc (từ danh mục trong bộ nhớ)"""
+        self.load_catalogue(self.medicines, lambda: self.show_catalogue_list(self.medicine_type_tree, self.medicines))
+        
+    def on_close(self):
+        """Ghi nốt các thay đổi đang chờ, đóng database rồi đóng cửa sổ"""
+        self.close_database()
+        self.root.destroy()
+
+    def close_database(self):
+        if hasattr(self, 'db'):
+            self.db.close()
+        if hasattr(self, 'conn'):
+            self.conn.close()
+
+    def __del__(self):
+        """Đóng kết nối database khi thoát"""
+        self.close_database()
+        
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Hệ thống Quản lý Bệnh án")
+    parser.add_argument('--profile-startup', action='store_true',
+                        help="In thời gian từng bước khởi động sau lần vẽ cửa sổ đầu tiên")
+    args = parser.parse_args()
+
+    timer = StartupTimer()
+    with timer.phase("Tạo cửa sổ Tk"):
+        root = tk.Tk()
+    app = MedicalRecordsApp(root, timer)
+    if args.profile_startup:
+        def report_startup():
+            timer.mark("Vẽ cửa sổ lần đầu")
+            print(timer.report())
+        root.after_idle(report_startup)
+    root.mainloop()
\ No newline at end of file
@@ -0,0 +1,83 @@
+"""Benchmark danh mục thuốc trong bộ nhớ: lọc khi gõ so với truy vấn LIKE mỗi lần gõ
+
+Tạo danh mục vài chục nghìn loại thuốc, đo thời gian nạp danh mục một lần, thời
+gian lọc theo từng phím gõ bằng Catalogue.filter (không dấu, trong bộ nhớ) và
+bằng truy vấn LIKE trên SQLite, cùng việc tra id từ nhãn combobox.
+
+Chạy: python benchmarks/bench_catalogue.py --medicines 50000
+"""
+import argparse
+import os
+import random
+import statistics
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from catalogue import Catalogue
+from database import fetch_catalogue
+from seed import create_database
+
+STEMS = ['Paracetamol', 'Amoxicillin', 'Ibuprofen', 'Cefuroxim', 'Omeprazol', 'Metformin', 'Amlodipin',
+         'Losartan', 'Vitamin C', 'Berberin', 'Loratadin', 'Salbutamol', 'Diclofenac', 'Azithromycin',
+         'Prednisolon', 'Đường glucose', 'Kẽm gluconat', 'Hoạt huyết dưỡng não', 'Men tiêu hóa']
+FORMS = ['viên nén', 'viên nang', 'siro', 'ống tiêm', 'gói bột', 'viên sủi']
+# Chữ người dùng gõ dần từng phím
+TYPED = ['p', 'pa', 'par', 'para', 'parac', 'duong', 'hoat h', 'kem g', 'x', '500mg si']
+
+
+def medicine_names(count, rng):
+    return [f"{rng.choice(STEMS)} {rng.choice([100, 250, 500, 750, 1000])}mg {rng.choice(FORMS)} "
+            f"(NSX {i})" for i in range(1, count + 1)]
+
+
+def measure(label, func, args_list):
+    samples = []
+    for args in args_list:
+        start = time.perf_counter()
+        func(*args)
+        samples.append((time.perf_counter() - start) * 1000)
+    print(f"  {label:<36}{statistics.median(samples):9.3f} ms trung vị, {max(samples):9.3f} ms tối đa")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--medicines', type=int, default=50000)
+    parser.add_argument('--db', help="Đường dẫn patients.db (mặc định: thư mục tạm)")
+    args = parser.parse_args()
+
+    path = args.db or os.path.join(tempfile.mkdtemp(), 'patients.db')
+    rng = random.Random(42)
+    conn = create_database(path)
+    conn.executemany("INSERT INTO medicine_types (name, description) VALUES (?, '')",
+                     [(name,) for name in medicine_names(args.medicines, rng)])
+    conn.commit()
+    cursor = conn.cursor()
+    print(f"{args.medicines} loại thuốc tại {path}")
+
+    medicines = Catalogue('medicine_types')
+    start = time.perf_counter()
+    medicines.set_rows(fetch_catalogue(cursor, 'medicine_types'))
+    medicines.values()
+    print(f"  Nạp danh mục và dựng nhãn (một lần)  {(time.perf_counter() - start) * 1000:9.1f} ms")
+
+    typed = [(text,) for text in TYPED]
+    measure("Lọc trong bộ nhớ (mỗi phím)", medicines.filter, typed)
+    measure("Truy vấn LIKE (mỗi phím)", lambda text: cursor.execute(
+        "SELECT id, name FROM medicine_types WHERE name LIKE ? LIMIT 500", (f"%{text}%",)).fetchall(), typed)
+
+    labels = [(rng.choice(medicines.values()),) for _ in range(1000)]
+    measure("Tra id từ nhãn combobox", medicines.id_for_label, labels)
+
+    row_id = rng.randint(1, args.medicines)
+    start = time.perf_counter()
+    medicines.put(row_id, "Paracetamol 500mg viên nén (đã sửa)", '')
+    medicines.filter('para')
+    print(f"  Sửa một dòng rồi lọc lại            {(time.perf_counter() - start) * 1000:9.1f} ms")
+    conn.close()
+
+
+if __name__ == '__main__':
+    main()
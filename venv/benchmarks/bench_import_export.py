@@ -0,0 +1,109 @@
+"""Benchmark nhập/xuất hàng loạt (data_transfer): số dòng mỗi giây với 1 triệu dòng
+
+Sinh tệp bệnh nhân (CSV) và bệnh án (JSON Lines, mỗi bệnh án một xét nghiệm và
+một đơn thuốc) theo luồng, nhập vào database mới rồi xuất lại ra CSV và mảng JSON.
+Với --trace-memory, đo bộ nhớ Python tối đa (tracemalloc) khi xuất để kiểm tra
+việc xuất không phụ thuộc số dòng (tracemalloc làm chậm, không dùng để đo tốc độ).
+
+Chạy: python benchmarks/bench_import_export.py --rows 1000000
+"""
+import argparse
+import csv
+import json
+import os
+import random
+import sqlite3
+import sys
+import tempfile
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import data_transfer
+from schema import configure_connection
+from seed import DIAGNOSES, DOCTORS, create_database, insert_catalogues, random_patient
+
+
+def write_patients_file(path, count, rng):
+    with open(path, 'w', newline='', encoding='utf-8') as f:
+        writer = csv.writer(f)
+        writer.writerow(data_transfer.PATIENT_FIELDS)
+        for source_id in range(1, count + 1):
+            writer.writerow((source_id, *random_patient(rng, source_id)))
+
+
+def write_records_file(path, count, patients, rng):
+    with open(path, 'w', encoding='utf-8') as f:
+        for _ in range(count):
+            f.write(json.dumps({
+                'patient_id': rng.randint(1, patients),
+                'visit_date': f"{rng.randint(1, 28):02d}/{rng.randint(1, 12):02d}/{rng.randint(2020, 2024)}",
+                'diagnosis': rng.choice(DIAGNOSES),
+                'doctor_name': rng.choice(DOCTORS),
+                'tests': [{'test_type': f"Xét nghiệm {rng.randint(1, 50)}", 'result': 'Bình thường'}],
+                'prescriptions': [{'medicine': f"Thuốc {rng.randint(1, 500)}", 'dosage': '1 viên x 2 lần/ngày',
+                                   'quantity': rng.randint(1, 30), 'instructions': 'Sau ăn'}],
+            }, ensure_ascii=False))
+            f.write('\n')
+
+
+def timed(label, count, func, trace_memory=False):
+    if trace_memory:
+        tracemalloc.start()
+    start = time.perf_counter()
+    result = func()
+    elapsed = time.perf_counter() - start
+    memory = ''
+    if trace_memory:
+        memory = f"   (bộ nhớ Python tối đa {tracemalloc.get_traced_memory()[1] / 1024 / 1024:.1f} MB)"
+        tracemalloc.stop()
+    print(f"  {label:<34}{elapsed:8.1f} s {count / elapsed:12,.0f} dòng/s{memory}")
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--rows', type=int, default=1000000, help="Số bệnh nhân và số bệnh án")
+    parser.add_argument('--chunk-size', type=int, default=data_transfer.CHUNK_SIZE)
+    parser.add_argument('--trace-memory', action='store_true', help="Đo bộ nhớ tối đa khi xuất")
+    parser.add_argument('--dir', help="Thư mục chứa tệp và database (mặc định: thư mục tạm)")
+    args = parser.parse_args()
+
+    directory = args.dir or tempfile.mkdtemp()
+    rng = random.Random(42)
+    patients_path = os.path.join(directory, 'benh_nhan.csv')
+    records_path = os.path.join(directory, 'benh_an.jsonl')
+    write_patients_file(patients_path, args.rows, rng)
+    write_records_file(records_path, args.rows, args.rows, rng)
+    print(f"Đã sinh {args.rows} bệnh nhân và {args.rows} bệnh án tại {directory}")
+
+    db_path = os.path.join(directory, 'patients.db')
+    conn = create_database(db_path)
+    insert_catalogues(conn)
+    conn.commit()
+    conn.close()
+    conn = configure_connection(sqlite3.connect(db_path, isolation_level=None))
+
+    id_map = {}
+    print("Nhập:")
+    report = timed("Bệnh nhân (CSV)", args.rows,
+                   lambda: data_transfer.import_patients(conn, patients_path, id_map, args.chunk_size))
+    print(f"    {report}")
+    report = timed("Bệnh án + XN + đơn thuốc (JSONL)", args.rows,
+                   lambda: data_transfer.import_records(conn, records_path, id_map, args.chunk_size))
+    print(f"    {report}")
+    del id_map
+
+    print("Xuất:")
+    timed("Bệnh nhân (CSV)", args.rows,
+          lambda: data_transfer.export_patients(conn, os.path.join(directory, 'xuat_benh_nhan.csv')),
+          trace_memory=args.trace_memory)
+    timed("Bệnh án (mảng JSON)", args.rows,
+          lambda: data_transfer.export_records(conn, os.path.join(directory, 'xuat_benh_an.json')),
+          trace_memory=args.trace_memory)
+    conn.close()
+
+
+if __name__ == '__main__':
+    main()
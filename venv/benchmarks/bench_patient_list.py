@@ -0,0 +1,124 @@
+"""Benchmark danh sách bệnh nhân: tải toàn bộ bảng so với phân trang theo khóa
+
+Chạy: python benchmarks/bench_patient_list.py --patients 200000
+Nếu có màn hình (DISPLAY), đo thêm thời gian hiển thị lần đầu và độ trễ khi cuộn
+trên một Treeview thật.
+"""
+import argparse
+import os
+import sqlite3
+import statistics
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from database import fetch_patient_page
+from seed import seed_patients
+
+
+def timed(func, repeat=5):
+    """Trả về thời gian trung vị (ms) của `repeat` lần gọi"""
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        samples.append((time.perf_counter() - start) * 1000)
+    return statistics.median(samples)
+
+
+def bench_queries(conn, page_size, pages):
+    cursor = conn.cursor()
+
+    def full_table():
+        cursor.execute("SELECT * FROM patients ORDER BY created_date DESC")
+        cursor.fetchall()
+
+    print(f"Tải toàn bộ bảng (cách cũ):        {timed(full_table, repeat=3):9.2f} ms")
+    print(f"Trang đầu (keyset, {page_size} dòng):      "
+          f"{timed(lambda: fetch_patient_page(cursor, limit=page_size)):9.2f} ms")
+
+    # Cuộn tuần tự qua nhiều trang
+    samples = []
+    after = None
+    for _ in range(pages):
+        start = time.perf_counter()
+        rows = fetch_patient_page(cursor, after=after, limit=page_size)
+        samples.append((time.perf_counter() - start) * 1000)
+        if not rows:
+            break
+        after = (rows[-1][6], rows[-1][0])
+    print(f"Trang kế tiếp (trung vị/max):       {statistics.median(samples):9.2f} / {max(samples):.2f} ms")
+
+
+def bench_tree(path, page_size, scrolls):
+    import tkinter as tk
+    from tkinter import ttk
+    from patient_list import VirtualPatientList
+
+    root = tk.Tk()
+    columns = ('ID', 'Họ tên', 'Ngày sinh', 'Giới tính', 'Số ĐT', 'Địa chỉ')
+    tree = ttk.Treeview(root, columns=columns, show='headings', height=15)
+    scrollbar = ttk.Scrollbar(root, orient='vertical', command=tree.yview)
+    tree.pack(side='left', fill='both', expand=True)
+    scrollbar.pack(side='right', fill='y')
+    cursor = sqlite3.connect(path).cursor()
+
+    def full_reload():
+        tree.delete(*tree.get_children())
+        cursor.execute("SELECT * FROM patients ORDER BY created_date DESC")
+        for patient in cursor.fetchall():
+            tree.insert('', 'end', values=patient[0:6])
+        root.update()
+
+    print(f"Hiển thị lần đầu, tải toàn bộ:      {timed(full_reload, repeat=1):9.2f} ms")
+    tree.delete(*tree.get_children())
+
+    def fetch(order, after, before, limit):
+        return fetch_patient_page(cursor, order, after, before, limit)
+
+    patient_list = VirtualPatientList(tree, scrollbar, fetch, page_size=page_size)
+
+    def first_paint():
+        patient_list.reset()
+        root.update()
+
+    print(f"Hiển thị lần đầu, danh sách ảo:     {timed(first_paint):9.2f} ms")
+
+    samples = []
+    for _ in range(scrolls):
+        start = time.perf_counter()
+        tree.yview_moveto(1.0)
+        root.update()
+        samples.append((time.perf_counter() - start) * 1000)
+    print(f"Cuộn tới cuối cửa sổ (trung vị/max): {statistics.median(samples):8.2f} / {max(samples):.2f} ms "
+          f"({len(tree.get_children())} dòng trong Treeview)")
+    root.destroy()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--patients', type=int, default=200000)
+    parser.add_argument('--page-size', type=int, default=100)
+    parser.add_argument('--pages', type=int, default=200)
+    parser.add_argument('--db', help="Đường dẫn patients.db (mặc định: thư mục tạm)")
+    args = parser.parse_args()
+
+    path = args.db or os.path.join(tempfile.mkdtemp(), 'patients.db')
+    start = time.perf_counter()
+    seed_patients(path, args.patients)
+    print(f"Đã tạo {args.patients} bệnh nhân tại {path} ({time.perf_counter() - start:.1f} s)")
+
+    conn = sqlite3.connect(path)
+    bench_queries(conn, args.page_size, args.pages)
+    conn.close()
+
+    if os.environ.get('DISPLAY') or sys.platform in ('win32', 'darwin'):
+        bench_tree(path, args.page_size, args.pages)
+    else:
+        print("Không có màn hình: bỏ qua phần đo trên Treeview")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,72 @@
+"""Benchmark tìm kiếm bệnh nhân: LIKE '%...%' so với chỉ mục FTS5
+
+Chạy: python benchmarks/bench_patient_search.py --patients 1000000
+"""
+import argparse
+import os
+import sqlite3
+import statistics
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from database import build_search_query, find_patients
+from seed import seed_patients
+
+# Các kiểu gõ thường gặp: tiền tố ngắn, tên đầy đủ không dấu, tên đang gõ dở, số điện thoại, địa chỉ
+TERMS = ['ng', 'nguyen', 'nguyễn văn', 'nguyen v', 'dang thi lan', '090', '0912345', 'da nang', 'hai phong 12', 'xyz']
+
+TARGET_MS = 20
+
+
+def median_ms(func, repeat):
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        samples.append((time.perf_counter() - start) * 1000)
+    return statistics.median(samples)
+
+
+def like_search(cursor, term):
+    pattern = f'%{term.lower()}%'
+    cursor.execute('''
+        SELECT * FROM patients
+        WHERE LOWER(name) LIKE ? OR LOWER(phone) LIKE ? OR LOWER(address) LIKE ?
+        ORDER BY name
+    ''', (pattern, pattern, pattern))
+    return cursor.fetchall()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--patients', type=int, default=1000000)
+    parser.add_argument('--repeat', type=int, default=20)
+    parser.add_argument('--db', help="Đường dẫn patients.db (mặc định: thư mục tạm)")
+    args = parser.parse_args()
+
+    path = args.db or os.path.join(tempfile.mkdtemp(), 'patients.db')
+    start = time.perf_counter()
+    seed_patients(path, args.patients)
+    print(f"Đã tạo {args.patients} bệnh nhân tại {path} ({time.perf_counter() - start:.1f} s)")
+
+    cursor = sqlite3.connect(path).cursor()
+    print(f"{'Từ khóa':<16}{'LIKE (ms)':>12}{'FTS5 (ms)':>12}{'Kết quả':>10}")
+    worst = 0
+    for term in TERMS:
+        if build_search_query(term) is None:
+            # Quá ngắn: ứng dụng không chạy truy vấn nên không tính vào thời gian chậm nhất
+            print(f"{term:<16}{'bỏ qua (quá ngắn)':>34}")
+            continue
+        like_ms = median_ms(lambda: like_search(cursor, term), 1)
+        fts_ms = median_ms(lambda: find_patients(cursor, term), args.repeat)
+        worst = max(worst, fts_ms)
+        print(f"{term:<16}{like_ms:>12.1f}{fts_ms:>12.2f}{len(find_patients(cursor, term)):>10}")
+    status = 'đạt' if worst < TARGET_MS else 'KHÔNG đạt'
+    print(f"Chậm nhất với FTS5: {worst:.2f} ms ({status} mục tiêu {TARGET_MS} ms)")
+
+
+if __name__ == '__main__':
+    main()
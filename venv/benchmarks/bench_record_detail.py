@@ -0,0 +1,105 @@
+"""Benchmark tải chi tiết bệnh án: bốn truy vấn so với một truy vấn và bộ nhớ đệm LRU
+
+So sánh cách tải cũ (bệnh án, tên bệnh nhân, xét nghiệm, đơn thuốc: bốn truy
+vấn), fetch_record_detail (một truy vấn, xét nghiệm/đơn thuốc gom bằng JSON),
+fetch_record_details nạp trước các bệnh án liền kề như khi chuyển bằng phím mũi
+tên, và lấy lại bệnh án đã xem từ RecordCache.
+
+Chạy: python benchmarks/bench_record_detail.py --patients 100000 --per-patient 5
+"""
+import argparse
+import os
+import random
+import statistics
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from database import fetch_record_detail, fetch_record_details
+from record_cache import RecordCache
+from seed import create_database, insert_catalogues, insert_patients, insert_records
+
+PREFETCH_RECORDS = 3
+
+
+def legacy_detail(cursor, record_id):
+    """Cách tải cũ: một truy vấn cho mỗi phần"""
+    cursor.execute("SELECT * FROM medical_records WHERE id=?", (record_id,))
+    record = cursor.fetchone()
+    cursor.execute('SELECT name FROM patients WHERE id=?', (record[1],))
+    patient = cursor.fetchone()
+    cursor.execute('''
+        SELECT tr.id, tt.name, tr.result, tr.notes
+        FROM test_results tr
+        JOIN test_types tt ON tr.test_type_id = tt.id
+        WHERE tr.record_id = ?
+    ''', (record_id,))
+    tests = cursor.fetchall()
+    cursor.execute('''
+        SELECT p.id, mt.name, p.dosage, p.quantity, p.instructions
+        FROM prescriptions p
+        JOIN medicine_types mt ON p.medicine_id = mt.id
+        WHERE p.record_id = ?
+    ''', (record_id,))
+    return record, patient[0], tests, cursor.fetchall()
+
+
+def measure(label, func, items):
+    samples = []
+    for item in items:
+        start = time.perf_counter()
+        func(item)
+        samples.append((time.perf_counter() - start) * 1000)
+    print(f"  {label:<44}{statistics.median(samples):8.3f} ms trung vị, {max(samples):8.3f} ms tối đa")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--patients', type=int, default=100000)
+    parser.add_argument('--per-patient', type=int, default=5)
+    parser.add_argument('--samples', type=int, default=500)
+    parser.add_argument('--db', help="Đường dẫn patients.db (mặc định: thư mục tạm)")
+    args = parser.parse_args()
+
+    path = args.db or os.path.join(tempfile.mkdtemp(), 'patients.db')
+    rng = random.Random(42)
+    conn = create_database(path)
+    insert_patients(conn, args.patients, rng)
+    insert_catalogues(conn)
+    insert_records(conn, args.per_patient, rng)
+    cursor = conn.cursor()
+    total = cursor.execute("SELECT MAX(id) FROM medical_records").fetchone()[0]
+    print(f"{args.patients} bệnh nhân, {total} bệnh án tại {path}")
+    record_ids = [rng.randint(1, total) for _ in range(args.samples)]
+
+    measure("Cách cũ (4 truy vấn)", lambda record_id: legacy_detail(cursor, record_id), record_ids)
+    measure("fetch_record_detail (1 truy vấn)", lambda record_id: fetch_record_detail(cursor, record_id),
+            record_ids)
+    measure(f"Nạp trước {2 * PREFETCH_RECORDS + 1} bệnh án liền kề (1 truy vấn)",
+            lambda record_id: fetch_record_details(
+                cursor, range(max(1, record_id - PREFETCH_RECORDS), record_id + PREFETCH_RECORDS + 1)),
+            record_ids)
+
+    # Chuyển bằng phím mũi tên: mỗi lần chọn nạp trước các bệnh án liền kề, nên
+    # chỉ bệnh án đầu tiên phải chờ truy vấn
+    cache = RecordCache()
+    start_id = record_ids[0]
+    misses = 0
+    steps = []
+    for record_id in range(start_id, min(total, start_id + 100) + 1):
+        start = time.perf_counter()
+        if cache.get(record_id) is None:
+            misses += 1
+            cache.put(record_id, fetch_record_detail(cursor, record_id), cache.generation)
+        steps.append((time.perf_counter() - start) * 1000)
+        cache.put_many(fetch_record_details(cursor, range(record_id - PREFETCH_RECORDS,
+                                                          record_id + PREFETCH_RECORDS + 1)), cache.generation)
+    print(f"  Phím mũi tên qua {len(steps)} bệnh án: {misses} lần phải chờ truy vấn, "
+          f"trung vị {statistics.median(steps):.4f} ms mỗi lần chọn")
+    conn.close()
+
+
+if __name__ == '__main__':
+    main()
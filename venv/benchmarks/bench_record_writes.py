@@ -0,0 +1,110 @@
+"""Benchmark ghi bệnh án: từng lệnh và hai lần commit so với một giao dịch / cả lô
+
+Mỗi bệnh án có vài kết quả xét nghiệm và đơn thuốc. So sánh cách lưu cũ của
+save_record (commit bệnh án, SELECT last_insert_rowid(), từng INSERT cho mỗi
+dòng, commit lần hai), insert_record (một giao dịch cho mỗi bệnh án) và
+save_records (cả lô trong một giao dịch, executemany cho xét nghiệm/đơn thuốc).
+
+Chạy: python benchmarks/bench_record_writes.py --records 500
+"""
+import argparse
+import os
+import random
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from database import delete_patient_data, insert_record, save_records
+from seed import DIAGNOSES, DOCTORS, create_database, insert_catalogues, insert_patients
+
+
+def random_entry(rng, patients, tests, prescriptions):
+    record = (f"2024-{rng.randint(1, 12):02d}-{rng.randint(1, 28):02d}", rng.choice(DIAGNOSES),
+              '', '', '', rng.choice(DOCTORS))
+    return (rng.randint(1, patients), record,
+            [(rng.randint(1, 50), 'Bình thường', '') for _ in range(tests)],
+            [(rng.randint(1, 500), '1 viên x 2 lần/ngày', 10, 'Sau ăn') for _ in range(prescriptions)])
+
+
+def legacy_save(conn, entry):
+    """Cách lưu cũ: hai lần commit và một lệnh cho mỗi dòng"""
+    cursor = conn.cursor()
+    patient_id, record, tests, prescriptions = entry
+    cursor.execute('''
+        INSERT INTO medical_records (patient_id, visit_date, diagnosis, symptoms, treatment, notes, doctor_name)
+        VALUES (?, ?, ?, ?, ?, ?, ?)
+    ''', (patient_id, *record))
+    conn.commit()
+    cursor.execute("SELECT last_insert_rowid()")
+    record_id = cursor.fetchone()[0]
+    for test_type_id, result, notes in tests:
+        cursor.execute("INSERT INTO test_results (record_id, test_type_id, result, test_date, notes) VALUES (?, ?, ?, ?, ?)",
+                       (record_id, test_type_id, result, record[0], notes))
+    for medicine_id, dosage, quantity, instructions in prescriptions:
+        cursor.execute("INSERT INTO prescriptions (record_id, medicine_id, dosage, quantity, instructions) VALUES (?, ?, ?, ?, ?)",
+                       (record_id, medicine_id, dosage, quantity, instructions))
+    conn.commit()
+
+
+def timed(label, count, func):
+    start = time.perf_counter()
+    func()
+    elapsed = time.perf_counter() - start
+    print(f"  {label:<44}{elapsed * 1000:10.1f} ms ({count / elapsed:,.0f} bệnh án/s)")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--patients', type=int, default=1000)
+    parser.add_argument('--records', type=int, default=500)
+    parser.add_argument('--tests', type=int, default=3)
+    parser.add_argument('--prescriptions', type=int, default=3)
+    parser.add_argument('--db', help="Đường dẫn patients.db (mặc định: thư mục tạm)")
+    args = parser.parse_args()
+
+    path = args.db or os.path.join(tempfile.mkdtemp(), 'patients.db')
+    rng = random.Random(42)
+    conn = create_database(path)
+    insert_patients(conn, args.patients, rng)
+    insert_catalogues(conn)
+    conn.commit()
+    entries = [random_entry(rng, args.patients, args.tests, args.prescriptions) for _ in range(args.records)]
+    print(f"Lưu {args.records} bệnh án, mỗi bệnh án {args.tests} xét nghiệm và {args.prescriptions} đơn thuốc:")
+
+    def legacy():
+        for entry in entries:
+            legacy_save(conn, entry)
+
+    def per_record():
+        for entry in entries:
+            conn.execute('BEGIN IMMEDIATE')
+            insert_record(conn.cursor(), *entry)
+            conn.commit()
+
+    def batch():
+        conn.execute('BEGIN IMMEDIATE')
+        save_records(conn.cursor(), entries)
+        conn.commit()
+
+    timed("Cách cũ (2 commit, từng lệnh)", args.records, legacy)
+    timed("insert_record (1 giao dịch mỗi bệnh án)", args.records, per_record)
+    timed("save_records (cả lô trong 1 giao dịch)", args.records, batch)
+
+    # Xóa bệnh nhân có nhiều bệnh án nhất: xóa theo tập hợp trong một giao dịch
+    patient_id, count = conn.execute("""
+        SELECT patient_id, COUNT(*) FROM medical_records GROUP BY patient_id ORDER BY 2 DESC LIMIT 1
+    """).fetchone()
+
+    def delete():
+        conn.execute('BEGIN IMMEDIATE')
+        delete_patient_data(conn.cursor(), patient_id)
+        conn.commit()
+
+    timed(f"delete_patient_data ({count} bệnh án)", count, delete)
+    conn.close()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,133 @@
+"""Benchmark trước/sau khi nâng cấp cấu trúc database (index, WAL, ngày ISO)
+
+Tạo database ở phiên bản 1 (không có index phụ, ngày dd/mm/YYYY), đo việc tải
+bệnh án của từng bệnh nhân và các truy vấn thống kê, chạy migrate() rồi đo lại.
+
+Chạy: python benchmarks/bench_schema.py --patients 20000 --records-per-patient 5
+"""
+import argparse
+import os
+import random
+import statistics
+import sys
+import tempfile
+import time
+from datetime import date
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from database import fetch_patient_records, fetch_record_detail, fetch_stats
+from schema import SCHEMA_VERSION, migrate
+from seed import create_database, insert_catalogues, insert_patients, insert_records
+
+
+def legacy_patient_records(cursor, patient_id):
+    """Tải bệnh án như load_records trước khi có index"""
+    cursor.execute("SELECT name FROM patients WHERE id = ?", (patient_id,))
+    cursor.fetchone()
+    cursor.execute('''
+        SELECT id, visit_date, diagnosis, doctor_name, notes
+        FROM medical_records
+        WHERE patient_id=?
+        ORDER BY visit_date DESC
+    ''', (patient_id,))
+    return cursor.fetchall()
+
+
+def legacy_record_detail(cursor, record_id):
+    """Tải chi tiết bệnh án như on_medical_record_select cũ"""
+    cursor.execute('SELECT * FROM medical_records WHERE id=?', (record_id,))
+    cursor.fetchone()
+    cursor.execute('''
+        SELECT tr.id, tt.name, tr.result, tr.notes
+        FROM test_results tr JOIN test_types tt ON tr.test_type_id = tt.id
+        WHERE tr.record_id = ?
+    ''', (record_id,))
+    cursor.fetchall()
+    cursor.execute('''
+        SELECT p.id, mt.name, p.dosage, p.quantity, p.instructions
+        FROM prescriptions p JOIN medicine_types mt ON p.medicine_id = mt.id
+        WHERE p.record_id = ?
+    ''', (record_id,))
+    return cursor.fetchall()
+
+
+def legacy_stats(cursor, today):
+    """Các truy vấn của update_stats cũ (ngày dd/mm/YYYY, truy vấn con tương quan)"""
+    cursor.execute("SELECT COUNT(*) FROM patients")
+    cursor.execute("SELECT COUNT(*) FROM medical_records")
+    cursor.execute("SELECT COUNT(*) FROM medical_records WHERE visit_date = ?", (today.strftime('%d/%m/%Y'),))
+    cursor.fetchone()
+    cursor.execute("SELECT COUNT(*) FROM medical_records WHERE strftime('%m/%Y', visit_date) = ?",
+                   (today.strftime('%m/%Y'),))
+    cursor.fetchone()
+    cursor.execute("""
+        SELECT
+            strftime('%m/%Y', created_date) as month_year,
+            COUNT(DISTINCT id) as new_patients,
+            (SELECT COUNT(*) FROM medical_records WHERE strftime('%m/%Y', visit_date) = strftime('%m/%Y', patients.created_date)) as visits
+        FROM patients
+        GROUP BY month_year
+        ORDER BY month_year DESC
+    """)
+    return cursor.fetchall()
+
+
+def measure(label, func, args_list):
+    samples = []
+    for args in args_list:
+        start = time.perf_counter()
+        func(*args)
+        samples.append((time.perf_counter() - start) * 1000)
+    print(f"  {label:<32}{statistics.median(samples):10.3f} ms (trung vị, {len(samples)} lần)")
+
+
+def run(cursor, patient_ids, record_ids, today, legacy):
+    if legacy:
+        measure("Tải bệnh án của bệnh nhân", lambda pid: legacy_patient_records(cursor, pid), patient_ids)
+        measure("Tải chi tiết bệnh án", lambda rid: legacy_record_detail(cursor, rid), record_ids)
+        measure("Thống kê (update_stats)", lambda: legacy_stats(cursor, today), [()])
+    else:
+        measure("Tải bệnh án của bệnh nhân", lambda pid: fetch_patient_records(cursor, pid), patient_ids)
+        measure("Tải chi tiết bệnh án", lambda rid: fetch_record_detail(cursor, rid), record_ids)
+        measure("Thống kê (update_stats)", lambda: fetch_stats(cursor, today), [(), (), ()])
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--patients', type=int, default=20000)
+    parser.add_argument('--records-per-patient', type=int, default=5)
+    parser.add_argument('--samples', type=int, default=50)
+    parser.add_argument('--db', help="Đường dẫn patients.db (mặc định: thư mục tạm)")
+    args = parser.parse_args()
+
+    path = args.db or os.path.join(tempfile.mkdtemp(), 'patients.db')
+    rng = random.Random(42)
+    start = time.perf_counter()
+    conn = create_database(path, version=1)
+    insert_patients(conn, args.patients, rng)
+    insert_catalogues(conn)
+    insert_records(conn, args.records_per_patient, rng, iso_dates=False)
+    print(f"Đã tạo {args.patients} bệnh nhân, {args.patients * args.records_per_patient} bệnh án "
+          f"tại {path} ({time.perf_counter() - start:.1f} s)")
+
+    cursor = conn.cursor()
+    max_record = cursor.execute("SELECT MAX(id) FROM medical_records").fetchone()[0]
+    patient_ids = [(rng.randint(1, args.patients),) for _ in range(args.samples)]
+    record_ids = [(rng.randint(1, max_record),) for _ in range(args.samples)]
+    today = date(2024, 3, 15)
+
+    print("Trước (phiên bản 1):")
+    run(cursor, patient_ids, record_ids, today, legacy=True)
+
+    start = time.perf_counter()
+    migrate(conn)
+    print(f"Nâng cấp lên phiên bản {SCHEMA_VERSION}: {time.perf_counter() - start:.1f} s")
+
+    print("Sau:")
+    run(cursor, patient_ids, record_ids, today, legacy=False)
+    conn.close()
+
+
+if __name__ == '__main__':
+    main()
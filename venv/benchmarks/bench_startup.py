@@ -0,0 +1,105 @@
+"""Benchmark khởi động: dữ liệu tải khi mở ứng dụng với database lớn
+
+Tạo database nhiều bệnh nhân/bệnh án rồi đo các bước khởi động: mở database,
+kiểm tra cấu trúc, trang đầu danh sách bệnh nhân (tab đầu tiên), so với dữ liệu
+mà các tab khác tải khi được tạo cùng lúc (thống kê, danh mục, combobox bệnh
+nhân) - nay chỉ tải khi mở tab lần đầu.
+
+Nếu có màn hình (DISPLAY), chạy thêm ứng dụng thật với StartupTimer (như
+`python App.py --profile-startup`) và đo thời gian tạo các tab còn lại.
+
+Chạy: python benchmarks/bench_startup.py --patients 200000 --per-patient 3
+"""
+import argparse
+import os
+import random
+import sqlite3
+import sys
+import tempfile
+import time
+from datetime import date
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from database import fetch_catalogue, fetch_patient_page, fetch_stats
+from schema import configure_connection, migrate
+from seed import create_database, insert_catalogues, insert_patients, insert_records
+from startup_timer import StartupTimer
+
+
+def bench_data(path):
+    timer = StartupTimer()
+    with timer.phase("Mở database"):
+        conn = configure_connection(sqlite3.connect(path))
+    with timer.phase("Kiểm tra cấu trúc database"):
+        migrate(conn)
+    cursor = conn.cursor()
+    with timer.phase("Trang đầu danh sách bệnh nhân"):
+        fetch_patient_page(cursor, limit=100)
+    startup = timer.total()
+    print(timer.report())
+
+    # Dữ liệu các tab khác tải khi được tạo (trước đây: ngay lúc khởi động)
+    deferred = StartupTimer()
+    with deferred.phase("Thống kê (tab Thống kê)"):
+        fetch_stats(cursor, date.today())
+    with deferred.phase("Danh mục xét nghiệm và thuốc"):
+        fetch_catalogue(cursor, 'test_types')
+        fetch_catalogue(cursor, 'medicine_types')
+    with deferred.phase("Combobox bệnh nhân (tab Bệnh án)"):
+        fetch_patient_page(cursor, 'name', limit=100)
+    print(deferred.report("Dữ liệu tải khi mở các tab khác:"))
+    print(f"Khởi động tải {startup * 1000:.1f} ms dữ liệu thay vì {(startup + deferred.total()) * 1000:.1f} ms")
+    conn.close()
+
+
+def bench_app(path):
+    """Khởi động ứng dụng thật (cần DISPLAY và tkcalendar)"""
+    import tkinter as tk
+    import App
+
+    App.DB_PATH = path
+    timer = StartupTimer()
+    with timer.phase("Tạo cửa sổ Tk"):
+        root = tk.Tk()
+    app = App.MedicalRecordsApp(root, timer)
+    root.update()
+    timer.mark("Vẽ cửa sổ lần đầu")
+    print(timer.report())
+
+    start = time.perf_counter()
+    for frame in (app.record_frame, app.detail_frame, app.test_type_frame, app.medicine_type_frame, app.stats_frame):
+        app.build_tab(frame)
+    root.update()
+    print(f"Tạo các tab còn lại (trước đây làm lúc khởi động): {(time.perf_counter() - start) * 1000:.1f} ms")
+    app.db.close()
+    root.destroy()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--patients', type=int, default=200000)
+    parser.add_argument('--per-patient', type=int, default=3)
+    parser.add_argument('--db', help="Dùng database có sẵn thay vì tạo mới")
+    args = parser.parse_args()
+
+    path = args.db
+    if path is None:
+        path = os.path.join(tempfile.mkdtemp(), 'patients.db')
+        rng = random.Random(42)
+        conn = create_database(path)
+        insert_patients(conn, args.patients, rng)
+        insert_catalogues(conn)
+        insert_records(conn, args.per_patient, rng)
+        conn.close()
+        print(f"{args.patients} bệnh nhân, {args.patients * args.per_patient} bệnh án tại {path}")
+
+    bench_data(path)
+    if os.environ.get('DISPLAY'):
+        bench_app(path)
+    else:
+        print("Không có DISPLAY: bỏ qua phần đo trên giao diện thật")
+
+
+if __name__ == '__main__':
+    main()
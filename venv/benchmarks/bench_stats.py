@@ -0,0 +1,119 @@
+"""Benchmark thống kê: quét lại toàn bộ bảng so với đọc bảng tổng hợp theo tháng
+
+Tạo database ở phiên bản 4 (chưa có bảng tổng hợp), đo việc tính thống kê bằng
+cách quét bảng, nâng cấp lên phiên bản có bảng tổng hợp rồi đo việc đọc thống
+kê, tính lại toàn bộ bảng tổng hợp và chi phí trigger khi thêm bệnh án.
+
+Chạy: python benchmarks/bench_stats.py --patients 200000 --records-per-patient 5
+"""
+import argparse
+import os
+import random
+import statistics
+import sys
+import tempfile
+import time
+from datetime import date
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from database import fetch_stats, rebuild_stats
+from schema import SCHEMA_VERSION, migrate
+from seed import DIAGNOSES, DOCTORS, create_database, insert_catalogues, insert_patients, insert_records
+
+
+def scan_stats(cursor, today):
+    """Thống kê tính lại từ đầu bằng cách quét bảng (như trước khi có bảng tổng hợp)"""
+    cursor.execute("SELECT COUNT(*) FROM patients")
+    cursor.fetchone()
+    cursor.execute("SELECT COUNT(*) FROM medical_records")
+    cursor.fetchone()
+    cursor.execute("SELECT COUNT(*) FROM medical_records WHERE visit_date = ?", (today.isoformat(),))
+    cursor.fetchone()
+    cursor.execute("SELECT COUNT(*) FROM medical_records WHERE visit_date >= ? AND visit_date < ?",
+                   (today.replace(day=1).isoformat(), today.replace(day=28).isoformat()))
+    cursor.fetchone()
+    cursor.execute("""
+        SELECT month, SUM(new_patients), SUM(visits)
+        FROM (
+            SELECT substr(created_date, 1, 7) AS month, COUNT(*) AS new_patients, 0 AS visits
+            FROM patients GROUP BY month
+            UNION ALL
+            SELECT substr(visit_date, 1, 7) AS month, 0 AS new_patients, COUNT(*) AS visits
+            FROM medical_records GROUP BY month
+        )
+        GROUP BY month ORDER BY month DESC
+    """)
+    cursor.fetchall()
+    cursor.execute("SELECT doctor_name, COUNT(*) FROM medical_records GROUP BY doctor_name")
+    cursor.fetchall()
+    cursor.execute("SELECT diagnosis, COUNT(*) FROM medical_records GROUP BY diagnosis")
+    return cursor.fetchall()
+
+
+def measure(label, func, repeat):
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        samples.append((time.perf_counter() - start) * 1000)
+    print(f"  {label:<40}{statistics.median(samples):10.3f} ms (trung vị, {repeat} lần)")
+
+
+def insert_visits(conn, count, patients, rng):
+    """Thêm `count` bệnh án trong một giao dịch, trả về thời gian (ms)"""
+    rows = [(rng.randint(1, patients), f"2024-{rng.randint(1, 12):02d}-{rng.randint(1, 28):02d}",
+             rng.choice(DIAGNOSES), rng.choice(DOCTORS)) for _ in range(count)]
+    start = time.perf_counter()
+    conn.executemany("INSERT INTO medical_records (patient_id, visit_date, diagnosis, doctor_name) VALUES (?, ?, ?, ?)",
+                     rows)
+    conn.commit()
+    return (time.perf_counter() - start) * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--patients', type=int, default=200000)
+    parser.add_argument('--records-per-patient', type=int, default=5)
+    parser.add_argument('--inserts', type=int, default=10000)
+    parser.add_argument('--repeat', type=int, default=5)
+    parser.add_argument('--db', help="Đường dẫn patients.db (mặc định: thư mục tạm)")
+    args = parser.parse_args()
+
+    path = args.db or os.path.join(tempfile.mkdtemp(), 'patients.db')
+    rng = random.Random(42)
+    start = time.perf_counter()
+    conn = create_database(path, version=SCHEMA_VERSION - 1)
+    insert_patients(conn, args.patients, rng)
+    insert_catalogues(conn)
+    insert_records(conn, args.records_per_patient, rng)
+    print(f"Đã tạo {args.patients} bệnh nhân, {args.patients * args.records_per_patient} bệnh án "
+          f"tại {path} ({time.perf_counter() - start:.1f} s)")
+
+    cursor = conn.cursor()
+    today = date(2024, 3, 15)
+
+    print(f"Trước (phiên bản {SCHEMA_VERSION - 1}):")
+    measure("Thống kê quét toàn bộ bảng", lambda: scan_stats(cursor, today), args.repeat)
+    elapsed = insert_visits(conn, args.inserts, args.patients, rng)
+    print(f"  Thêm {args.inserts} bệnh án (không trigger)  {elapsed:10.1f} ms")
+
+    start = time.perf_counter()
+    migrate(conn)
+    print(f"Nâng cấp lên phiên bản {SCHEMA_VERSION} (tạo bảng tổng hợp): {time.perf_counter() - start:.1f} s")
+
+    print("Sau:")
+    measure("Thống kê từ bảng tổng hợp", lambda: fetch_stats(cursor, today), args.repeat)
+    measure("Thống kê lọc 3 tháng", lambda: fetch_stats(cursor, today, '2024-01', '2024-03'), args.repeat)
+    elapsed = insert_visits(conn, args.inserts, args.patients, rng)
+    print(f"  Thêm {args.inserts} bệnh án (có trigger)     {elapsed:10.1f} ms")
+
+    def rebuild():
+        rebuild_stats(cursor)
+        conn.commit()
+    measure("Tính lại bảng tổng hợp", rebuild, 1)
+    conn.close()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,113 @@
+"""Sinh dữ liệu giả lập lớn cho các benchmark"""
+import os
+import random
+import sqlite3
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from schema import SCHEMA_VERSION, configure_connection, migrate
+
+FIRST_NAMES = ['Nguyễn', 'Trần', 'Lê', 'Phạm', 'Hoàng', 'Huỳnh', 'Phan', 'Vũ', 'Võ', 'Đặng', 'Bùi', 'Đỗ']
+MIDDLE_NAMES = ['Văn', 'Thị', 'Minh', 'Ngọc', 'Hữu', 'Thanh', 'Đức', 'Quốc', 'Gia', 'Bảo']
+LAST_NAMES = ['An', 'Bình', 'Cường', 'Dũng', 'Đạt', 'Giang', 'Hà', 'Hải', 'Hùng', 'Lan', 'Linh',
+              'Long', 'Mai', 'Nam', 'Nga', 'Phúc', 'Quân', 'Sơn', 'Tâm', 'Thảo', 'Trang', 'Tuấn', 'Yến']
+CITIES = ['Hà Nội', 'TP. Hồ Chí Minh', 'Đà Nẵng', 'Hải Phòng', 'Cần Thơ', 'Huế', 'Nha Trang', 'Đà Lạt']
+DIAGNOSES = ['Cảm cúm', 'Viêm họng', 'Viêm phổi', 'Tăng huyết áp', 'Tiểu đường type 2', 'Đau dạ dày',
+             'Viêm xoang', 'Sốt xuất huyết', 'Rối loạn tiêu hóa', 'Thiếu máu']
+DOCTORS = ['BS. Nguyễn Văn Hùng', 'BS. Trần Thị Mai', 'BS. Lê Minh Tâm', 'BS. Phạm Quốc Bảo', 'BS. Võ Thanh Hà']
+
+BATCH_SIZE = 10000
+
+
+def create_database(path, version=SCHEMA_VERSION):
+    """Tạo (lại) file database tại `path` với cấu trúc bảng ở phiên bản `version`"""
+    for suffix in ('', '-wal', '-shm'):
+        if os.path.exists(path + suffix):
+            os.remove(path + suffix)
+    conn = configure_connection(sqlite3.connect(path))
+    migrate(conn, version)
+    return conn
+
+
+def random_patient(rng, index):
+    name = f"{rng.choice(FIRST_NAMES)} {rng.choice(MIDDLE_NAMES)} {rng.choice(LAST_NAMES)}"
+    birth_date = f"{rng.randint(1, 28):02d}/{rng.randint(1, 12):02d}/{rng.randint(1940, 2020)}"
+    gender = rng.choice(['Nam', 'Nữ'])
+    phone = f"09{rng.randint(0, 99999999):08d}"
+    address = f"{rng.randint(1, 500)} đường số {rng.randint(1, 50)}, {rng.choice(CITIES)}"
+    created_date = (f"{rng.randint(2015, 2025)}-{rng.randint(1, 12):02d}-{rng.randint(1, 28):02d} "
+                    f"{rng.randint(0, 23):02d}:{rng.randint(0, 59):02d}:{index % 60:02d}")
+    return (name, birth_date, gender, phone, address, created_date)
+
+
+def insert_patients(conn, count, rng):
+    for start in range(0, count, BATCH_SIZE):
+        batch = [random_patient(rng, i) for i in range(start, min(start + BATCH_SIZE, count))]
+        conn.executemany('''
+            INSERT INTO patients (name, birth_date, gender, phone, address, created_date)
+            VALUES (?, ?, ?, ?, ?, ?)
+        ''', batch)
+    conn.commit()
+
+
+def insert_catalogues(conn, test_types=50, medicines=500):
+    """Tạo danh mục loại xét nghiệm và loại thuốc"""
+    conn.executemany("INSERT INTO test_types (name, description) VALUES (?, ?)",
+                     [(f"Xét nghiệm {i}", '') for i in range(1, test_types + 1)])
+    conn.executemany("INSERT INTO medicine_types (name, description) VALUES (?, ?)",
+                     [(f"Thuốc {i}", '') for i in range(1, medicines + 1)])
+    conn.commit()
+
+
+def insert_records(conn, per_patient, rng, iso_dates=True):
+    """Tạo `per_patient` bệnh án cho mỗi bệnh nhân, mỗi bệnh án có một xét nghiệm và một đơn thuốc
+
+    iso_dates=False lưu ngày theo dạng dd/mm/YYYY như các phiên bản database cũ.
+    """
+    patient_ids = [row[0] for row in conn.execute("SELECT id FROM patients")]
+    test_types = conn.execute("SELECT COUNT(*) FROM test_types").fetchone()[0]
+    medicines = conn.execute("SELECT COUNT(*) FROM medicine_types").fetchone()[0]
+    record_id = conn.execute("SELECT COALESCE(MAX(id), 0) FROM medical_records").fetchone()[0]
+
+    records, tests, prescriptions = [], [], []
+    for patient_id in patient_ids:
+        for _ in range(per_patient):
+            record_id += 1
+            year, month, day = rng.randint(2015, 2025), rng.randint(1, 12), rng.randint(1, 28)
+            visit_date = f"{year}-{month:02d}-{day:02d}" if iso_dates else f"{day:02d}/{month:02d}/{year}"
+            records.append((record_id, patient_id, visit_date, rng.choice(DIAGNOSES), 'Sốt, ho',
+                            'Nghỉ ngơi, uống nhiều nước', '', rng.choice(DOCTORS)))
+            tests.append((record_id, rng.randint(1, test_types), 'Bình thường', visit_date, ''))
+            prescriptions.append((record_id, rng.randint(1, medicines), '1 viên sáng + 1 viên tối',
+                                  rng.randint(1, 30), 'Uống sau ăn'))
+        if len(records) >= BATCH_SIZE:
+            _flush_records(conn, records, tests, prescriptions)
+    _flush_records(conn, records, tests, prescriptions)
+    conn.commit()
+
+
+def _flush_records(conn, records, tests, prescriptions):
+    conn.executemany('''
+        INSERT INTO medical_records
+        (id, patient_id, visit_date, diagnosis, symptoms, treatment, notes, doctor_name)
+        VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+    ''', records)
+    conn.executemany('''
+        INSERT INTO test_results (record_id, test_type_id, result, test_date, notes)
+        VALUES (?, ?, ?, ?, ?)
+    ''', tests)
+    conn.executemany('''
+        INSERT INTO prescriptions (record_id, medicine_id, dosage, quantity, instructions)
+        VALUES (?, ?, ?, ?, ?)
+    ''', prescriptions)
+    records.clear()
+    tests.clear()
+    prescriptions.clear()
+
+
+def seed_patients(path, count, seed=42):
+    """Tạo (lại) file database tại `path` với `count` bệnh nhân ngẫu nhiên"""
+    conn = create_database(path)
+    insert_patients(conn, count, random.Random(seed))
+    conn.close()
@@ -0,0 +1,132 @@
+import unicodedata
+from bisect import bisect_left, bisect_right
+
+# Số dòng tối đa đưa vào combobox khi lọc theo chữ đang gõ
+FILTER_LIMIT = 500
+# Bỏ dấu thanh/dấu mũ sau khi tách NFD (khối Combining Diacritical Marks)
+_STRIP_MARKS = dict.fromkeys(range(0x300, 0x370))
+
+
+def fold_text(text):
+    """Chữ thường, bỏ dấu tiếng Việt (kể cả đ) để so khớp khi gõ tìm"""
+    text = text.replace('đ', 'd').replace('Đ', 'D')
+    return unicodedata.normalize('NFD', text).translate(_STRIP_MARKS).casefold()
+
+
+class Catalogue:
+    """Bảng danh mục (loại xét nghiệm, loại thuốc) giữ trong bộ nhớ
+
+    Nạp một lần từ database bằng set_rows; thêm/sửa/xóa cập nhật đúng dòng bị
+    đổi bằng put/remove thay vì truy vấn lại cả bảng. Nhãn "ID - Tên" cho
+    combobox và bảng tra nhãn/tên -> id được dựng lại khi cần sau mỗi thay đổi;
+    tên đã bỏ dấu được giữ theo từng dòng nên chỉ dòng bị đổi phải tính lại.
+    """
+
+    def __init__(self, table):
+        self.table = table
+        self.rows = None  # id -> (name, description); None khi chưa nạp
+        self.waiting = []  # callback chờ lần nạp đầu tiên
+        self._folded = {}  # id -> tên đã bỏ dấu
+        self._labels = None
+        self._label_ids = {}
+        self._name_ids = {}
+        self._prefix = []  # (tên đã bỏ dấu, id) theo thứ tự tên
+        self._text = ''  # các nhãn đã bỏ dấu nối bằng '\n', theo id
+        self._starts = []  # vị trí đầu mỗi nhãn trong _text
+
+    def loaded(self):
+        return self.rows is not None
+
+    def set_rows(self, rows):
+        """Nạp toàn bộ danh mục từ list (id, name, description)"""
+        self.rows = {row_id: (name, description) for row_id, name, description in rows}
+        self._folded = {row_id: fold_text(row[0]) for row_id, row in self.rows.items()}
+        self._labels = None
+
+    def put(self, row_id, name, description):
+        """Thêm hoặc cập nhật một dòng sau khi đã ghi vào database"""
+        if self.rows is not None:
+            self.rows[row_id] = (name, description)
+            self._folded[row_id] = fold_text(name)
+            self._labels = None
+
+    def remove(self, row_id):
+        """Bỏ một dòng sau khi đã xóa khỏi database"""
+        if self.rows is not None and self.rows.pop(row_id, None) is not None:
+            self._folded.pop(row_id, None)
+            self._labels = None
+
+    def _build(self):
+        if self._labels is not None:
+            return
+        ids = sorted(self.rows or {})
+        self._labels = [f"{row_id} - {self.rows[row_id][0]}" for row_id in ids]
+        self._label_ids = dict(zip(self._labels, ids))
+        self._name_ids = {}
+        for row_id in ids:
+            self._name_ids.setdefault(self.rows[row_id][0].strip().casefold(), row_id)
+        self._prefix = sorted((self._folded[row_id], row_id) for row_id in ids)
+        self._starts = []
+        position = 0
+        for row_id in ids:
+            self._starts.append(position)
+            position += len(str(row_id)) + 3 + len(self._folded[row_id]) + 1
+        self._text = '\n'.join(f"{row_id} - {self._folded[row_id]}" for row_id in ids)
+
+    def list_rows(self):
+        """Các dòng (id, name, description) theo id"""
+        return [(row_id, *self.rows[row_id]) for row_id in sorted(self.rows or {})]
+
+    def values(self):
+        """Toàn bộ nhãn "ID - Tên" theo id"""
+        self._build()
+        return self._labels
+
+    def label(self, row_id):
+        row = (self.rows or {}).get(row_id)
+        return f"{row_id} - {row[0]}" if row else None
+
+    def name(self, row_id):
+        row = (self.rows or {}).get(row_id)
+        return row[0] if row else None
+
+    def id_for_name(self, name):
+        """Id theo tên (không phân biệt hoa thường), None nếu không có"""
+        self._build()
+        return self._name_ids.get(str(name or '').strip().casefold())
+
+    def id_for_label(self, text):
+        """Id theo nhãn "ID - Tên" trên combobox; nhận cả tên trần (dòng tải từ database)"""
+        self._build()
+        text = str(text or '').strip()
+        row_id = self._label_ids.get(text)
+        return row_id if row_id is not None else self.id_for_name(text)
+
+    def filter(self, text, limit=FILTER_LIMIT):
+        """Nhãn khớp chữ đang gõ (không dấu): tên bắt đầu bằng chữ gõ xếp trước, sau đó tới nhãn chứa chữ gõ"""
+        self._build()
+        text = fold_text(text.strip())
+        if not text or '\n' in text:
+            return self._labels[:limit]
+        result = []
+        seen = set()
+        index = bisect_left(self._prefix, (text,))
+        while index < len(self._prefix) and len(result) < limit:
+            folded, row_id = self._prefix[index]
+            if not folded.startswith(text):
+                break
+            result.append(self.label(row_id))
+            seen.add(row_id)
+            index += 1
+        position = self._text.find(text)
+        while position >= 0 and len(result) < limit:
+            line = bisect_right(self._starts, position) - 1
+            label = self._labels[line]
+            if self._label_ids[label] not in seen:
+                result.append(label)
+            # Tiếp tục từ dòng sau, mỗi nhãn chỉ lấy một lần
+            next_line = line + 1
+            if next_line >= len(self._starts):
+                break
+            position = self._text.find(text, self._starts[next_line])
+        return result
@@ -0,0 +1,463 @@
+"""Nhập/xuất hàng loạt bệnh nhân và bệnh án (CSV, mảng JSON, JSON Lines)
+
+Dùng không cần giao diện, ví dụ khi chuyển dữ liệu từ phòng khám khác:
+
+    python data_transfer.py import --patients benh_nhan.csv --records benh_an.jsonl
+    python data_transfer.py export --patients benh_nhan.csv --records benh_an.json
+
+Tệp bệnh nhân có các cột PATIENT_FIELDS; cột id (nếu có) là id ở hệ thống cũ và
+được dùng để nối với cột patient_id của tệp bệnh án nhập cùng lần. Tệp bệnh án có
+các cột RECORD_FIELDS; tests/prescriptions là danh sách đối tượng (trong CSV là
+chuỗi JSON) với tên loại xét nghiệm/thuốc đã có trong danh mục.
+"""
+import argparse
+import csv
+import json
+import os
+import re
+import sqlite3
+import sys
+from functools import partial
+from itertools import islice
+
+from catalogue import Catalogue
+from database import (fetch_catalogue, insert_record_items, is_iso_date, iso_date, normalize_timestamp,
+                      validate_patient_entry, validate_record_entry)
+from schema import configure_connection, migrate
+
+PATIENT_FIELDS = ('id', 'name', 'birth_date', 'gender', 'phone', 'address', 'created_date')
+RECORD_FIELDS = ('id', 'patient_id', 'visit_date', 'diagnosis', 'symptoms', 'treatment', 'notes',
+                 'doctor_name', 'tests', 'prescriptions')
+TEST_FIELDS = ('test_type', 'result', 'notes')
+PRESCRIPTION_FIELDS = ('medicine', 'dosage', 'quantity', 'instructions')
+
+# Số dòng mỗi giao dịch khi nhập và mỗi lần fetchmany khi xuất
+CHUNK_SIZE = 10000
+MAX_ERRORS = 1000
+
+# Lỗi do dữ liệu của dòng (khóa ngoại sai, kiểu không ghi được); lỗi khác như
+# "database is locked" vẫn được ném ra để dừng cả lần nhập
+ROW_ERRORS = (sqlite3.IntegrityError, sqlite3.ProgrammingError, sqlite3.InterfaceError)
+
+
+class ImportReport:
+    """Kết quả một lần nhập: số dòng đã nhập, lỗi của từng dòng bị bỏ qua và cảnh báo
+    của các dòng vẫn được nhập nhưng có dữ liệu giữ nguyên như trong tệp"""
+
+    def __init__(self, max_errors=MAX_ERRORS):
+        self.imported = 0
+        self.failed = 0
+        self.errors = []  # (số thứ tự dòng dữ liệu, thông báo), giữ tối đa max_errors lỗi đầu tiên
+        self.warned = 0
+        self.warnings = []  # như errors
+        self.max_errors = max_errors
+
+    def add_error(self, row_number, message):
+        self.failed += 1
+        if len(self.errors) < self.max_errors:
+            self.errors.append((row_number, message))
+
+    def add_warning(self, row_number, message):
+        self.warned += 1
+        if len(self.warnings) < self.max_errors:
+            self.warnings.append((row_number, message))
+
+    def __str__(self):
+        text = f"Đã nhập {self.imported} dòng, bỏ qua {self.failed} dòng lỗi"
+        return f"{text}, {self.warned} cảnh báo" if self.warned else text
+
+
+def _file_format(path):
+    extension = os.path.splitext(path)[1].lower()
+    if extension == '.csv':
+        return 'csv'
+    if extension in ('.jsonl', '.ndjson'):
+        return 'jsonl'
+    if extension == '.json':
+        return 'json'
+    raise ValueError(f"Không hỗ trợ định dạng tệp: {path}")
+
+
+def _iter_json(f, buffer_size=1 << 16):
+    """Đọc lần lượt từng phần tử của mảng JSON hoặc JSON Lines mà không nạp cả tệp"""
+    decoder = json.JSONDecoder()
+    whitespace = re.compile(r'\s*')
+    buffer, pos, eof = '', 0, False
+    array = None  # None: chưa đọc ký tự đầu; True: mảng JSON; False: JSON Lines
+    while True:
+        pos = whitespace.match(buffer, pos).end()
+        if pos < len(buffer):
+            if array is None:
+                array = buffer[pos] == '['
+                pos += array
+                continue
+            if array and buffer[pos] == ',':
+                pos += 1
+                continue
+            if array and buffer[pos] == ']':
+                return
+            try:
+                value, end = decoder.raw_decode(buffer, pos)
+            except json.JSONDecodeError:
+                if eof:
+                    raise
+            else:
+                # Giá trị chạm cuối bộ đệm có thể bị cắt dở, đọc thêm rồi giải mã lại
+                if end < len(buffer) or eof:
+                    yield value
+                    pos = end
+                    continue
+        elif eof:
+            return
+        chunk = f.read(buffer_size)
+        eof = not chunk
+        buffer, pos = buffer[pos:] + chunk, 0
+
+
+def read_rows(path):
+    """Đọc tệp CSV/JSON/JSON Lines theo luồng, sinh (số thứ tự dòng, dict)"""
+    file_format = _file_format(path)
+    if file_format == 'csv':
+        # utf-8-sig: bỏ BOM của tệp CSV xuất từ Excel
+        with open(path, newline='', encoding='utf-8-sig') as f:
+            for row_number, row in enumerate(csv.DictReader(f), start=1):
+                yield row_number, {key: (value if value != '' else None) for key, value in row.items()}
+    else:
+        with open(path, encoding='utf-8') as f:
+            yield from enumerate(_iter_json(f), start=1)
+
+
+def _load_catalogue(cursor, table):
+    """Nạp danh mục vào bộ nhớ một lần để đổi tên <-> id không cần truy vấn"""
+    catalogue = Catalogue(table)
+    catalogue.set_rows(fetch_catalogue(cursor, table))
+    return catalogue
+
+
+def _next_id(cursor, table):
+    """Id kế tiếp của bảng AUTOINCREMENT (gọi trong giao dịch ghi đang giữ khóa)"""
+    cursor.execute(f"""
+        SELECT MAX(COALESCE((SELECT seq FROM sqlite_sequence WHERE name = ?), 0),
+                   COALESCE((SELECT MAX(id) FROM {table}), 0)) + 1
+    """, (table,))
+    return cursor.fetchone()[0]
+
+
+def _write_chunk(conn, rows, write, report):
+    """Ghi một khối dòng đã kiểm tra trong một giao dịch, trả về list (dòng, id mới)
+
+    rows: list (số thứ tự dòng, dữ liệu); write(cursor, list dữ liệu) -> list id mới.
+    Nếu database từ chối khối (ví dụ khóa ngoại sai), ghi lại từng dòng với
+    SAVEPOINT để chỉ bỏ qua các dòng lỗi.
+    """
+    cursor = conn.cursor()
+    cursor.execute('BEGIN IMMEDIATE')
+    try:
+        new_ids = write(cursor, [data for _, data in rows])
+    except ROW_ERRORS:
+        cursor.execute('ROLLBACK')
+    else:
+        cursor.execute('COMMIT')
+        report.imported += len(rows)
+        return [(row_number, new_id) for (row_number, _), new_id in zip(rows, new_ids)]
+
+    written = []
+    cursor.execute('BEGIN IMMEDIATE')
+    try:
+        for row_number, data in rows:
+            cursor.execute('SAVEPOINT import_row')
+            try:
+                new_ids = write(cursor, [data])
+            except ROW_ERRORS as e:
+                cursor.execute('ROLLBACK TO import_row')
+                report.add_error(row_number, str(e))
+            else:
+                written.append((row_number, new_ids[0]))
+            cursor.execute('RELEASE import_row')
+        cursor.execute('COMMIT')
+    except BaseException:
+        cursor.execute('ROLLBACK')
+        raise
+    report.imported += len(written)
+    return written
+
+
+def _insert_staged(cursor, table, columns, rows, select=None):
+    """Ghi cả khối vào bảng có trigger bằng một câu lệnh INSERT ... SELECT
+
+    executemany chạy mỗi dòng như một câu lệnh riêng nên trigger FTS5/thống kê
+    phải đẩy dữ liệu sau từng dòng; ghi trước vào bảng tạm rồi chuyển sang trong
+    một câu lệnh nhanh hơn khoảng 5 lần.
+    """
+    column_list = ', '.join(columns)
+    cursor.execute(f"CREATE TEMP TABLE IF NOT EXISTS import_{table} ({column_list})")
+    cursor.execute(f"DELETE FROM temp.import_{table}")
+    cursor.executemany(f"INSERT INTO temp.import_{table} VALUES ({', '.join('?' * len(columns))})", rows)
+    cursor.execute(f"INSERT INTO {table} ({column_list}) SELECT {select or column_list} FROM temp.import_{table}")
+    cursor.execute(f"DELETE FROM temp.import_{table}")
+
+
+def _write_patients(cursor, patients):
+    first_id = _next_id(cursor, 'patients')
+    ids = range(first_id, first_id + len(patients))
+    _insert_staged(cursor, 'patients', PATIENT_FIELDS,
+                   [(patient_id, *patient) for patient_id, patient in zip(ids, patients)],
+                   select=f"{', '.join(PATIENT_FIELDS[:6])}, COALESCE(created_date, CURRENT_TIMESTAMP)")
+    return list(ids)
+
+
+def _write_records(cursor, entries):
+    # Cấp trước id bệnh án để ghi cả khối một lần (không cần lastrowid từng dòng)
+    first_id = _next_id(cursor, 'medical_records')
+    ids = range(first_id, first_id + len(entries))
+    _insert_staged(cursor, 'medical_records', RECORD_FIELDS[:8],
+                   [(record_id, patient_id, *record) for record_id, (patient_id, record, _, _) in zip(ids, entries)])
+    insert_record_items(cursor, [(record_id, record, tests, prescriptions)
+                                 for record_id, (_, record, tests, prescriptions) in zip(ids, entries)])
+    return list(ids)
+
+
+def _import(conn, path, parse, write, chunk_size, report):
+    """Đọc tệp theo khối, kiểm tra từng dòng bằng parse rồi ghi khối bằng write
+
+    parse(data, warn): warn(message) ghi cảnh báo cho dòng đang đọc.
+    """
+    rows = read_rows(path)
+    row_number = 0
+    read_error = None
+    while read_error is None:
+        chunk = []
+        try:
+            for row_number, data in islice(rows, chunk_size):
+                chunk.append((row_number, data))
+        except (ValueError, csv.Error) as e:
+            # Tệp hỏng cấu trúc: ghi nốt các dòng đã đọc được rồi dừng
+            read_error = (row_number + 1, f"Không đọc được tệp: {e}")
+        valid = []
+        for row_number, data in chunk:
+            try:
+                valid.append((row_number, parse(data, partial(report.add_warning, row_number))))
+            except (ValueError, TypeError, AttributeError, KeyError) as e:
+                report.add_error(row_number, str(e))
+        if valid:
+            yield chunk, _write_chunk(conn, valid, write, report)
+        if not chunk:
+            break
+    if read_error is not None:
+        report.add_error(*read_error)
+
+
+def _field(data, name):
+    value = data.get(name)
+    return value.strip() if isinstance(value, str) else value
+
+
+def import_patients(conn, path, id_map=None, chunk_size=CHUNK_SIZE):
+    """Nhập bệnh nhân từ tệp, trả về ImportReport
+
+    conn là kết nối mở với isolation_level=None (tự quản lý giao dịch). Nếu truyền
+    id_map (dict), id_map được điền id cũ (cột id, dạng chuỗi) -> id mới.
+    """
+    report = ImportReport()
+
+    def parse(data, warn):
+        patient = validate_patient_entry(tuple(_field(data, name) for name in PATIENT_FIELDS[1:6]))
+        return (*patient, normalize_timestamp(_field(data, 'created_date')))
+
+    for chunk, written in _import(conn, path, parse, _write_patients, chunk_size, report):
+        if id_map is not None:
+            source_ids = {row_number: data.get('id') for row_number, data in chunk}
+            for row_number, new_id in written:
+                if source_ids[row_number] is not None:
+                    id_map[str(source_ids[row_number])] = new_id
+    return report
+
+
+def _nested(value, fields):
+    """Danh sách xét nghiệm/đơn thuốc: list dict (JSON) hoặc chuỗi JSON (CSV)"""
+    if value is None:
+        return []
+    if isinstance(value, str):
+        value = json.loads(value)
+    return [tuple(item.get(field) for field in fields) for item in value]
+
+
+def _resolve(catalogue, name, label):
+    type_id = catalogue.id_for_name(name)
+    if type_id is None:
+        raise ValueError(f"Không có {label} '{name}' trong danh mục")
+    return type_id
+
+
+def import_records(conn, path, id_map=None, chunk_size=CHUNK_SIZE):
+    """Nhập bệnh án cùng xét nghiệm và đơn thuốc từ tệp, trả về ImportReport
+
+    patient_id được đổi qua id_map (từ import_patients) nếu có, ngược lại được
+    coi là id bệnh nhân trong database. Tên loại xét nghiệm/thuốc được đổi sang id
+    bằng danh mục nạp một lần vào bộ nhớ; tên không có trong danh mục là lỗi dòng.
+    Ngày khám trống hoặc không đọc được (database cũ có thể có) được giữ nguyên
+    kèm cảnh báo thay vì bỏ cả bệnh án.
+    """
+    report = ImportReport()
+    cursor = conn.cursor()
+    test_types = _load_catalogue(cursor, 'test_types')
+    medicines = _load_catalogue(cursor, 'medicine_types')
+
+    def parse(data, warn):
+        patient_id = data.get('patient_id')
+        if id_map is not None:
+            if str(patient_id) not in id_map:
+                raise ValueError(f"Không tìm thấy bệnh nhân {patient_id} trong tệp bệnh nhân")
+            patient_id = id_map[str(patient_id)]
+        else:
+            patient_id = int(patient_id)
+
+        visit_date = iso_date(_field(data, 'visit_date'))
+        if not is_iso_date(visit_date):
+            warn(f"Ngày khám không hợp lệ, giữ nguyên: {visit_date!r}" if visit_date else "Bệnh án không có ngày khám")
+        record = (visit_date, *(_field(data, name) for name in RECORD_FIELDS[3:8]))
+        tests = [(_resolve(test_types, test_type, 'loại xét nghiệm'), result, notes)
+                 for test_type, result, notes in _nested(data.get('tests'), TEST_FIELDS)]
+        prescriptions = [(_resolve(medicines, medicine, 'thuốc'), dosage, quantity, instructions)
+                         for medicine, dosage, quantity, instructions
+                         in _nested(data.get('prescriptions'), PRESCRIPTION_FIELDS)]
+        return (patient_id, *validate_record_entry(record, tests, prescriptions, require_date=False))
+
+    for _ in _import(conn, path, parse, _write_records, chunk_size, report):
+        pass
+    return report
+
+
+def _iter_query(cursor, batch_size):
+    while True:
+        rows = cursor.fetchmany(batch_size)
+        if not rows:
+            return
+        yield from rows
+
+
+def iter_patients(conn, batch_size=CHUNK_SIZE):
+    """Sinh từng bệnh nhân dạng dict theo id tăng dần"""
+    cursor = conn.execute(f"SELECT {', '.join(PATIENT_FIELDS)} FROM patients ORDER BY id")
+    for row in _iter_query(cursor, batch_size):
+        yield dict(zip(PATIENT_FIELDS, row))
+
+
+def iter_records(conn, batch_size=CHUNK_SIZE):
+    """Sinh từng bệnh án dạng dict kèm danh sách xét nghiệm và đơn thuốc
+
+    Ba truy vấn cùng sắp theo id bệnh án được duyệt song song (trộn như merge
+    join) nên bộ nhớ không phụ thuộc số bệnh án.
+    """
+    test_types = _load_catalogue(conn.cursor(), 'test_types')
+    medicines = _load_catalogue(conn.cursor(), 'medicine_types')
+    records = conn.execute(f"SELECT {', '.join(RECORD_FIELDS[:8])} FROM medical_records ORDER BY id")
+    tests = _iter_query(conn.execute("""
+        SELECT record_id, test_type_id, result, notes FROM test_results ORDER BY record_id, id
+    """), batch_size)
+    prescriptions = _iter_query(conn.execute("""
+        SELECT record_id, medicine_id, dosage, quantity, instructions FROM prescriptions ORDER BY record_id, id
+    """), batch_size)
+
+    test = next(tests, None)
+    prescription = next(prescriptions, None)
+    for row in _iter_query(records, batch_size):
+        record = dict(zip(RECORD_FIELDS[:8], row))
+        record_id = row[0]
+
+        record['tests'] = []
+        while test is not None and test[0] <= record_id:
+            if test[0] == record_id:
+                record['tests'].append(dict(zip(TEST_FIELDS, (test_types.name(test[1]), *test[2:]))))
+            test = next(tests, None)
+
+        record['prescriptions'] = []
+        while prescription is not None and prescription[0] <= record_id:
+            if prescription[0] == record_id:
+                record['prescriptions'].append(
+                    dict(zip(PRESCRIPTION_FIELDS, (medicines.name(prescription[1]), *prescription[2:]))))
+            prescription = next(prescriptions, None)
+        yield record
+
+
+def write_rows(path, rows, fields):
+    """Ghi các dict theo luồng ra CSV/JSON/JSON Lines, trả về số dòng đã ghi"""
+    file_format = _file_format(path)
+    count = 0
+    with open(path, 'w', newline='', encoding='utf-8') as f:
+        if file_format == 'csv':
+            writer = csv.DictWriter(f, fieldnames=fields)
+            writer.writeheader()
+            for row in rows:
+                writer.writerow({key: json.dumps(value, ensure_ascii=False) if isinstance(value, list) else value
+                                 for key, value in row.items()})
+                count += 1
+        elif file_format == 'jsonl':
+            for row in rows:
+                f.write(json.dumps(row, ensure_ascii=False))
+                f.write('\n')
+                count += 1
+        else:
+            f.write('[')
+            for row in rows:
+                f.write(',\n' if count else '\n')
+                f.write(json.dumps(row, ensure_ascii=False))
+                count += 1
+            f.write('\n]\n')
+    return count
+
+
+def export_patients(conn, path, batch_size=CHUNK_SIZE):
+    """Xuất toàn bộ bệnh nhân ra tệp, trả về số dòng"""
+    return write_rows(path, iter_patients(conn, batch_size), PATIENT_FIELDS)
+
+
+def export_records(conn, path, batch_size=CHUNK_SIZE):
+    """Xuất toàn bộ bệnh án (kèm xét nghiệm, đơn thuốc) ra tệp, trả về số dòng"""
+    return write_rows(path, iter_records(conn, batch_size), RECORD_FIELDS)
+
+
+def print_report(label, report, limit=20):
+    print(f"{label}: {report}")
+    for row_number, message in report.errors[:limit]:
+        print(f"  Dòng {row_number}: {message}")
+    if report.failed > limit:
+        print(f"  ... và {report.failed - limit} lỗi khác")
+    for row_number, message in report.warnings[:limit]:
+        print(f"  Dòng {row_number} (cảnh báo): {message}")
+    if report.warned > limit:
+        print(f"  ... và {report.warned - limit} cảnh báo khác")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('action', choices=['import', 'export'])
+    parser.add_argument('--patients', help="Tệp bệnh nhân (.csv, .json, .jsonl)")
+    parser.add_argument('--records', help="Tệp bệnh án (.csv, .json, .jsonl)")
+    parser.add_argument('--db', default='patients.db')
+    parser.add_argument('--chunk-size', type=int, default=CHUNK_SIZE)
+    args = parser.parse_args(argv)
+    if not args.patients and not args.records:
+        parser.error("cần ít nhất --patients hoặc --records")
+
+    conn = configure_connection(sqlite3.connect(args.db, isolation_level=None))
+    migrate(conn)
+    try:
+        if args.action == 'import':
+            id_map = None
+            if args.patients:
+                id_map = {}
+                print_report("Bệnh nhân", import_patients(conn, args.patients, id_map, args.chunk_size))
+            if args.records:
+                print_report("Bệnh án", import_records(conn, args.records, id_map, args.chunk_size))
+        else:
+            if args.patients:
+                print(f"Đã xuất {export_patients(conn, args.patients, args.chunk_size)} bệnh nhân")
+            if args.records:
+                print(f"Đã xuất {export_records(conn, args.records, args.chunk_size)} bệnh án")
+    finally:
+        conn.close()
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,671 @@
+import json
+import re
+from datetime import date, datetime, timezone
+from functools import lru_cache
+
+from catalogue import fold_text
+
+# Các cột bệnh nhân hiển thị trên patient_tree (theo đúng thứ tự của bảng)
+PATIENT_COLUMNS = ('id', 'name', 'birth_date', 'gender', 'phone', 'address', 'created_date')
+
+# Các kiểu sắp xếp hỗ trợ phân trang theo khóa: tên cột -> chiều sắp xếp.
+# Khóa của mỗi dòng là (giá trị cột, id) nên luôn duy nhất.
+PATIENT_ORDERINGS = {
+    'created_date': 'DESC',
+    'name': 'ASC',
+}
+
+# Các cột bệnh án theo thứ tự giao diện dùng (record[0] ... record[7])
+RECORD_COLUMNS = ('id', 'patient_id', 'visit_date', 'diagnosis', 'symptoms', 'treatment', 'notes', 'doctor_name')
+
+# Bảng danh mục -> (bảng dùng danh mục, cột tham chiếu)
+CATALOGUE_USAGE = {
+    'test_types': ('test_results', 'test_type_id'),
+    'medicine_types': ('prescriptions', 'medicine_id'),
+}
+
+# Số kết quả tối đa trả về cho một lần tìm kiếm
+SEARCH_LIMIT = 200
+
+# Số bệnh nhân khớp mới nhất được xếp hạng cho mỗi nhóm kết quả tìm kiếm: xếp hạng
+# mọi dòng khớp từ phổ biến ("nguyen", "090") mất hàng trăm ms với 1 triệu bệnh nhân
+SEARCH_CANDIDATES = 1000
+
+# Độ dài tiền tố ngắn nhất có trong chỉ mục patients_fts (prefix='2 3 4')
+SEARCH_PREFIX_MIN = 2
+
+# Chỉ tìm khi đã gõ ít nhất chừng này chữ/số: tiền tố 1-2 ký tự như "ng" khớp phần
+# lớn bảng bệnh nhân và xếp hạng toàn bộ số đó mất hàng trăm ms
+MIN_SEARCH_LENGTH = 3
+
+# unicode61 bỏ dấu tiếng Việt nhưng "đ" không phải chữ có dấu nên phải tự đổi sang "d"
+_FOLD_SQL = "replace(replace({0}, 'đ', 'd'), 'Đ', 'D')"
+
+
+def iso_date(text):
+    """Đổi ngày dd/mm/YYYY trên form sang YYYY-MM-DD để lưu vào database"""
+    try:
+        return datetime.strptime(text, '%d/%m/%Y').date().isoformat()
+    except (TypeError, ValueError):
+        return text
+
+
+def normalize_timestamp(value):
+    """Chuẩn hóa ngày tạo (nhập từ tệp) sang YYYY-MM-DD HH:MM:SS như CURRENT_TIMESTAMP
+
+    Nhận dạng ISO (có thể kèm giờ, múi giờ) hoặc dd/mm/YYYY [HH:MM[:SS]]. Trả về None
+    nếu trống, ném ValueError nếu không đọc được.
+    """
+    if value is None or not str(value).strip():
+        return None
+    text = str(value).strip()
+    try:
+        parsed = datetime.fromisoformat(text)
+    except ValueError:
+        parsed = None
+        for fmt in ('%d/%m/%Y %H:%M:%S', '%d/%m/%Y %H:%M', '%d/%m/%Y'):
+            try:
+                parsed = datetime.strptime(text, fmt)
+                break
+            except ValueError:
+                pass
+    if parsed is None:
+        raise ValueError(f"Ngày tạo không hợp lệ: '{text}'")
+    if parsed.tzinfo is not None:
+        # CURRENT_TIMESTAMP của SQLite là giờ UTC
+        parsed = parsed.astimezone(timezone.utc).replace(tzinfo=None)
+    return parsed.strftime('%Y-%m-%d %H:%M:%S')
+
+
+def is_iso_date(value):
+    """Giá trị là ngày YYYY-MM-DD hợp lệ"""
+    try:
+        date.fromisoformat(value)
+    except (TypeError, ValueError):
+        return False
+    return True
+
+
+def display_date(value):
+    """Đổi ngày YYYY-MM-DD trong database sang dd/mm/YYYY để hiển thị"""
+    try:
+        return date.fromisoformat(value).strftime('%d/%m/%Y')
+    except (TypeError, ValueError):
+        return value
+
+
+def create_patient_indexes(cursor):
+    """Tạo index phục vụ phân trang theo khóa trên bảng patients"""
+    cursor.execute('CREATE INDEX IF NOT EXISTS idx_patients_created_date ON patients(created_date, id)')
+    cursor.execute('CREATE INDEX IF NOT EXISTS idx_patients_name ON patients(name, id)')
+
+
+def create_patient_search_index(cursor):
+    """Tạo chỉ mục FTS5 cho tên/SĐT/địa chỉ bệnh nhân và trigger giữ đồng bộ
+
+    patients_fts là bảng contentless (rowid = patients.id) nên chỉ tốn chỗ cho
+    chỉ mục. detail=full giữ vị trí của từ (cần cho truy vấn cụm từ và bm25).
+    Lần đầu tạo sẽ nạp toàn bộ bệnh nhân đang có.
+    """
+    cursor.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'patients_fts'")
+    exists = cursor.fetchone() is not None
+
+    cursor.execute('''
+        CREATE VIRTUAL TABLE IF NOT EXISTS patients_fts USING fts5(
+            name, phone, address,
+            content='', detail=full,
+            tokenize='unicode61 remove_diacritics 2',
+            prefix='2 3 4'
+        )
+    ''')
+    name, address = _FOLD_SQL.format('new.name'), _FOLD_SQL.format('new.address')
+    old_name, old_address = _FOLD_SQL.format('old.name'), _FOLD_SQL.format('old.address')
+    cursor.execute(f'''
+        CREATE TRIGGER IF NOT EXISTS patients_fts_insert AFTER INSERT ON patients BEGIN
+            INSERT INTO patients_fts(rowid, name, phone, address)
+            VALUES (new.id, {name}, new.phone, {address});
+        END
+    ''')
+    cursor.execute(f'''
+        CREATE TRIGGER IF NOT EXISTS patients_fts_delete AFTER DELETE ON patients BEGIN
+            INSERT INTO patients_fts(patients_fts, rowid, name, phone, address)
+            VALUES ('delete', old.id, {old_name}, old.phone, {old_address});
+        END
+    ''')
+    cursor.execute(f'''
+        CREATE TRIGGER IF NOT EXISTS patients_fts_update AFTER UPDATE OF name, phone, address ON patients BEGIN
+            INSERT INTO patients_fts(patients_fts, rowid, name, phone, address)
+            VALUES ('delete', old.id, {old_name}, old.phone, {old_address});
+            INSERT INTO patients_fts(rowid, name, phone, address)
+            VALUES (new.id, {name}, new.phone, {address});
+        END
+    ''')
+
+    if not exists:
+        cursor.execute(f'''
+            INSERT INTO patients_fts(rowid, name, phone, address)
+            SELECT id, {_FOLD_SQL.format('name')}, phone, {_FOLD_SQL.format('address')} FROM patients
+        ''')
+
+
+def _search_tokens(term):
+    """Các từ đã bỏ dấu, chữ thường trong chuỗi tìm kiếm"""
+    return re.findall(r'\w+', fold_text(term))
+
+
+def build_search_query(term, prefix=True):
+    """Chuyển chuỗi người dùng gõ thành truy vấn FTS5
+
+    Mọi từ đều phải khớp. Với prefix=True từ cuối cùng (đang gõ dở) được khớp theo
+    tiền tố, nên gõ "090" tìm được "0901234567" và "nguyen v" tìm được "Nguyễn
+    Văn"; prefix=False chỉ khớp nguyên từ. Trả về None nếu chưa đủ MIN_SEARCH_LENGTH chữ/số.
+    """
+    tokens = _search_tokens(term)
+    if sum(len(token) for token in tokens) < MIN_SEARCH_LENGTH:
+        return None
+    return _match_query(tokens, prefix)
+
+
+def _match_query(tokens, prefix):
+    words = [f'"{token}"' for token in tokens]
+    if prefix:
+        words[-1] += '*'
+    return ' AND '.join(words)
+
+
+def _search_candidates(cursor, query, exclude=()):
+    """SEARCH_CANDIDATES bệnh nhân mới nhất khớp `query`, bỏ các id trong `exclude`"""
+    # FTS5 duyệt chỉ mục theo rowid giảm dần và dừng ở LIMIT nên không phải đọc hết
+    # các dòng khớp từ phổ biến
+    cursor.execute(f'''
+        SELECT {', '.join('p.' + column for column in PATIENT_COLUMNS)}
+        FROM (
+            SELECT rowid FROM patients_fts
+            WHERE patients_fts MATCH ?
+            ORDER BY rowid DESC
+            LIMIT ?
+        ) AS matches
+        JOIN patients p ON p.id = matches.rowid
+    ''', (query, SEARCH_CANDIDATES))
+    return [row for row in cursor.fetchall() if row[0] not in exclude]
+
+
+@lru_cache(maxsize=None)
+def _fold_char(char):
+    return fold_text(char)
+
+
+def _has_initial(row, letter):
+    """Tên/SĐT/địa chỉ có từ bắt đầu bằng `letter` (đã bỏ dấu)"""
+    return any(_fold_char(char) == letter for field in row[1:6] if field
+               for char in re.findall(r'\b\w', str(field)))
+
+
+def _relevance(row, tokens, prefix):
+    """Khóa xếp hạng: tên chứa nhiều từ đã gõ hơn, rồi tên ngắn hơn, rồi bệnh nhân mới hơn"""
+    words = re.findall(r'\w+', fold_text(row[1] or ''))
+    last = tokens[-1]
+    hits = sum(token in words for token in tokens[:-1])
+    hits += any(word.startswith(last) if prefix else word == last for word in words)
+    return (-hits, len(words) if hits else 0, -row[0])
+
+
+def find_patients(cursor, term, limit=SEARCH_LIMIT):
+    """Tìm bệnh nhân theo tên/SĐT/địa chỉ, không phân biệt dấu, xếp theo độ phù hợp
+
+    Bệnh nhân khớp nguyên từ mọi từ đã gõ đứng trước, sau đó mới tới bệnh nhân chỉ
+    khớp tiền tố của từ cuối; nhờ vậy "nguyen van an" luôn tìm được "Nguyễn Văn An"
+    dù có rất nhiều "Nguyễn Văn Anh" mới hơn. Mỗi nhóm chỉ xếp hạng
+    SEARCH_CANDIDATES bệnh nhân khớp mới nhất nên thời gian tìm không phụ thuộc số
+    dòng khớp; cùng độ phù hợp thì bệnh nhân mới hơn đứng trước.
+    """
+    query = build_search_query(term, prefix=False)
+    if query is None:
+        return []
+    tokens = _search_tokens(term)
+    rows = sorted(_search_candidates(cursor, query), key=lambda row: _relevance(row, tokens, False))[:limit]
+    if len(rows) < limit:
+        found = {row[0] for row in rows}
+        last = tokens[-1]
+        if len(last) < SEARCH_PREFIX_MIN and len(tokens) > 1:
+            # Chỉ mục không có tiền tố 1 ký tự (gộp mọi từ bắt đầu bằng "v" rất chậm):
+            # lấy ứng viên khớp các từ trước rồi lọc từ cuối trên chính các dòng đó
+            prefix_rows = [row for row in _search_candidates(cursor, _match_query(tokens[:-1], False), found)
+                           if _has_initial(row, last)]
+        else:
+            prefix_rows = _search_candidates(cursor, build_search_query(term), found)
+        rows += sorted(prefix_rows, key=lambda row: _relevance(row, tokens, True))[:limit - len(rows)]
+    return rows
+
+
+def patient_sort_key(row, order):
+    """Lấy khóa phân trang (giá trị cột sắp xếp, id) từ một dòng bệnh nhân"""
+    return (row[PATIENT_COLUMNS.index(order)], row[0])
+
+
+def fetch_patient_page(cursor, order='created_date', after=None, before=None, limit=100):
+    """Lấy một trang bệnh nhân bằng keyset pagination (không dùng OFFSET)
+
+    after/before là khóa (giá trị cột sắp xếp, id) của dòng biên: trang trả về
+    gồm các dòng nằm ngay sau `after` hoặc ngay trước `before`, luôn theo thứ tự
+    hiển thị.
+    """
+    if order not in PATIENT_ORDERINGS:
+        raise ValueError(f"Kiểu sắp xếp không hợp lệ: {order}")
+    direction = PATIENT_ORDERINGS[order]
+    # Khi lùi trang thì duyệt ngược rồi đảo lại kết quả
+    if before is not None:
+        direction = 'ASC' if direction == 'DESC' else 'DESC'
+    comparison = '<' if direction == 'DESC' else '>'
+
+    where = ''
+    params = ()
+    boundary = after if after is not None else before
+    if boundary is not None:
+        where = f"WHERE ({order}, id) {comparison} (?, ?)"
+        params = tuple(boundary)
+    cursor.execute(f'''
+        SELECT {', '.join(PATIENT_COLUMNS)} FROM patients
+        {where}
+        ORDER BY {order} {direction}, id {direction}
+        LIMIT ?
+    ''', (*params, limit))
+    rows = cursor.fetchall()
+    if before is not None:
+        rows.reverse()
+    return rows
+
+
+def fetch_patient(cursor, patient_id):
+    """Lấy một bệnh nhân theo id"""
+    cursor.execute(f"SELECT {', '.join(PATIENT_COLUMNS)} FROM patients WHERE id = ?", (patient_id,))
+    return cursor.fetchone()
+
+
+def fetch_patient_records(cursor, patient_id):
+    """Lấy tên bệnh nhân và danh sách bệnh án cho record_tree"""
+    cursor.execute("SELECT name FROM patients WHERE id = ?", (patient_id,))
+    result = cursor.fetchone()
+    cursor.execute('''
+        SELECT id, visit_date, diagnosis, doctor_name, notes 
+        FROM medical_records 
+        WHERE patient_id=? 
+        ORDER BY visit_date DESC
+    ''', (patient_id,))
+    return (result[0] if result else None), cursor.fetchall()
+
+
+def fetch_medical_records(cursor, patient_id):
+    """Lấy danh sách bệnh án cho medical_record_tree (tab Chi tiết)"""
+    cursor.execute('''
+        SELECT id, visit_date, diagnosis, symptoms, treatment, doctor_name, notes
+        FROM medical_records
+        WHERE patient_id = ?
+    ''', (patient_id,))
+    return cursor.fetchall()
+
+
+def fetch_record_details(cursor, record_ids):
+    """Lấy nhiều bệnh án cùng tên bệnh nhân, kết quả xét nghiệm và đơn thuốc trong một truy vấn
+
+    Xét nghiệm và đơn thuốc của mỗi bệnh án được gom thành mảng JSON ngay trong
+    SQLite. Trả về dict record_id -> (record, patient_name, tests, prescriptions);
+    bệnh án không tồn tại không có trong kết quả.
+    """
+    columns = ', '.join(f"r.{column}" for column in RECORD_COLUMNS)
+    cursor.execute(f'''
+        SELECT {columns}, p.name,
+            (SELECT json_group_array(json_array(id, name, result, notes)) FROM (
+                SELECT tr.id, tt.name, tr.result, tr.notes
+                FROM test_results tr
+                JOIN test_types tt ON tr.test_type_id = tt.id
+                WHERE tr.record_id = r.id
+                ORDER BY tr.id)),
+            (SELECT json_group_array(json_array(id, name, dosage, quantity, instructions)) FROM (
+                SELECT pr.id, mt.name, pr.dosage, pr.quantity, pr.instructions
+                FROM prescriptions pr
+                JOIN medicine_types mt ON pr.medicine_id = mt.id
+                WHERE pr.record_id = r.id
+                ORDER BY pr.id))
+        FROM medical_records r
+        LEFT JOIN patients p ON p.id = r.patient_id
+        WHERE r.id IN (SELECT value FROM json_each(?))
+    ''', (_id_array(record_ids),))
+    size = len(RECORD_COLUMNS)
+    return {row[0]: (row[:size], row[size],
+                     [tuple(test) for test in json.loads(row[size + 1])],
+                     [tuple(prescription) for prescription in json.loads(row[size + 2])])
+            for row in cursor.fetchall()}
+
+
+def fetch_record_detail(cursor, record_id):
+    """Lấy bệnh án cùng tên bệnh nhân, kết quả xét nghiệm và đơn thuốc (một truy vấn)
+
+    Trả về (record, patient_name, tests, prescriptions); record là None nếu
+    bệnh án không tồn tại.
+    """
+    return fetch_record_details(cursor, [record_id]).get(int(record_id), (None, None, [], []))
+
+
+def fetch_catalogue(cursor, table):
+    """Đọc toàn bộ bảng danh mục (test_types, medicine_types): list (id, name, description)"""
+    cursor.execute(f"SELECT id, name, description FROM {table} ORDER BY id")
+    return cursor.fetchall()
+
+
+def insert_catalogue_row(cursor, table, name, description):
+    """Thêm một dòng danh mục (test_types, medicine_types), trả về id"""
+    cursor.execute(f"INSERT INTO {table} (name, description) VALUES (?, ?)", (name, description))
+    return cursor.lastrowid
+
+
+def update_catalogue_row(cursor, table, row_id, name, description):
+    cursor.execute(f"UPDATE {table} SET name = ?, description = ? WHERE id = ?", (name, description, row_id))
+
+
+def delete_catalogue_row(cursor, table, row_id):
+    """Xóa một dòng danh mục; trả về False (không xóa) nếu đang được bệnh án sử dụng"""
+    usage_table, column = CATALOGUE_USAGE[table]
+    cursor.execute(f"SELECT 1 FROM {usage_table} WHERE {column} = ? LIMIT 1", (row_id,))
+    if cursor.fetchone() is not None:
+        return False
+    cursor.execute(f"DELETE FROM {table} WHERE id = ?", (row_id,))
+    return True
+
+
+def count_patient_records(cursor, patient_id):
+    """Đếm số bệnh án của một bệnh nhân"""
+    cursor.execute("SELECT COUNT(*) FROM medical_records WHERE patient_id = ?", (patient_id,))
+    return cursor.fetchone()[0]
+
+
+def _id_array(ids):
+    """Danh sách id dạng JSON để dùng với json_each (không giới hạn số tham số)"""
+    return json.dumps([int(i) for i in ids])
+
+
+def delete_patient_data(cursor, patient_id):
+    """Xóa bệnh nhân cùng bệnh án, kết quả xét nghiệm và đơn thuốc liên quan"""
+    # Xóa theo tập hợp bằng truy vấn con thay vì một lệnh DELETE cho mỗi bệnh án
+    cursor.execute("""
+        DELETE FROM prescriptions
+        WHERE record_id IN (SELECT id FROM medical_records WHERE patient_id = ?)
+    """, (patient_id,))
+    cursor.execute("""
+        DELETE FROM test_results
+        WHERE record_id IN (SELECT id FROM medical_records WHERE patient_id = ?)
+    """, (patient_id,))
+    cursor.execute("DELETE FROM medical_records WHERE patient_id = ?", (patient_id,))
+    cursor.execute("DELETE FROM patients WHERE id = ?", (patient_id,))
+
+
+def insert_patient(cursor, patient):
+    """Thêm bệnh nhân (name, birth_date, gender, phone, address), trả về dòng vừa thêm"""
+    cursor.execute('''
+        INSERT INTO patients (name, birth_date, gender, phone, address)
+        VALUES (?, ?, ?, ?, ?)
+    ''', patient)
+    return fetch_patient(cursor, cursor.lastrowid)
+
+
+def update_patient_data(cursor, patient_id, patient):
+    """Cập nhật thông tin bệnh nhân, trả về dòng sau khi sửa"""
+    cursor.execute('''
+        UPDATE patients
+        SET name = ?, birth_date = ?, gender = ?, phone = ?, address = ?
+        WHERE id = ?
+    ''', (*patient, patient_id))
+    return fetch_patient(cursor, patient_id)
+
+
+def validate_patient_entry(patient):
+    """Kiểm tra thông tin bệnh nhân trước khi ghi, trả về bản đã chuẩn hóa
+
+    patient: (name, birth_date, gender, phone, address). Ngày sinh nhận dd/mm/YYYY
+    hoặc YYYY-MM-DD và được lưu dạng dd/mm/YYYY như form. Ném ValueError nếu không hợp lệ.
+    """
+    name, birth_date, gender, phone, address = patient
+    if not name or not str(name).strip():
+        raise ValueError("Vui lòng nhập tên bệnh nhân!")
+
+    if birth_date:
+        birth_date = display_date(str(birth_date).strip())
+        try:
+            datetime.strptime(birth_date, '%d/%m/%Y')
+        except ValueError:
+            raise ValueError("Ngày sinh không đúng định dạng (dd/mm/yyyy)!")
+
+    phone = str(phone).strip() if phone is not None else ''
+    if phone and not re.match(r'^\d{10,11}$', phone):
+        raise ValueError("Số điện thoại không hợp lệ!")
+
+    return str(name).strip(), birth_date or None, gender or None, phone or None, address or None
+
+
+def _integer(value):
+    """Số nguyên từ int, float hoặc chuỗi; None nếu không phải số hoặc có phần lẻ (2.7 không bị cắt thành 2)"""
+    if isinstance(value, int):
+        return value
+    try:
+        number = float(value)
+    except (TypeError, ValueError):
+        return None
+    return int(number) if number.is_integer() else None
+
+
+def validate_record_entry(record, tests, prescriptions, require_date=True):
+    """Kiểm tra một bệnh án trước khi ghi, trả về (record, tests, prescriptions) đã chuẩn hóa
+
+    Ném ValueError với thông báo hiển thị được cho người dùng nếu dữ liệu không hợp lệ.
+    require_date=False nhận cả ngày khám trống/không hợp lệ (nhập dữ liệu cũ).
+    """
+    visit_date, diagnosis = record[0], record[1]
+    if not diagnosis or not str(diagnosis).strip():
+        raise ValueError("Vui lòng nhập chẩn đoán!")
+    if require_date and not is_iso_date(visit_date):
+        raise ValueError("Ngày khám không hợp lệ!")
+
+    checked_tests = []
+    for test_type_id, result, notes in tests:
+        if not result:
+            raise ValueError("Kết quả xét nghiệm không được để trống!")
+        checked_tests.append((int(test_type_id), result, notes))
+
+    checked_prescriptions = []
+    for medicine_id, dosage, quantity, instructions in prescriptions:
+        if not dosage or quantity in (None, ''):
+            raise ValueError("Liều lượng và số lượng thuốc không được để trống!")
+        quantity = _integer(quantity)
+        if quantity is None:
+            raise ValueError("Số lượng thuốc phải là số nguyên!")
+        checked_prescriptions.append((int(medicine_id), dosage, quantity, instructions))
+
+    return tuple(record), checked_tests, checked_prescriptions
+
+
+def save_records(cursor, entries):
+    """Lưu nhiều bệnh án cùng xét nghiệm và đơn thuốc trong giao dịch hiện tại, trả về list id
+
+    entries: list (patient_id, record, tests, prescriptions) như insert_record.
+    Toàn bộ dữ liệu được kiểm tra trước khi ghi dòng đầu tiên; xét nghiệm và đơn
+    thuốc của cả lô được ghi bằng một executemany cho mỗi bảng.
+    """
+    entries = list(entries)
+    checked = []
+    for index, (patient_id, record, tests, prescriptions) in enumerate(entries, start=1):
+        try:
+            checked.append((patient_id, *validate_record_entry(record, tests, prescriptions)))
+        except ValueError as e:
+            raise ValueError(f"Bệnh án thứ {index}: {e}" if len(entries) > 1 else str(e)) from None
+
+    saved = []
+    for patient_id, record, tests, prescriptions in checked:
+        cursor.execute('''
+            INSERT INTO medical_records 
+            (patient_id, visit_date, diagnosis, symptoms, treatment, notes, doctor_name)
+            VALUES (?, ?, ?, ?, ?, ?, ?)
+        ''', (patient_id, *record))
+        saved.append((cursor.lastrowid, record, tests, prescriptions))
+    insert_record_items(cursor, saved)
+    return [record_id for record_id, _, _, _ in saved]
+
+
+def insert_record_items(cursor, records):
+    """Ghi xét nghiệm và đơn thuốc của các bệnh án vừa thêm, mỗi bảng một executemany
+
+    records: list (record_id, record, tests, prescriptions) như save_records; ngày
+    xét nghiệm lấy theo ngày khám record[0].
+    """
+    cursor.executemany('''
+        INSERT INTO test_results (record_id, test_type_id, result, test_date, notes)
+        VALUES (?, ?, ?, ?, ?)
+    ''', [(record_id, test_type_id, result, record[0], notes)
+          for record_id, record, tests, _ in records
+          for test_type_id, result, notes in tests])
+    cursor.executemany('''
+        INSERT INTO prescriptions (record_id, medicine_id, dosage, quantity, instructions)
+        VALUES (?, ?, ?, ?, ?)
+    ''', [(record_id, *prescription)
+          for record_id, _, _, prescriptions in records
+          for prescription in prescriptions])
+
+
+def insert_record(cursor, patient_id, record, tests, prescriptions):
+    """Lưu bệnh án mới cùng kết quả xét nghiệm và đơn thuốc, trả về id bệnh án
+
+    record: (visit_date ISO, diagnosis, symptoms, treatment, notes, doctor_name)
+    tests: list (test_type_id, result, notes)
+    prescriptions: list (medicine_id, dosage, quantity, instructions)
+    """
+    return save_records(cursor, [(patient_id, record, tests, prescriptions)])[0]
+
+
+def update_record_data(cursor, record_id, record):
+    """Cập nhật thông tin bệnh án (record như insert_record)"""
+    validate_record_entry(record, [], [])
+    cursor.execute('''
+        UPDATE medical_records 
+        SET visit_date=?, diagnosis=?, symptoms=?, treatment=?, notes=?, doctor_name=?
+        WHERE id=?
+    ''', (*record, record_id))
+
+
+def count_record_items(cursor, record_id):
+    """Đếm (số kết quả xét nghiệm, số đơn thuốc) của một bệnh án"""
+    cursor.execute("""
+        SELECT (SELECT COUNT(*) FROM test_results WHERE record_id = ?),
+               (SELECT COUNT(*) FROM prescriptions WHERE record_id = ?)
+    """, (record_id, record_id))
+    return cursor.fetchone()
+
+
+def delete_record_data(cursor, record_ids):
+    """Xóa các bệnh án cùng kết quả xét nghiệm và đơn thuốc của chúng"""
+    ids = _id_array(record_ids)
+    cursor.execute("DELETE FROM prescriptions WHERE record_id IN (SELECT value FROM json_each(?))", (ids,))
+    cursor.execute("DELETE FROM test_results WHERE record_id IN (SELECT value FROM json_each(?))", (ids,))
+    cursor.execute("DELETE FROM medical_records WHERE id IN (SELECT value FROM json_each(?))", (ids,))
+
+
+def delete_test_results(cursor, test_ids):
+    """Xóa các kết quả xét nghiệm theo id"""
+    cursor.execute("DELETE FROM test_results WHERE id IN (SELECT value FROM json_each(?))", (_id_array(test_ids),))
+
+
+def delete_prescriptions(cursor, prescription_ids):
+    """Xóa các đơn thuốc theo id"""
+    cursor.execute("DELETE FROM prescriptions WHERE id IN (SELECT value FROM json_each(?))",
+                   (_id_array(prescription_ids),))
+
+
+def rebuild_stats(cursor):
+    """Tính lại toàn bộ bảng thống kê từ dữ liệu gốc (dùng khi cần sửa sai lệch)"""
+    for table in ('stats_monthly', 'stats_daily', 'stats_monthly_doctor', 'stats_monthly_diagnosis'):
+        cursor.execute(f"DELETE FROM {table}")
+
+    cursor.execute("""
+        INSERT INTO stats_monthly (month, new_patients, visits)
+        SELECT month, SUM(new_patients), SUM(visits)
+        FROM (
+            SELECT COALESCE(substr(created_date, 1, 7), '') AS month, COUNT(*) AS new_patients, 0 AS visits
+            FROM patients
+            GROUP BY month
+            UNION ALL
+            SELECT COALESCE(substr(visit_date, 1, 7), '') AS month, 0 AS new_patients, COUNT(*) AS visits
+            FROM medical_records
+            GROUP BY month
+        )
+        GROUP BY month
+    """)
+    cursor.execute("""
+        INSERT INTO stats_daily (day, visits)
+        SELECT COALESCE(visit_date, ''), COUNT(*) FROM medical_records GROUP BY 1
+    """)
+    cursor.execute("""
+        INSERT INTO stats_monthly_doctor (month, doctor_name, visits)
+        SELECT COALESCE(substr(visit_date, 1, 7), ''), COALESCE(doctor_name, ''), COUNT(*)
+        FROM medical_records GROUP BY 1, 2
+    """)
+    cursor.execute("""
+        INSERT INTO stats_monthly_diagnosis (month, diagnosis, visits)
+        SELECT COALESCE(substr(visit_date, 1, 7), ''), COALESCE(diagnosis, ''), COUNT(*)
+        FROM medical_records GROUP BY 1, 2
+    """)
+
+
+def month_label(month):
+    """YYYY-MM -> MM/YYYY"""
+    return f"{month[5:7]}/{month[0:4]}" if month else ''
+
+
+def month_key(label):
+    """MM/YYYY -> YYYY-MM"""
+    return f"{label[3:7]}-{label[0:2]}" if label else None
+
+
+def fetch_stats(cursor, today, start_month=None, end_month=None):
+    """Đọc thống kê từ các bảng tổng hợp (không quét bảng bệnh nhân/bệnh án)
+
+    today: datetime.date; start_month/end_month: 'YYYY-MM' để lọc các bảng theo
+    tháng, bác sĩ, chẩn đoán (None = không giới hạn). Trả về (tổng bệnh nhân,
+    tổng bệnh án, bệnh án hôm nay, bệnh án tháng này, list (tháng/năm, bệnh nhân
+    mới, lượt khám), list (bác sĩ, lượt khám), list (chẩn đoán, lượt khám)).
+    """
+    cursor.execute("SELECT COALESCE(SUM(new_patients), 0), COALESCE(SUM(visits), 0) FROM stats_monthly")
+    total_patients, total_records = cursor.fetchone()
+
+    cursor.execute("SELECT visits FROM stats_daily WHERE day = ?", (today.isoformat(),))
+    row = cursor.fetchone()
+    today_records = row[0] if row else 0
+
+    cursor.execute("SELECT visits FROM stats_monthly WHERE month = ?", (today.isoformat()[:7],))
+    row = cursor.fetchone()
+    month_records = row[0] if row else 0
+
+    # Không giới hạn = khoảng bao mọi tháng hợp lệ; bệnh án không có ngày (tháng '') bị bỏ qua
+    month_range = (start_month or '0000-00', end_month or '9999-99')
+
+    cursor.execute("""
+        SELECT month, new_patients, visits FROM stats_monthly
+        WHERE month BETWEEN ? AND ? AND (new_patients > 0 OR visits > 0)
+        ORDER BY month DESC
+    """, month_range)
+    monthly = [(month_label(month), new_patients, visits) for month, new_patients, visits in cursor.fetchall()]
+
+    cursor.execute("""
+        SELECT doctor_name, SUM(visits) AS total FROM stats_monthly_doctor
+        WHERE month BETWEEN ? AND ?
+        GROUP BY doctor_name HAVING total > 0
+        ORDER BY total DESC
+    """, month_range)
+    by_doctor = cursor.fetchall()
+
+    cursor.execute("""
+        SELECT diagnosis, SUM(visits) AS total FROM stats_monthly_diagnosis
+        WHERE month BETWEEN ? AND ?
+        GROUP BY diagnosis HAVING total > 0
+        ORDER BY total DESC
+    """, month_range)
+    by_diagnosis = cursor.fetchall()
+
+    return total_patients, total_records, today_records, month_records, monthly, by_doctor, by_diagnosis
@@ -0,0 +1,147 @@
+import itertools
+import queue
+import sqlite3
+import threading
+import tkinter as tk
+
+
+class DatabaseWorker:
+    """Chạy truy vấn SQLite ở luồng nền để giao diện không bị treo
+
+    Gồm một luồng ghi (mỗi công việc ghi là một giao dịch BEGIN IMMEDIATE) và một
+    vài luồng đọc, mỗi luồng có kết nối riêng. Kết quả được đưa về luồng Tk bằng
+    cách định kỳ kiểm tra hàng đợi qua `root.after`, nên callback luôn chạy trên
+    luồng giao diện.
+
+    Các yêu cầu đọc có cùng `key` được gộp: chỉ yêu cầu mới nhất được chạy và
+    trả kết quả, yêu cầu cũ còn chờ bị bỏ qua, còn truy vấn cũ đang chạy bị ngắt.
+    """
+
+    def __init__(self, root, path, readers=2, timeout=30, poll_ms=15, on_connect=None):
+        self.root = root
+        self.path = path
+        self.on_connect = on_connect  # on_connect(conn): thiết lập PRAGMA cho mỗi kết nối
+        self.timeout = timeout
+        self.poll_ms = poll_ms
+
+        self.read_jobs = queue.Queue()
+        self.write_jobs = queue.Queue()
+        self.results = queue.Queue()
+        self.tokens = itertools.count(1)
+        self.latest = {}   # key -> token của yêu cầu mới nhất
+        self.running = {}  # key -> (token, kết nối) của truy vấn đang chạy
+        self.lock = threading.Lock()
+        self.closed = False
+
+        self.writer = threading.Thread(target=self._run, args=(self.write_jobs, True), daemon=True)
+        self.readers = [threading.Thread(target=self._run, args=(self.read_jobs, False), daemon=True)
+                        for _ in range(readers)]
+        for thread in [self.writer, *self.readers]:
+            thread.start()
+        self.poll_id = self.root.after(self.poll_ms, self._poll)
+
+    def read(self, func, callback=None, error=None, key=None):
+        """Chạy func(cursor) trên luồng đọc; callback(kết quả) hoặc error(lỗi) chạy trên luồng Tk"""
+        token = next(self.tokens)
+        if key is not None:
+            with self.lock:
+                self.latest[key] = token
+                running = self.running.get(key)
+                if running is not None and running[0] != token:
+                    running[1].interrupt()
+        self.read_jobs.put((func, callback, error, key, token))
+
+    def write(self, func, callback=None, error=None):
+        """Chạy func(cursor) trong một giao dịch trên luồng ghi (tự commit/rollback)"""
+        self.write_jobs.put((func, callback, error, None, next(self.tokens)))
+
+    def cancel(self, key):
+        """Bỏ kết quả của mọi yêu cầu đọc đang chờ với `key`"""
+        with self.lock:
+            self.latest[key] = next(self.tokens)
+            running = self.running.get(key)
+            if running is not None:
+                running[1].interrupt()
+
+    def close(self):
+        """Chờ các công việc ghi còn lại hoàn tất rồi dừng các luồng (gọi nhiều lần không sao)
+
+        Vẫn chạy được khi cửa sổ Tk đã bị hủy: callback của các công việc ghi còn
+        lại bị bỏ qua nhưng dữ liệu vẫn được commit trước khi tiến trình thoát.
+        """
+        if self.closed:
+            return
+        self.closed = True
+        try:
+            self.root.after_cancel(self.poll_id)
+        except tk.TclError:
+            pass  # root đã bị hủy
+        for _ in self.readers:
+            self.read_jobs.put(None)
+        self.write_jobs.put(None)
+        self.writer.join()
+
+    def _report_error(self, e):
+        print(f"Lỗi truy vấn nền: {e}")
+
+    def _is_stale(self, key, token):
+        if key is None:
+            return False
+        with self.lock:
+            return self.latest.get(key) != token
+
+    def _connect(self):
+        # isolation_level=None: tự quản lý giao dịch thay vì để sqlite3 tự mở
+        conn = sqlite3.connect(self.path, timeout=self.timeout, isolation_level=None)
+        if self.on_connect is not None:
+            self.on_connect(conn)
+        return conn
+
+    def _run(self, jobs, writer):
+        conn = self._connect()
+        cursor = conn.cursor()
+        while True:
+            job = jobs.get()
+            if job is None:
+                break
+            func, callback, error, key, token = job
+            if self._is_stale(key, token):
+                continue
+
+            if key is not None:
+                with self.lock:
+                    self.running[key] = (token, conn)
+            try:
+                if writer:
+                    # Giữ khóa ghi ngay từ đầu để busy timeout có tác dụng khi nhiều
+                    # tiến trình cùng ghi, thay vì lỗi "database is locked" lúc nâng khóa
+                    cursor.execute('BEGIN IMMEDIATE')
+                    try:
+                        result = func(cursor)
+                        cursor.execute('COMMIT')
+                    except BaseException:
+                        cursor.execute('ROLLBACK')
+                        raise
+                else:
+                    result = func(cursor)
+            except Exception as e:
+                self.results.put((error or self._report_error, e, key, token))
+            else:
+                self.results.put((callback, result, key, token))
+            finally:
+                if key is not None:
+                    with self.lock:
+                        if self.running.get(key, (None,))[0] == token:
+                            del self.running[key]
+        conn.close()
+
+    def _poll(self):
+        """Chạy trên luồng Tk: gọi callback cho các kết quả đã xong"""
+        self.poll_id = self.root.after(self.poll_ms, self._poll)
+        while True:
+            try:
+                callback, value, key, token = self.results.get_nowait()
+            except queue.Empty:
+                break
+            if callback is not None and not self._is_stale(key, token):
+                callback(value)
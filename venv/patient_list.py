@@ -0,0 +1,183 @@
+from database import patient_sort_key
+
+
+class VirtualPatientList:
+    """Danh sách bệnh nhân ảo hóa trên một Treeview
+
+    Chỉ giữ trong Treeview một cửa sổ tối đa `max_rows` dòng quanh vị trí đang
+    xem. Khi cuộn gần tới mép, tải thêm một trang theo khóa (keyset) và cắt bớt
+    các dòng ở phía đối diện, nên số dòng được tạo không phụ thuộc kích thước bảng.
+    Mỗi dòng dùng id bệnh nhân làm iid để thêm/sửa/xóa từng dòng mà không cần tải lại.
+    """
+
+    def __init__(self, tree, scrollbar, fetch_page, page_size=100, max_rows=500, prefetch_margin=0.2):
+        self.tree = tree
+        self.scrollbar = scrollbar
+        self.fetch_page = fetch_page  # fetch_page(order, after, before, limit) -> list dòng
+        self.page_size = page_size
+        self.max_rows = max_rows
+        self.prefetch_margin = prefetch_margin
+
+        self.order = 'created_date'
+        self.showing_results = False  # True khi đang hiển thị kết quả tìm kiếm (không phân trang)
+        self.keys = {}  # iid -> khóa phân trang của dòng
+        self.has_more_after = False
+        self.has_more_before = False
+        self._check_pending = False
+
+        self.tree.configure(yscrollcommand=self._on_yscroll)
+
+    def reset(self, order='created_date'):
+        """Xóa danh sách và tải trang đầu tiên"""
+        self.order = order
+        self.showing_results = False
+        self._clear()
+
+        rows = self.fetch_page(self.order, None, None, self.page_size)
+        self._append_rows(rows)
+        self.has_more_after = len(rows) == self.page_size
+        self.has_more_before = False
+        self.tree.yview_moveto(0)
+
+    def show_results(self, rows):
+        """Hiển thị một danh sách kết quả cố định (đã xếp hạng và giới hạn số dòng)"""
+        self.showing_results = True
+        self._clear()
+        self._append_rows(rows)
+        self.has_more_after = False
+        self.has_more_before = False
+        self.tree.yview_moveto(0)
+
+    def _clear(self):
+        children = self.tree.get_children()
+        if children:
+            self.tree.delete(*children)
+        self.keys.clear()
+
+    def _row_values(self, row):
+        return tuple('' if value is None else value for value in row[0:6])
+
+    def _append_rows(self, rows):
+        for row in rows:
+            iid = str(row[0])
+            self.tree.insert('', 'end', iid=iid, values=self._row_values(row))
+            self.keys[iid] = patient_sort_key(row, self.order)
+
+    def _prepend_rows(self, rows):
+        for index, row in enumerate(rows):
+            iid = str(row[0])
+            self.tree.insert('', index, iid=iid, values=self._row_values(row))
+            self.keys[iid] = patient_sort_key(row, self.order)
+
+    def _remove_items(self, items):
+        if items:
+            self.tree.delete(*items)
+            for iid in items:
+                self.keys.pop(iid, None)
+
+    def _on_yscroll(self, first, last):
+        """Cập nhật scrollbar và hẹn kiểm tra xem có cần tải thêm trang không"""
+        self.scrollbar.set(first, last)
+        if not self._check_pending:
+            self._check_pending = True
+            self.tree.after_idle(self._check_window)
+
+    def _check_window(self):
+        self._check_pending = False
+        first, last = self.tree.yview()
+        if last >= 1 - self.prefetch_margin and self.has_more_after:
+            self.load_next_page()
+        elif first <= self.prefetch_margin and self.has_more_before:
+            self.load_previous_page()
+
+    def _first_visible(self, children):
+        """Dòng đầu tiên đang hiển thị, dùng làm mốc giữ nguyên vị trí cuộn"""
+        if not children:
+            return None
+        first = self.tree.yview()[0]
+        return children[min(int(first * len(children)), len(children) - 1)]
+
+    def _restore_view(self, anchor):
+        children = self.tree.get_children()
+        if anchor is not None and children and self.tree.exists(anchor):
+            self.tree.yview_moveto(self.tree.index(anchor) / len(children))
+
+    def load_next_page(self):
+        """Tải trang kế tiếp vào cuối danh sách, cắt bớt dòng ở đầu nếu vượt quá cửa sổ"""
+        children = self.tree.get_children()
+        if not children:
+            return
+        anchor = self._first_visible(children)
+        rows = self.fetch_page(self.order, self.keys[children[-1]], None, self.page_size)
+        self.has_more_after = len(rows) == self.page_size
+        if not rows:
+            return
+        self._append_rows(rows)
+
+        excess = len(children) + len(rows) - self.max_rows
+        if excess > 0:
+            self._remove_items(children[:excess])
+            self.has_more_before = True
+        self._restore_view(anchor)
+
+    def load_previous_page(self):
+        """Tải trang phía trước vào đầu danh sách, cắt bớt dòng ở cuối nếu vượt quá cửa sổ"""
+        children = self.tree.get_children()
+        if not children:
+            return
+        anchor = self._first_visible(children)
+        rows = self.fetch_page(self.order, None, self.keys[children[0]], self.page_size)
+        self.has_more_before = len(rows) == self.page_size
+        if not rows:
+            return
+        self._prepend_rows(rows)
+
+        excess = len(children) + len(rows) - self.max_rows
+        if excess > 0:
+            self._remove_items(children[len(children) - excess:])
+            self.has_more_after = True
+        self._restore_view(anchor)
+
+    def insert_row(self, row):
+        """Thêm một bệnh nhân mới vào đúng vị trí nếu nó nằm trong cửa sổ đang giữ"""
+        iid = str(row[0])
+        if self.tree.exists(iid):
+            self.update_row(row)
+            return
+        if self.showing_results:
+            return  # Kết quả tìm kiếm không tự thay đổi theo dữ liệu mới
+
+        key = patient_sort_key(row, self.order)
+        descending = self.order == 'created_date'
+        children = self.tree.get_children()
+        index = len(children)
+        for position, child in enumerate(children):
+            child_key = self.keys[child]
+            if (key > child_key) if descending else (key < child_key):
+                index = position
+                break
+
+        # Dòng nằm ngoài cửa sổ sẽ được tải khi người dùng cuộn tới
+        if index == 0 and self.has_more_before:
+            return
+        if index == len(children) and self.has_more_after:
+            return
+        self.tree.insert('', index, iid=iid, values=self._row_values(row))
+        self.keys[iid] = key
+
+    def update_row(self, row):
+        """Cập nhật một dòng đang hiển thị; đặt lại vị trí nếu khóa sắp xếp thay đổi"""
+        iid = str(row[0])
+        if not self.tree.exists(iid):
+            return
+        if not self.showing_results and patient_sort_key(row, self.order) != self.keys.get(iid):
+            self.remove_row(row[0])
+            self.insert_row(row)
+            return
+        self.tree.item(iid, values=self._row_values(row))
+
+    def remove_row(self, patient_id):
+        """Xóa một dòng khỏi danh sách (nếu đang hiển thị)"""
+        iid = str(patient_id)
+        if self.tree.exists(iid):
+            self._remove_items([iid])
@@ -0,0 +1,53 @@
+from collections import OrderedDict
+
+# Số bệnh án xem gần đây được giữ trong bộ nhớ
+CACHE_SIZE = 200
+
+
+class RecordCache:
+    """Bộ nhớ đệm LRU chi tiết bệnh án: record_id -> (record, patient_name, tests, prescriptions)
+
+    Mỗi lần invalidate/clear tăng `generation`. Kết quả đọc ở luồng nền chỉ được
+    đưa vào bộ nhớ đệm nếu generation không đổi kể từ lúc gửi truy vấn, để một
+    truy vấn chạy trước khi ghi nhưng trả về sau khi ghi không đưa lại dữ liệu cũ.
+    """
+
+    def __init__(self, size=CACHE_SIZE):
+        self.size = size
+        self.items = OrderedDict()
+        self.generation = 0
+
+    def __contains__(self, record_id):
+        return record_id in self.items
+
+    def get(self, record_id):
+        """Chi tiết bệnh án hoặc None nếu chưa có; đánh dấu là vừa dùng"""
+        detail = self.items.get(record_id)
+        if detail is not None:
+            self.items.move_to_end(record_id)
+        return detail
+
+    def put(self, record_id, detail, generation):
+        """Lưu chi tiết bệnh án đọc được khi bộ nhớ đệm ở `generation`"""
+        if generation != self.generation or detail[0] is None:
+            return
+        self.items[record_id] = detail
+        self.items.move_to_end(record_id)
+        while len(self.items) > self.size:
+            self.items.popitem(last=False)
+
+    def put_many(self, details, generation):
+        """Lưu kết quả của fetch_record_details"""
+        for record_id, detail in details.items():
+            self.put(record_id, detail, generation)
+
+    def invalidate(self, *record_ids):
+        """Bỏ các bệnh án vừa bị sửa/xóa"""
+        self.generation += 1
+        for record_id in record_ids:
+            self.items.pop(record_id, None)
+
+    def clear(self):
+        """Bỏ toàn bộ (đổi tên bệnh nhân, loại xét nghiệm/thuốc, xóa bệnh nhân)"""
+        self.generation += 1
+        self.items.clear()
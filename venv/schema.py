@@ -0,0 +1,441 @@
+import re
+import sqlite3
+from datetime import date, datetime
+
+from database import create_patient_indexes, create_patient_search_index, rebuild_stats
+
+# Ngày dd/mm/YYYY nhập tay không đủ hai chữ số (5/3/2024) hoặc dùng dấu . -
+_LOOSE_DATE = re.compile(r'^\s*(\d{1,2})[/.-](\d{1,2})[/.-](\d{4})\s*$')
+
+
+def configure_connection(conn):
+    """Thiết lập PRAGMA cho mỗi kết nối: bật khóa ngoại, đồng bộ NORMAL, đọc qua mmap
+
+    synchronous=NORMAL an toàn với WAL (chỉ có thể mất giao dịch cuối khi mất điện,
+    không làm hỏng database) và tránh fsync sau mỗi lần commit.
+    """
+    conn.execute('PRAGMA foreign_keys = ON')
+    conn.execute('PRAGMA synchronous = NORMAL')
+    conn.execute('PRAGMA mmap_size = 268435456')
+    return conn
+
+
+def _create_base_tables(cursor):
+    """Phiên bản 1: các bảng ban đầu của ứng dụng"""
+    # Tạo bảng bệnh nhân
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS patients (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            name TEXT NOT NULL,
+            birth_date TEXT,
+            gender TEXT,
+            phone TEXT,
+            address TEXT,
+            created_date TEXT DEFAULT CURRENT_TIMESTAMP
+        )
+    ''')
+
+    # Tạo bảng bệnh án
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS medical_records (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            patient_id INTEGER NOT NULL,
+            visit_date TEXT,
+            diagnosis TEXT,
+            symptoms TEXT,
+            treatment TEXT,
+            notes TEXT,
+            doctor_id INTEGER,
+            created_date TEXT DEFAULT CURRENT_TIMESTAMP,
+            FOREIGN KEY (patient_id) REFERENCES patients(id),
+            FOREIGN KEY (doctor_id) REFERENCES doctors(id)
+        )
+    ''')
+    cursor.execute('''
+       CREATE TABLE IF NOT EXISTS test_types (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            name TEXT NOT NULL,
+            description TEXT
+        )
+    ''')
+    cursor.execute('''
+       CREATE TABLE IF NOT EXISTS test_results (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            record_id INTEGER NOT NULL,
+            test_type_id INTEGER NOT NULL,
+            result TEXT,
+            test_date TEXT,
+            notes TEXT,
+            FOREIGN KEY (record_id) REFERENCES medical_records(id),
+            FOREIGN KEY (test_type_id) REFERENCES test_types(id)
+        )
+    ''')
+    cursor.execute('''
+       CREATE TABLE IF NOT EXISTS medicine_types (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            name TEXT NOT NULL,
+            description TEXT
+        )
+    ''')
+    cursor.execute('''
+       CREATE TABLE IF NOT EXISTS prescriptions (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            record_id INTEGER NOT NULL,
+            medicine_id INTEGER NOT NULL,
+            dosage TEXT,            -- liều dùng (ví dụ: "1 viên sáng + 1 viên tối")
+            quantity INTEGER,       -- số lượng
+            instructions TEXT,      -- hướng dẫn dùng
+            FOREIGN KEY (record_id) REFERENCES medical_records(id),
+            FOREIGN KEY (medicine_id) REFERENCES medicine_types(id)
+        )
+    ''')
+    cursor.execute('''
+       CREATE TABLE IF NOT EXISTS doctors (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        full_name TEXT NOT NULL,
+        username TEXT UNIQUE NOT NULL,
+        password TEXT NOT NULL,
+        created_date TEXT DEFAULT CURRENT_TIMESTAMP
+        )
+    ''')
+
+    # Giao diện lưu tên bác sĩ nhập tay nhưng bảng ban đầu thiếu cột này
+    cursor.execute("PRAGMA table_info(medical_records)")
+    if 'doctor_name' not in [column[1] for column in cursor.fetchall()]:
+        cursor.execute("ALTER TABLE medical_records ADD COLUMN doctor_name TEXT")
+
+    # Index cho phân trang danh sách bệnh nhân và chỉ mục tìm kiếm toàn văn
+    create_patient_indexes(cursor)
+    create_patient_search_index(cursor)
+
+
+def _add_cascade_foreign_keys(cursor):
+    """Phiên bản 2: xóa bệnh nhân/bệnh án sẽ tự xóa dữ liệu con (ON DELETE CASCADE)
+
+    SQLite không sửa được khóa ngoại nên phải tạo lại bảng. Các dòng mồ côi (trỏ
+    tới bệnh nhân, bệnh án hoặc danh mục không còn tồn tại) không được chép sang
+    bảng mới mà được giữ lại trong các bảng orphan_<tên bảng> để kiểm tra sau.
+    """
+    notes = []
+    count = _quarantine_orphans(cursor, 'medical_records', 'patient_id IN (SELECT id FROM patients)')
+    if count:
+        notes.append(f"{count} bệnh án không có bệnh nhân được chuyển sang bảng orphan_medical_records")
+    cursor.execute('''
+        CREATE TABLE medical_records_new (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            patient_id INTEGER NOT NULL,
+            visit_date TEXT,
+            diagnosis TEXT,
+            symptoms TEXT,
+            treatment TEXT,
+            notes TEXT,
+            doctor_id INTEGER,
+            created_date TEXT DEFAULT CURRENT_TIMESTAMP,
+            doctor_name TEXT,
+            FOREIGN KEY (patient_id) REFERENCES patients(id) ON DELETE CASCADE,
+            FOREIGN KEY (doctor_id) REFERENCES doctors(id)
+        )
+    ''')
+    cursor.execute('''
+        INSERT INTO medical_records_new
+            (id, patient_id, visit_date, diagnosis, symptoms, treatment, notes, doctor_id, created_date, doctor_name)
+        SELECT id, patient_id, visit_date, diagnosis, symptoms, treatment, notes, doctor_id, created_date, doctor_name
+        FROM medical_records
+        WHERE patient_id IN (SELECT id FROM patients)
+    ''')
+    cursor.execute('DROP TABLE medical_records')
+    cursor.execute('ALTER TABLE medical_records_new RENAME TO medical_records')
+
+    # Kết quả xét nghiệm/đơn thuốc của bệnh án vừa bị chuyển đi cũng là dòng mồ côi
+    count = _quarantine_orphans(cursor, 'test_results', '''
+        record_id IN (SELECT id FROM medical_records) AND test_type_id IN (SELECT id FROM test_types)
+    ''')
+    if count:
+        notes.append(f"{count} kết quả xét nghiệm mồ côi được chuyển sang bảng orphan_test_results")
+
+    cursor.execute('''
+        CREATE TABLE test_results_new (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            record_id INTEGER NOT NULL,
+            test_type_id INTEGER NOT NULL,
+            result TEXT,
+            test_date TEXT,
+            notes TEXT,
+            FOREIGN KEY (record_id) REFERENCES medical_records(id) ON DELETE CASCADE,
+            FOREIGN KEY (test_type_id) REFERENCES test_types(id)
+        )
+    ''')
+    cursor.execute('''
+        INSERT INTO test_results_new (id, record_id, test_type_id, result, test_date, notes)
+        SELECT id, record_id, test_type_id, result, test_date, notes
+        FROM test_results
+        WHERE record_id IN (SELECT id FROM medical_records)
+          AND test_type_id IN (SELECT id FROM test_types)
+    ''')
+    cursor.execute('DROP TABLE test_results')
+    cursor.execute('ALTER TABLE test_results_new RENAME TO test_results')
+
+    count = _quarantine_orphans(cursor, 'prescriptions', '''
+        record_id IN (SELECT id FROM medical_records) AND medicine_id IN (SELECT id FROM medicine_types)
+    ''')
+    if count:
+        notes.append(f"{count} đơn thuốc mồ côi được chuyển sang bảng orphan_prescriptions")
+
+    cursor.execute('''
+        CREATE TABLE prescriptions_new (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            record_id INTEGER NOT NULL,
+            medicine_id INTEGER NOT NULL,
+            dosage TEXT,            -- liều dùng (ví dụ: "1 viên sáng + 1 viên tối")
+            quantity INTEGER,       -- số lượng
+            instructions TEXT,      -- hướng dẫn dùng
+            FOREIGN KEY (record_id) REFERENCES medical_records(id) ON DELETE CASCADE,
+            FOREIGN KEY (medicine_id) REFERENCES medicine_types(id)
+        )
+    ''')
+    cursor.execute('''
+        INSERT INTO prescriptions_new (id, record_id, medicine_id, dosage, quantity, instructions)
+        SELECT id, record_id, medicine_id, dosage, quantity, instructions
+        FROM prescriptions
+        WHERE record_id IN (SELECT id FROM medical_records)
+          AND medicine_id IN (SELECT id FROM medicine_types)
+    ''')
+    cursor.execute('DROP TABLE prescriptions')
+    cursor.execute('ALTER TABLE prescriptions_new RENAME TO prescriptions')
+    return notes
+
+
+def _quarantine_orphans(cursor, table, condition):
+    """Chép các dòng của `table` không thỏa `condition` sang bảng orphan_<table>, trả về số dòng"""
+    cursor.execute(f"SELECT COUNT(*) FROM {table} WHERE NOT ({condition})")
+    count = cursor.fetchone()[0]
+    if count:
+        cursor.execute(f"CREATE TABLE IF NOT EXISTS orphan_{table} AS SELECT * FROM {table} WHERE 0")
+        cursor.execute(f"INSERT INTO orphan_{table} SELECT * FROM {table} WHERE NOT ({condition})")
+    return count
+
+
+def _add_secondary_indexes(cursor):
+    """Phiên bản 3: index cho các cột khóa ngoại và ngày khám"""
+    cursor.execute('CREATE INDEX IF NOT EXISTS idx_medical_records_patient ON medical_records(patient_id, visit_date)')
+    cursor.execute('CREATE INDEX IF NOT EXISTS idx_medical_records_visit_date ON medical_records(visit_date)')
+    cursor.execute('CREATE INDEX IF NOT EXISTS idx_test_results_record ON test_results(record_id)')
+    cursor.execute('CREATE INDEX IF NOT EXISTS idx_test_results_type ON test_results(test_type_id)')
+    cursor.execute('CREATE INDEX IF NOT EXISTS idx_prescriptions_record ON prescriptions(record_id)')
+    cursor.execute('CREATE INDEX IF NOT EXISTS idx_prescriptions_medicine ON prescriptions(medicine_id)')
+
+
+def _convert_dates_to_iso(cursor):
+    """Phiên bản 4: đổi ngày khám/ngày xét nghiệm từ dd/mm/YYYY sang YYYY-MM-DD
+
+    Dạng ISO sắp xếp đúng theo thời gian khi so sánh chuỗi, nên lọc theo ngày
+    hoặc theo tháng dùng được index và strftime() của SQLite hiểu được. Ngày
+    không đủ hai chữ số (5/3/2024) được đổi từng dòng; giá trị không đọc được
+    hoặc ngày không có thật (31/02/2024) giữ nguyên và được báo lại.
+    """
+    notes = []
+    for table, column in (('medical_records', 'visit_date'), ('test_results', 'test_date')):
+        iso = f"substr({column}, 7, 4) || '-' || substr({column}, 4, 2) || '-' || substr({column}, 1, 2)"
+        # date() nhận cả 2024-02-31; thêm '+0 days' chuẩn hóa nó thành 2024-03-02 nên
+        # chỉ ngày có thật mới giữ nguyên. Ngày không có thật được báo ở vòng dưới.
+        cursor.execute(f'''
+            UPDATE {table}
+            SET {column} = {iso}
+            WHERE {column} GLOB '[0-9][0-9]/[0-9][0-9]/[0-9][0-9][0-9][0-9]'
+              AND date({iso}, '+0 days') = {iso}
+        ''')
+        cursor.execute(f'''
+            SELECT id, {column} FROM {table}
+            WHERE {column} IS NOT NULL AND {column} != ''
+              AND {column} NOT GLOB '[0-9][0-9][0-9][0-9]-[0-9][0-9]-[0-9][0-9]'
+        ''')
+        converted = []
+        invalid = []
+        for row_id, value in cursor.fetchall():
+            match = _LOOSE_DATE.match(value)
+            try:
+                day, month, year = match.groups()
+                converted.append((date(int(year), int(month), int(day)).isoformat(), row_id))
+            except (AttributeError, ValueError):
+                invalid.append(value)
+        cursor.executemany(f"UPDATE {table} SET {column} = ? WHERE id = ?", converted)
+        if invalid:
+            notes.append(f"{len(invalid)} dòng {table}.{column} có ngày không hợp lệ, giữ nguyên "
+                         f"(ví dụ: {', '.join(repr(value) for value in invalid[:5])})")
+    return notes
+
+
+def _create_stats_rollups(cursor):
+    """Phiên bản 5: bảng thống kê theo tháng được trigger cập nhật khi ghi dữ liệu
+
+    Trigger nằm trong database nên mọi đường ghi (form, nhập hàng loạt, xóa dây
+    chuyền qua khóa ngoại, phiên bản ứng dụng khác) đều giữ thống kê đúng; màn hình
+    thống kê chỉ cần đọc vài dòng thay vì quét lại toàn bộ bảng.
+    """
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS stats_monthly (
+            month TEXT PRIMARY KEY,         -- YYYY-MM
+            new_patients INTEGER NOT NULL DEFAULT 0,
+            visits INTEGER NOT NULL DEFAULT 0
+        )
+    ''')
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS stats_daily (
+            day TEXT PRIMARY KEY,           -- YYYY-MM-DD
+            visits INTEGER NOT NULL DEFAULT 0
+        )
+    ''')
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS stats_monthly_doctor (
+            month TEXT NOT NULL,
+            doctor_name TEXT NOT NULL,
+            visits INTEGER NOT NULL DEFAULT 0,
+            PRIMARY KEY (month, doctor_name)
+        )
+    ''')
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS stats_monthly_diagnosis (
+            month TEXT NOT NULL,
+            diagnosis TEXT NOT NULL,
+            visits INTEGER NOT NULL DEFAULT 0,
+            PRIMARY KEY (month, diagnosis)
+        )
+    ''')
+
+    def patient_delta(row, delta):
+        return f'''
+            INSERT INTO stats_monthly (month, new_patients) VALUES (COALESCE(substr({row}.created_date, 1, 7), ''), {delta})
+            ON CONFLICT(month) DO UPDATE SET new_patients = new_patients + ({delta});
+        '''
+
+    def record_delta(row, delta):
+        month = f"COALESCE(substr({row}.visit_date, 1, 7), '')"
+        return f'''
+            INSERT INTO stats_monthly (month, visits) VALUES ({month}, {delta})
+            ON CONFLICT(month) DO UPDATE SET visits = visits + ({delta});
+            INSERT INTO stats_daily (day, visits) VALUES (COALESCE({row}.visit_date, ''), {delta})
+            ON CONFLICT(day) DO UPDATE SET visits = visits + ({delta});
+            INSERT INTO stats_monthly_doctor (month, doctor_name, visits)
+            VALUES ({month}, COALESCE({row}.doctor_name, ''), {delta})
+            ON CONFLICT(month, doctor_name) DO UPDATE SET visits = visits + ({delta});
+            INSERT INTO stats_monthly_diagnosis (month, diagnosis, visits)
+            VALUES ({month}, COALESCE({row}.diagnosis, ''), {delta})
+            ON CONFLICT(month, diagnosis) DO UPDATE SET visits = visits + ({delta});
+        '''
+
+    cursor.execute(f"CREATE TRIGGER IF NOT EXISTS stats_patient_insert AFTER INSERT ON patients BEGIN {patient_delta('new', 1)} END")
+    cursor.execute(f"CREATE TRIGGER IF NOT EXISTS stats_patient_delete AFTER DELETE ON patients BEGIN {patient_delta('old', -1)} END")
+    cursor.execute(f'''
+        CREATE TRIGGER IF NOT EXISTS stats_patient_update AFTER UPDATE OF created_date ON patients BEGIN
+            {patient_delta('old', -1)}
+            {patient_delta('new', 1)}
+        END
+    ''')
+    cursor.execute(f"CREATE TRIGGER IF NOT EXISTS stats_record_insert AFTER INSERT ON medical_records BEGIN {record_delta('new', 1)} END")
+    cursor.execute(f"CREATE TRIGGER IF NOT EXISTS stats_record_delete AFTER DELETE ON medical_records BEGIN {record_delta('old', -1)} END")
+    cursor.execute(f'''
+        CREATE TRIGGER IF NOT EXISTS stats_record_update AFTER UPDATE OF visit_date, doctor_name, diagnosis ON medical_records BEGIN
+            {record_delta('old', -1)}
+            {record_delta('new', 1)}
+        END
+    ''')
+
+    rebuild_stats(cursor)
+
+
+def _rebuild_patient_search_index(cursor):
+    """Phiên bản 6: tạo lại chỉ mục tìm kiếm bệnh nhân với detail=full để xếp hạng bm25
+
+    Database nâng cấp từ phiên bản 0 đã có chỉ mục detail=full do phiên bản 1 tạo,
+    khi đó không nạp lại lần thứ hai.
+    """
+    cursor.execute("SELECT sql FROM sqlite_master WHERE type = 'table' AND name = 'patients_fts'")
+    row = cursor.fetchone()
+    if row is not None and 'detail=full' in row[0].replace(' ', ''):
+        return
+    for trigger in ('patients_fts_insert', 'patients_fts_delete', 'patients_fts_update'):
+        cursor.execute(f'DROP TRIGGER IF EXISTS {trigger}')
+    cursor.execute('DROP TABLE IF EXISTS patients_fts')
+    create_patient_search_index(cursor)
+
+
+# Các bước nâng cấp theo thứ tự; phiên bản database = PRAGMA user_version
+MIGRATIONS = [
+    _create_base_tables,
+    _add_cascade_foreign_keys,
+    _add_secondary_indexes,
+    _convert_dates_to_iso,
+    _create_stats_rollups,
+    _rebuild_patient_search_index,
+]
+
+SCHEMA_VERSION = len(MIGRATIONS)
+
+
+def get_schema_version(conn):
+    return conn.execute('PRAGMA user_version').fetchone()[0]
+
+
+def backup_database(conn, version):
+    """Sao lưu database ra file cạnh file gốc, trả về đường dẫn (None nếu database trong bộ nhớ)"""
+    path = conn.execute('PRAGMA database_list').fetchone()[2]
+    if not path:
+        return None
+    backup_path = f"{path}.v{version}-{datetime.now():%Y%m%d-%H%M%S}.bak"
+    target = sqlite3.connect(backup_path)
+    try:
+        conn.backup(target)
+    finally:
+        target.close()
+    return backup_path
+
+
+def migrate(conn, target=SCHEMA_VERSION, warn=print):
+    """Nâng cấp database lên phiên bản `target`, mỗi bước trong một giao dịch riêng
+
+    Database đã có dữ liệu được sao lưu trước khi nâng cấp. Các bước có thể trả về
+    ghi chú (dòng mồ côi đã chuyển đi, ngày không đọc được...); chúng được gộp và
+    gửi cho warn(message) sau khi nâng cấp xong. Trả về danh sách các phiên bản
+    vừa được áp dụng.
+    """
+    conn.execute('PRAGMA journal_mode = WAL')
+    applied = []
+    notes = []
+    current = get_schema_version(conn)
+    has_data = conn.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'patients'").fetchone()
+    if current < target and has_data:
+        backup_path = backup_database(conn, current)
+        if backup_path:
+            notes.append(f"Đã sao lưu database trước khi nâng cấp: {backup_path}")
+    # Tắt khóa ngoại trong lúc tạo lại bảng (PRAGMA này không có tác dụng trong giao dịch)
+    conn.execute('PRAGMA foreign_keys = OFF')
+    try:
+        for version in range(get_schema_version(conn) + 1, target + 1):
+            conn.execute('BEGIN IMMEDIATE')
+            try:
+                # Một tiến trình khác có thể vừa nâng cấp xong trong lúc chờ khóa
+                if get_schema_version(conn) >= version:
+                    conn.execute('ROLLBACK')
+                    continue
+                cursor = conn.cursor()
+                notes += MIGRATIONS[version - 1](cursor) or []
+                # Dữ liệu cũ có thể có dòng mồ côi; chúng được chuyển ra bảng riêng ở phiên bản 2
+                violations = []
+                if version >= 2:
+                    cursor.execute('PRAGMA foreign_key_check')
+                    violations = cursor.fetchall()
+                if violations:
+                    raise RuntimeError(f"Vi phạm khóa ngoại sau khi nâng cấp lên phiên bản {version}: {violations[:5]}")
+                cursor.execute(f'PRAGMA user_version = {version}')
+                conn.execute('COMMIT')
+                applied.append(version)
+            except BaseException:
+                conn.execute('ROLLBACK')
+                raise
+    finally:
+        conn.execute('PRAGMA foreign_keys = ON')
+    if applied:
+        conn.execute('PRAGMA optimize')
+    if notes:
+        warn('\n'.join(notes))
+    return applied
@@ -0,0 +1,41 @@
+import time
+from contextlib import contextmanager
+
+
+class StartupTimer:
+    """Đo thời gian từng bước khởi động (mở database, kiểm tra cấu trúc, tạo giao diện...)
+
+    phase(name) đo một khối lệnh; mark(name) ghi một bước kết thúc ở thời điểm
+    gọi, tính từ cuối bước trước (dùng cho bước kết thúc trong callback, ví dụ
+    lần vẽ cửa sổ đầu tiên).
+    """
+
+    def __init__(self, clock=time.perf_counter):
+        self.clock = clock
+        self.start = self.last = clock()
+        self.phases = []  # (tên bước, số giây)
+
+    @contextmanager
+    def phase(self, name):
+        start = self.clock()
+        try:
+            yield
+        finally:
+            self.last = self.clock()
+            self.phases.append((name, self.last - start))
+
+    def mark(self, name):
+        now = self.clock()
+        self.phases.append((name, now - self.last))
+        self.last = now
+
+    def total(self):
+        """Số giây từ lúc tạo timer tới cuối bước gần nhất"""
+        return self.last - self.start
+
+    def report(self, title="Thời gian khởi động:"):
+        width = max([len(name) for name, _ in self.phases] + [len("Tổng")])
+        lines = [title]
+        lines += [f"  {name:<{width}} {seconds * 1000:9.1f} ms" for name, seconds in self.phases]
+        lines.append(f"  {'Tổng':<{width}} {self.total() * 1000:9.1f} ms")
+        return '\n'.join(lines)
@@ -0,0 +1,117 @@
+"""Kiểm tra migrate() trên database cũ có dòng mồ côi và ngày nhập tay
+
+Tạo database ở phiên bản 1 (chưa có ON DELETE CASCADE, ngày dd/mm/YYYY), thêm
+bệnh án/xét nghiệm/đơn thuốc mồ côi và các ngày dạng 5/3/2024, 31/02/2024 hoặc
+không đọc được, chạy migrate() rồi kiểm tra: không mất dòng nào (dòng mồ côi
+nằm trong các bảng orphan_*), có file sao lưu giữ nguyên dữ liệu cũ, ngày được
+chuẩn hóa và ngày không hợp lệ được báo lại.
+
+Chạy: python -m pytest test_migrations.py  (hoặc python test_migrations.py)
+"""
+import glob
+import os
+import sqlite3
+import tempfile
+
+from schema import SCHEMA_VERSION, configure_connection, get_schema_version, migrate
+
+CHILD_TABLES = ('medical_records', 'test_results', 'prescriptions')
+
+
+def count(conn, table):
+    return conn.execute(f"SELECT COUNT(*) FROM {table}").fetchone()[0]
+
+
+def build_legacy_database(path):
+    """Database phiên bản 1: 10 bệnh nhân, mỗi bệnh nhân 3 bệnh án (id 3p-2 .. 3p), kèm dữ liệu lỗi"""
+    conn = configure_connection(sqlite3.connect(path))
+    migrate(conn, 1)
+    conn.executemany("INSERT INTO patients (name, created_date) VALUES (?, ?)",
+                     [(f"Bệnh nhân {i}", f"2024-0{i % 9 + 1}-01 08:00:00") for i in range(1, 11)])
+    conn.executemany("INSERT INTO test_types (name) VALUES (?)", [(f"Xét nghiệm {i}",) for i in range(1, 6)])
+    conn.executemany("INSERT INTO medicine_types (name) VALUES (?)", [(f"Thuốc {i}",) for i in range(1, 6)])
+    for record_id in range(1, 31):
+        visit_date = f"{record_id % 28 + 1:02d}/{record_id % 12 + 1:02d}/2023"
+        conn.execute("INSERT INTO medical_records (id, patient_id, visit_date, diagnosis) VALUES (?, ?, ?, 'Cảm')",
+                     (record_id, (record_id + 2) // 3, visit_date))
+        conn.execute("INSERT INTO test_results (record_id, test_type_id, result, test_date) VALUES (?, 1, 'x', ?)",
+                     (record_id, visit_date))
+        conn.execute("INSERT INTO prescriptions (record_id, medicine_id, dosage, quantity) VALUES (?, 1, '1', 1)",
+                     (record_id,))
+    conn.commit()
+
+    # Phiên bản cũ không bật khóa ngoại nên có thể còn dòng trỏ tới dữ liệu đã xóa
+    conn.execute('PRAGMA foreign_keys = OFF')
+    conn.execute("DELETE FROM patients WHERE id = 1")  # bệnh án 1-3 mồ côi, kèm 3 xét nghiệm, 3 đơn thuốc
+    conn.execute("INSERT INTO test_results (record_id, test_type_id, result, test_date) VALUES (4, 999, 'x', '')")
+    conn.execute("INSERT INTO prescriptions (record_id, medicine_id, dosage, quantity) VALUES (9999, 1, '', 1)")
+    conn.execute("UPDATE medical_records SET visit_date = '5/3/2024' WHERE id = 4")
+    conn.execute("UPDATE medical_records SET visit_date = '7.11.2023' WHERE id = 5")
+    conn.execute("UPDATE medical_records SET visit_date = 'hôm qua' WHERE id = 6")
+    conn.execute("UPDATE test_results SET test_date = '31/2/2024' WHERE record_id = 7")
+    conn.execute("UPDATE medical_records SET visit_date = '31/02/2024' WHERE id = 8")
+    conn.commit()
+    conn.execute('PRAGMA foreign_keys = ON')
+    return conn
+
+
+def check_migrate_legacy_database(directory):
+    path = os.path.join(directory, 'patients.db')
+    conn = build_legacy_database(path)
+    before = {table: count(conn, table) for table in CHILD_TABLES}
+
+    messages = []
+    applied = migrate(conn, warn=messages.append)
+    assert applied == list(range(2, SCHEMA_VERSION + 1)), applied
+    assert get_schema_version(conn) == SCHEMA_VERSION
+    assert len(messages) == 1
+    notes = messages[0]
+
+    # Không mất dòng nào: dòng mồ côi nằm trong bảng orphan_*
+    expected_orphans = {'medical_records': 3, 'test_results': 4, 'prescriptions': 4}
+    for table, orphans in expected_orphans.items():
+        assert count(conn, f'orphan_{table}') == orphans, table
+        assert count(conn, table) + orphans == before[table], table
+    assert [row[0] for row in conn.execute("SELECT id FROM orphan_medical_records ORDER BY id")] == [1, 2, 3]
+    assert conn.execute('PRAGMA foreign_key_check').fetchall() == []
+
+    # File sao lưu giữ nguyên database trước khi nâng cấp
+    backups = glob.glob(path + '.v1-*.bak')
+    assert len(backups) == 1, backups
+    assert backups[0] in notes
+    backup = sqlite3.connect(backups[0])
+    assert get_schema_version(backup) == 1
+    assert {table: count(backup, table) for table in CHILD_TABLES} == before
+    backup.close()
+
+    # Ngày không đủ hai chữ số được chuẩn hóa; ngày không đọc được hoặc không có
+    # thật giữ nguyên và được báo
+    visit_dates = dict(conn.execute("SELECT id, visit_date FROM medical_records WHERE id BETWEEN 4 AND 8"))
+    assert visit_dates == {4: '2024-03-05', 5: '2023-11-07', 6: 'hôm qua', 7: '2023-08-08', 8: '31/02/2024'}, \
+        visit_dates
+    assert "2 dòng medical_records.visit_date" in notes
+    assert "'hôm qua'" in notes and "'31/02/2024'" in notes
+    assert "1 dòng test_results.test_date" in notes and "'31/2/2024'" in notes
+    months = [row[0] for row in conn.execute("SELECT month FROM stats_monthly")]
+    assert '2024-03' in months and '5/3/202' not in months, months
+
+    # Xóa bệnh nhân giờ xóa dây chuyền bệnh án, xét nghiệm và đơn thuốc
+    conn.execute("DELETE FROM patients WHERE id = 2")
+    assert conn.execute("SELECT COUNT(*) FROM medical_records WHERE patient_id = 2").fetchone()[0] == 0
+    assert conn.execute("SELECT COUNT(*) FROM test_results WHERE record_id BETWEEN 4 AND 6").fetchone()[0] == 0
+    conn.commit()
+
+    # Chạy lại không làm gì và không sao lưu thêm
+    assert migrate(conn, warn=messages.append) == []
+    assert len(messages) == 1
+    assert len(glob.glob(path + '.v*.bak')) == 1
+    conn.close()
+
+
+def test_migrate_legacy_database(tmp_path):
+    check_migrate_legacy_database(str(tmp_path))
+
+
+if __name__ == '__main__':
+    check_migrate_legacy_database(tempfile.mkdtemp())
+    print("OK")